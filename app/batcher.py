@@ -0,0 +1,129 @@
+import asyncio
+import time
+from collections import Counter
+
+from scripts.instrumentation import Histogram
+from scripts.queue_batch import fill_batch
+
+
+class Overloaded(Exception):
+    """Raised when the request queue has no room for a submission"""
+
+
+class MicroBatcher:
+    """Gathers concurrent submissions into batches for one worker
+
+    Items wait in a queue of at most ``max_queue`` entries. The worker
+    takes everything already queued, up to ``max_batch_size``, and waits
+    for more only until the oldest item has been queued ``max_latency``
+    seconds. ``process_batch`` gets the list of items in a thread and
+    returns one result per item. While a batch runs new items pile up,
+    so batches grow with the load. A full queue rejects submissions with
+    Overloaded at once, rather than letting waiting times grow.
+    """
+
+    def __init__(
+        self, process_batch, max_batch_size=32, max_latency=0.01, max_queue=1024
+    ):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.max_queue = max_queue
+        self.batch_sizes = Counter()
+        self.batch_seconds = Histogram()
+        self.queue_seconds = Histogram()
+        self._queue = None
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    @property
+    def depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        if not self.running:
+            self._queue = asyncio.Queue(self.max_queue)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            future.cancel()
+
+    async def submit(self, items):
+        """Queue items together and return their results
+
+        Raises Overloaded, queueing nothing, if they do not all fit.
+        """
+        if not self.running:
+            raise RuntimeError("MicroBatcher is not started")
+        if self.max_queue - self._queue.qsize() < len(items):
+            raise Overloaded(f"request queue is full ({self.max_queue} items)")
+        loop = asyncio.get_running_loop()
+        futures = []
+        for item in items:
+            future = loop.create_future()
+            self._queue.put_nowait((item, future, time.perf_counter()))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        remaining = batch[0][2] + self.max_latency - time.perf_counter()
+        await fill_batch(self._queue, batch, self.max_batch_size, remaining)
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            # Callers that went away need no result
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+            started = time.perf_counter()
+            for _, _, queued in batch:
+                self.queue_seconds.observe(started - queued)
+            try:
+                results = await asyncio.to_thread(
+                    self.process_batch, [item for item, _, _ in batch]
+                )
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self.batch_sizes[len(batch)] += 1
+                self.batch_seconds.observe(time.perf_counter() - started)
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def summary(self):
+        batches = sum(self.batch_sizes.values())
+        items = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "queue_depth": self.depth,
+            "max_queue": self.max_queue,
+            "batches": batches,
+            "batch_size": {
+                "mean": items / batches if batches else 0.0,
+                "max": max(self.batch_sizes, default=0),
+                "counts": {
+                    str(size): n for size, n in sorted(self.batch_sizes.items())
+                },
+            },
+            "batch_seconds": self.batch_seconds.summary(),
+            "queue_seconds": self.queue_seconds.summary(),
+        }
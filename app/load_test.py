@@ -0,0 +1,201 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from scripts.benchmarks import stub_ner, synthetic_messages
+
+
+class StubModel:
+    """Stand-in NER model that costs time like a real one
+
+    Every call sleeps ``batch_overhead`` seconds plus ``per_text`` per
+    text, as a forward pass has a fixed cost and a smaller one per
+    example, then tags texts with the benchmarks' stub_ner.
+    """
+
+    def __init__(self, batch_overhead=0.02, per_text=0.001):
+        self.batch_overhead = batch_overhead
+        self.per_text = per_text
+
+    def __call__(self, texts):
+        time.sleep(self.batch_overhead + self.per_text * len(texts))
+        return stub_ner(texts)
+
+
+async def asgi_request(app, method, path, body=b""):
+    """Send one request to an ASGI app in-process; returns (status, body)"""
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [(b"content-type", b"application/json")],
+    }
+    sent = False
+    response = {"status": None, "body": b""}
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            # Wait like a client still connected
+            await asyncio.Event().wait()
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(event):
+        if event["type"] == "http.response.start":
+            response["status"] = event["status"]
+        else:
+            response["body"] += event.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], response["body"]
+
+
+async def http_request(url, method, path, body=b""):
+    """Send one HTTP/1.1 request to a running server; returns (status, body)"""
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    try:
+        writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode("ascii") + body
+        )
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), payload
+
+
+async def run_load_test(request, messages, concurrency=64, total=2000):
+    """Send ``total`` extraction requests from ``concurrency`` clients
+
+    ``request(method, path, body)`` performs one request. Returns counts
+    by outcome, throughput and client-side latency percentiles.
+    """
+    bodies = [
+        json.dumps(messages[i % len(messages)], ensure_ascii=False).encode("utf-8")
+        for i in range(total)
+    ]
+    latencies, statuses = [], []
+    next_index = 0
+
+    async def client():
+        nonlocal next_index
+        while next_index < total:
+            body = bodies[next_index]
+            next_index += 1
+            start = time.perf_counter()
+            status, _ = await request("POST", "/extract", body)
+            latencies.append(time.perf_counter() - start)
+            statuses.append(status)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    ok = [t for t, status in zip(latencies, statuses) if status == 200]
+    return {
+        "requests": total,
+        "ok": len(ok),
+        "shed": statuses.count(503),
+        "errors": len(statuses) - len(ok) - statuses.count(503),
+        "seconds": seconds,
+        "throughput": len(ok) / seconds,
+        "p50_s": float(np.percentile(ok, 50)) if ok else 0.0,
+        "p99_s": float(np.percentile(ok, 99)) if ok else 0.0,
+    }
+
+
+async def _in_process(args, max_batch_size):
+    from app.service import ExtractionService, create_app
+
+    service = ExtractionService(
+        StubModel(args.batch_overhead_ms / 1000, args.per_text_ms / 1000),
+        max_batch_size=max_batch_size,
+        max_latency=args.max_latency_ms / 1000,
+        max_queue=args.max_queue,
+    )
+    app = create_app(service)
+    await service.start()
+    try:
+        messages = synthetic_messages(500, seed=args.seed)
+        report = await run_load_test(
+            lambda *request: asgi_request(app, *request),
+            messages,
+            concurrency=args.concurrency,
+            total=args.requests,
+        )
+        _, metrics = await asgi_request(app, "GET", "/metrics")
+    finally:
+        await service.stop()
+    report["server"] = json.loads(metrics)
+    return report
+
+
+async def _remote(args):
+    messages = synthetic_messages(500, seed=args.seed)
+    report = await run_load_test(
+        lambda *request: http_request(args.url, *request),
+        messages,
+        concurrency=args.concurrency,
+        total=args.requests,
+    )
+    _, metrics = await http_request(args.url, "GET", "/metrics")
+    report["server"] = json.loads(metrics)
+    return report
+
+
+def _print(label, report):
+    server = report["server"]
+    print(
+        f"{label}: {report['ok']}/{report['requests']} ok, {report['shed']} shed, "
+        f"{report['throughput']:.0f} req/s, p50 {report['p50_s'] * 1000:.1f}ms, "
+        f"p99 {report['p99_s'] * 1000:.1f}ms, "
+        f"mean batch {server['batch_size']['mean']:.1f}"
+    )
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load test the extraction service")
+    parser.add_argument(
+        "--url",
+        help="running service, e.g. http://127.0.0.1:8000; "
+        "without it the service runs in-process with the stub model",
+    )
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-latency-ms", type=float, default=10.0)
+    parser.add_argument("--max-queue", type=int, default=1024)
+    parser.add_argument("--batch-overhead-ms", type=float, default=20.0)
+    parser.add_argument("--per-text-ms", type=float, default=1.0)
+    parser.add_argument(
+        "--compare", action="store_true", help="also run without batching"
+    )
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+
+    if args.url:
+        reports = {"remote": asyncio.run(_remote(args))}
+    else:
+        reports = {"batched": asyncio.run(_in_process(args, args.max_batch_size))}
+        if args.compare:
+            reports["unbatched"] = asyncio.run(_in_process(args, 1))
+    for label, report in reports.items():
+        _print(label, report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import json
+import logging
+import time
+
+from app.batcher import MicroBatcher, Overloaded
+from scripts.instrumentation import Histogram
+from scripts.preprocessor import AmharicPreprocessor
+
+# Largest request body accepted, in bytes
+MAX_BODY = 1 << 20
+
+
+def _json_default(value):
+    # NumPy scalars from model outputs
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class ExtractionService:
+    """One warm model and preprocessor serving extraction requests
+
+    Each message runs through ``preprocess_message`` and then
+    ``nlp_pipeline`` (a list-accepting callable such as
+    NERInferenceEngine) on its cleaned text. Messages of concurrent
+    requests are gathered into micro-batches (see MicroBatcher), so the
+    model sees a few large batches instead of many single texts.
+    """
+
+    def __init__(
+        self,
+        nlp_pipeline,
+        preprocessor=None,
+        max_batch_size=32,
+        max_latency=0.01,
+        max_queue=1024,
+    ):
+        self.nlp_pipeline = nlp_pipeline
+        self.preprocessor = preprocessor or AmharicPreprocessor()
+        self.batcher = MicroBatcher(
+            self.extract,
+            max_batch_size=max_batch_size,
+            max_latency=max_latency,
+            max_queue=max_queue,
+        )
+        self.latency = Histogram()
+        self.requests = 0
+        self.shed = 0
+        self.errors = 0
+        self.started = time.time()
+        self.logger = logging.getLogger("ExtractionService")
+
+    def extract(self, messages):
+        """Preprocess messages and add their entities, in one model call"""
+        results = [self.preprocessor.preprocess_message(m) for m in messages]
+        entities = self.nlp_pipeline([r["cleaned_text"] for r in results])
+        for result, message_entities in zip(results, entities):
+            result["entities"] = message_entities
+        return results
+
+    async def start(self):
+        await self.batcher.start()
+
+    async def stop(self):
+        await self.batcher.stop()
+
+    async def handle(self, messages):
+        """Extract from messages through the batcher, recording metrics"""
+        start = time.perf_counter()
+        self.requests += 1
+        try:
+            return await self.batcher.submit(messages)
+        except Overloaded:
+            self.shed += 1
+            raise
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - start)
+
+    def metrics(self):
+        return {
+            "uptime_s": time.time() - self.started,
+            "requests": self.requests,
+            "shed": self.shed,
+            "errors": self.errors,
+            "latency": self.latency.summary(),
+            **self.batcher.summary(),
+        }
+
+
+def _messages(body):
+    """(messages, many) from a request body, or None if it is malformed
+
+    The body is one scraped message ({"text": ..., "id": ..., ...}) or
+    {"messages": [...]} with several, in which case ``many`` is True.
+    """
+    try:
+        payload = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    if not isinstance(payload, dict):
+        return None
+    many = "messages" in payload
+    messages = payload["messages"] if many else [payload]
+    if not isinstance(messages, list) or not all(
+        isinstance(m, dict) and isinstance(m.get("text", ""), str) for m in messages
+    ):
+        return None
+    return messages, many
+
+
+def create_app(service):
+    """ASGI application serving ``service``
+
+    - POST /extract: a message or {"messages": [...]}; answers with the
+      preprocessed message plus "entities" (a list for "messages"), or
+      503 when the request queue is full
+    - GET /metrics: request counts, batch sizes and latency percentiles
+    - GET /health
+    """
+
+    async def send_json(send, status, payload, headers=()):
+        body = json.dumps(payload, ensure_ascii=False, default=_json_default)
+        body = body.encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                    *headers,
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def read_body(receive):
+        body = b""
+        while True:
+            event = await receive()
+            if event["type"] == "http.disconnect":
+                return None
+            body += event.get("body", b"")
+            if len(body) > MAX_BODY:
+                return False
+            if not event.get("more_body"):
+                return body
+
+    async def lifespan(receive, send):
+        while True:
+            event = await receive()
+            if event["type"] == "lifespan.startup":
+                await service.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif event["type"] == "lifespan.shutdown":
+                await service.stop()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+
+        path, method = scope["path"], scope["method"]
+        if path == "/health" and method == "GET":
+            return await send_json(send, 200, {"status": "ok"})
+        if path == "/metrics" and method == "GET":
+            return await send_json(send, 200, service.metrics())
+        if path != "/extract":
+            return await send_json(send, 404, {"error": "not found"})
+        if method != "POST":
+            return await send_json(send, 405, {"error": "use POST"})
+
+        body = await read_body(receive)
+        if body is None:
+            return
+        if body is False:
+            return await send_json(send, 413, {"error": "body too large"})
+        parsed = _messages(body)
+        if parsed is None:
+            return await send_json(
+                send, 400, {"error": "expected a message or {'messages': [...]}"}
+            )
+        messages, many = parsed
+
+        # Servers without lifespan support start the batcher here
+        await service.start()
+        try:
+            results = await service.handle(messages)
+        except Overloaded as e:
+            return await send_json(
+                send, 503, {"error": str(e)}, headers=[(b"retry-after", b"1")]
+            )
+        except Exception as e:
+            service.logger.error(f"Extraction failed: {str(e)}")
+            return await send_json(send, 500, {"error": "extraction failed"})
+        return await send_json(send, 200, results if many else results[0])
+
+    return app
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local entity extraction service")
+    parser.add_argument("--model", help="fine-tuned NER model directory")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default="torch")
+    parser.add_argument(
+        "--stub", action="store_true", help="serve the stub model, for testing"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-latency-ms", type=float, default=10.0)
+    parser.add_argument("--max-queue", type=int, default=1024)
+    args = parser.parse_args()
+
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("Serving needs uvicorn: pip install uvicorn")
+
+    if args.stub:
+        from app.load_test import StubModel
+
+        nlp_pipeline = StubModel()
+    elif args.model:
+        from scripts.ner_inference import NERInferenceEngine
+
+        nlp_pipeline = NERInferenceEngine(args.model, backend=args.backend)
+    else:
+        parser.error("--model or --stub is required")
+
+    service = ExtractionService(
+        nlp_pipeline,
+        max_batch_size=args.max_batch_size,
+        max_latency=args.max_latency_ms / 1000,
+        max_queue=args.max_queue,
+    )
+    uvicorn.run(create_app(service), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
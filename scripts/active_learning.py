@@ -0,0 +1,282 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from scripts.entity_cache import content_hash
+
+SAMPLE_COLUMNS = ["message_id", "cleaned_text", "tokens"]
+
+
+def token_uncertainty(probs, real):
+    """Return (entropy, margin) per row of a batch
+
+    ``probs`` is (batch, tokens, labels) and ``real`` masks the tokens
+    that belong to the text. Entropy is the mean over a message's
+    tokens, so long posts are not favoured. Margin is one minus the gap
+    between the top two labels of the least certain token.
+    """
+    count = np.maximum(real.sum(axis=1), 1)
+    entropy = -(probs * np.log(np.clip(probs, 1e-12, None))).sum(axis=-1)
+    entropy = (entropy * real).sum(axis=1) / count
+
+    top2 = np.partition(probs, -2, axis=-1)[..., -2:]
+    margin = np.where(real, 1.0 - (top2[..., 1] - top2[..., 0]), 0.0).max(axis=1)
+    return entropy, margin
+
+
+class UncertaintyScorer:
+    """Scores messages with an NERInferenceEngine for active learning
+
+    Each text gets its token entropy, its margin and a small
+    ``dim``-sized vector for diversity. The vector is the mean of the
+    model's input embeddings over its tokens, randomly projected. ONNX
+    models expose no embeddings, so for them it is a random projection
+    of the token counts. With ``cache_path`` the scores go into a SQLite
+    cache keyed by text hash and ``model_version``. Later rounds with the
+    same model only score new texts, and repeated texts are scored once.
+    """
+
+    def __init__(self, engine, cache_path=None, model_version=None, dim=64, seed=0):
+        if cache_path and model_version is None:
+            raise ValueError("model_version is required with cache_path")
+        self.engine = engine
+        self.dim = dim
+        self.model_version = f"{model_version}:{dim}:{seed}"
+        self.hits = 0
+        self.misses = 0
+
+        rng = np.random.RandomState(seed)
+        embeddings = engine.token_vectors()
+        if embeddings is None:
+            vocab_size = len(engine.tokenizer)
+            self._table = rng.standard_normal((vocab_size, dim)).astype(np.float32)
+        else:
+            projection = rng.standard_normal((embeddings.shape[1], dim))
+            self._table = (embeddings @ projection.astype(embeddings.dtype)).astype(
+                np.float32
+            )
+
+        self.conn = None
+        if cache_path:
+            if os.path.dirname(cache_path):
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            self.conn = sqlite3.connect(cache_path)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS scores (
+                    model_version TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    entropy REAL NOT NULL,
+                    margin REAL NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model_version, content_hash)
+                ) WITHOUT ROWID
+                """)
+            self.conn.commit()
+
+    def _run_model(self, texts):
+        encoded = self.engine.encode(texts)
+        input_ids = encoded["input_ids"]
+        entropy = np.zeros(len(texts))
+        margin = np.zeros(len(texts))
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+
+        for batch, ids, probs in self.engine.batch_probabilities(input_ids):
+            # Special and padding tokens have empty offsets
+            real = np.zeros(ids.shape, dtype=bool)
+            for row, i in enumerate(batch):
+                offsets = np.asarray(encoded["offset_mapping"][i]).reshape(-1, 2)
+                real[row, : len(offsets)] = offsets[:, 1] > offsets[:, 0]
+            entropy[batch], margin[batch] = token_uncertainty(probs, real)
+
+            pooled = (self._table[ids] * real[..., None]).sum(axis=1)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            vectors[batch] = pooled / np.where(norms > 0, norms, 1)
+        return entropy, margin, vectors
+
+    def _lookup(self, hashes):
+        rows = {}
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start : start + 500]
+            rows.update(
+                (row[0], row[1:])
+                for row in self.conn.execute(
+                    f"""
+                    SELECT content_hash, entropy, margin, vector FROM scores
+                    WHERE model_version = ?
+                    AND content_hash IN ({",".join("?" * len(chunk))})
+                    """,
+                    (self.model_version, *chunk),
+                )
+            )
+        return rows
+
+    def score(self, texts, chunk_size=4096):
+        """Return (entropy, margin, vectors) arrays for texts"""
+        texts = [text if isinstance(text, str) else "" for text in texts]
+        entropy = np.zeros(len(texts))
+        margin = np.zeros(len(texts))
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+
+        for start in range(0, len(texts), chunk_size):
+            chunk = texts[start : start + chunk_size]
+            positions = {}
+            for offset, text in enumerate(chunk):
+                positions.setdefault(content_hash(text), []).append(start + offset)
+
+            cached = self._lookup(list(positions)) if self.conn else {}
+            for key, (e, m, blob) in cached.items():
+                rows = positions[key]
+                entropy[rows], margin[rows] = e, m
+                vectors[rows] = np.frombuffer(blob, dtype=np.float16)
+            missing = [key for key in positions if key not in cached]
+            self.hits += len(positions) - len(missing)
+            self.misses += len(missing)
+            if not missing:
+                continue
+
+            e, m, v = self._run_model([texts[positions[key][0]] for key in missing])
+            for j, key in enumerate(missing):
+                rows = positions[key]
+                entropy[rows], margin[rows], vectors[rows] = e[j], m[j], v[j]
+            if self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (
+                            self.model_version,
+                            key,
+                            float(e[j]),
+                            float(m[j]),
+                            v[j].astype(np.float16).tobytes(),
+                        )
+                        for j, key in enumerate(missing)
+                    ),
+                )
+                self.conn.commit()
+        return entropy, margin, vectors
+
+    def stats(self):
+        """Return hit and miss counts of distinct texts"""
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+
+
+def select_diverse(uncertainty, vectors, k):
+    """Greedy pick of k rows that are uncertain and unlike each other
+
+    Each step takes the row with the highest uncertainty times its
+    cosine distance to the closest row already picked. Vectors are
+    expected to be L2-normalized.
+    """
+    k = min(k, len(uncertainty))
+    selected = []
+    if k == 0:
+        return selected
+    uncertainty = np.asarray(uncertainty, dtype=np.float64)
+    distance = np.ones(len(uncertainty))
+    for _ in range(k):
+        gain = uncertainty * distance
+        gain[selected] = -np.inf
+        best = int(np.argmax(gain))
+        selected.append(best)
+        distance = np.minimum(distance, 1.0 - vectors @ vectors[best])
+    return selected
+
+
+def select_for_annotation(
+    df,
+    scorer,
+    k=50,
+    strategy="entropy",
+    candidates=10,
+    exclude_ids=None,
+    output_path=None,
+    text_column="cleaned_text",
+):
+    """Pick the k messages most worth annotating next
+
+    ``df`` is a preprocessed frame. Every message is scored, the
+    ``k * candidates`` most uncertain by ``strategy`` ("entropy" or
+    "margin") are kept, and select_diverse picks k of them so
+    near-identical posts are not labeled twice. Messages in
+    ``exclude_ids`` (already annotated) are skipped. The result has the
+    annotator's columns plus the scores, and is written to
+    ``output_path`` (CSV, or Parquet by extension) when given.
+    """
+    if strategy not in ("entropy", "margin"):
+        raise ValueError("strategy must be 'entropy' or 'margin'")
+    pool = df
+    if exclude_ids is not None:
+        pool = pool[~pool["message_id"].isin(set(exclude_ids))]
+    # Messages without text carry no signal
+    pool = pool[pool[text_column].fillna("").str.strip() != ""]
+    pool = pool.drop_duplicates(text_column).reset_index(drop=True)
+
+    entropy, margin, vectors = scorer.score(pool[text_column].tolist())
+    uncertainty = entropy if strategy == "entropy" else margin
+    shortlist = np.argsort(-uncertainty, kind="stable")[: k * candidates]
+    chosen = shortlist[select_diverse(uncertainty[shortlist], vectors[shortlist], k)]
+
+    sample = pool.iloc[chosen][[c for c in SAMPLE_COLUMNS if c in pool]].copy()
+    sample["entropy"] = entropy[chosen]
+    sample["margin"] = margin[chosen]
+    sample = sample.reset_index(drop=True)
+    if output_path:
+        if output_path.endswith(".parquet"):
+            sample.to_parquet(output_path, index=False)
+        else:
+            sample.to_csv(output_path, index=False, encoding="utf-8")
+    return sample
+
+
+def main():
+    import argparse
+
+    from scripts.ner_inference import NERInferenceEngine
+    from utils.helpers import load_data
+
+    parser = argparse.ArgumentParser(description="Pick messages to annotate next")
+    parser.add_argument("--model", required=True, help="current NER model directory")
+    parser.add_argument(
+        "--data", required=True, help="preprocessed CSV, Parquet or lake"
+    )
+    parser.add_argument("--output", default="ner_labeling_sample.csv")
+    parser.add_argument("--k", type=int, default=50)
+    parser.add_argument("--strategy", choices=["entropy", "margin"], default="entropy")
+    parser.add_argument("--cache", help="SQLite score cache reused across rounds")
+    parser.add_argument("--model-version", help="cache key, e.g. the training run")
+    parser.add_argument(
+        "--exclude", nargs="*", default=[], help="earlier sample files to skip"
+    )
+    parser.add_argument("--backend", choices=["torch", "onnx"], default="torch")
+    args = parser.parse_args()
+
+    exclude_ids = set()
+    for path in args.exclude:
+        exclude_ids.update(load_data(path)["message_id"])
+
+    engine = NERInferenceEngine(args.model, backend=args.backend)
+    scorer = UncertaintyScorer(
+        engine,
+        cache_path=args.cache,
+        model_version=args.model_version or os.path.abspath(args.model),
+    )
+    sample = select_for_annotation(
+        load_data(args.data),
+        scorer,
+        k=args.k,
+        strategy=args.strategy,
+        exclude_ids=exclude_ids,
+        output_path=args.output,
+    )
+    scorer.close()
+    print(f"Wrote {len(sample)} messages to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,515 @@
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from scripts import instrumentation
+from scripts.preprocessor import AmharicPreprocessor
+
+PRODUCTS = ["ጫማ", "ልብስ", "ስልክ", "ቲ.ቪ.", "ላፕቶፕ", "ቦርሳ", "ሰዓት", "ፒ.ሲ.", "Shoes", "Dress"]
+LOCATIONS = ["ቦሌ", "መገናኛ", "ፒያሳ", "ሜክሲኮ", "አዲስ አበባ", "ካዛንቺስ"]
+PHRASES = ["ሽያጭ", "ይገኛል", "አዲስ", "ጥራት ያለው", "ለሁሉም", "በቅናሽ", "ዋጋ", "ገዢ"]
+EMOJIS = ["🔥", "📞", "👟", "✅", "💯", "📍", "🛍️", "1️⃣"]
+CHANNELS = ["@ZemenExpress", "@sinayelj", "@MerttEka", "@qnashcom", "@Shewabrand"]
+
+
+def synthetic_messages(n, seed=0, duplicate_rate=0.2):
+    """Generate deterministic Amharic Telegram-style messages
+
+    Posts mix products, prices in ብር, phone numbers, URLs, mentions,
+    emojis, locations and abbreviations. A fraction of posts are exact
+    reposts of earlier ones, as vendors do in practice.
+    """
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    messages = []
+    for i in range(n):
+        if messages and rng.random() < duplicate_rate:
+            text = rng.choice(messages)["text"]
+        else:
+            parts = [
+                rng.choice(PRODUCTS),
+                rng.choice(PHRASES),
+                f"ዋጋ {rng.randint(100, 20000)} ብር",
+                f"{rng.randint(100, 9999)}ብር",
+                f"ቦታ {rng.choice(LOCATIONS)}",
+                f"09{rng.randint(10000000, 99999999)}",
+                rng.choice(EMOJIS),
+            ]
+            if rng.random() < 0.3:
+                parts.append(f"https://t.me/{rng.choice(CHANNELS)[1:]}")
+            if rng.random() < 0.3:
+                parts.append(rng.choice(CHANNELS))
+            if rng.random() < 0.2:
+                parts.append(f"{rng.randint(1, 50)} ኪ.ግ.")
+            rng.shuffle(parts)
+            text = " ".join(parts)
+
+        messages.append(
+            {
+                "id": i + 1,
+                "channel": rng.choice(CHANNELS),
+                "date": (start + timedelta(minutes=37 * i)).isoformat(),
+                "views": rng.randint(0, 50000),
+                "text": text,
+            }
+        )
+    return messages
+
+
+def synthetic_conll(n, seed=0):
+    """Generate weakly labeled CoNLL-style sentences from synthetic posts"""
+    preprocessor = AmharicPreprocessor()
+    products = {t for p in PRODUCTS for t in preprocessor.tokenize_amharic(p)}
+    locations = {t for l in LOCATIONS for t in l.split()}
+
+    tokens, ner_tags = [], []
+    for message in synthetic_messages(n, seed=seed):
+        words = preprocessor.tokenize_amharic(
+            preprocessor.clean_text(preprocessor.normalize_amharic(message["text"]))
+        )
+        tags = []
+        for i, word in enumerate(words):
+            if word.isdigit():
+                tags.append("B-PRICE")
+            elif word == "ብር" and i and words[i - 1].isdigit():
+                tags.append("I-PRICE")
+            elif word in locations:
+                tags.append("I-LOC" if tags and tags[-1] == "B-LOC" else "B-LOC")
+            elif word in products:
+                tags.append("B-PRODUCT")
+            else:
+                tags.append("O")
+        tokens.append(words)
+        ner_tags.append(tags)
+    return {"tokens": tokens, "ner_tags": ner_tags}
+
+
+def _throughput(fn, n, repeat=3):
+    """Best-of-repeat items per second for fn processing n items"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return n / best if best else float("inf")
+
+
+def _measure(fn, n, repeat=3):
+    """Throughput and peak traced memory of fn processing n items
+
+    Memory is traced in a separate, first run, since tracemalloc slows
+    the code it watches; that run also warms caches before timing.
+    """
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"items_per_sec": _throughput(fn, n, repeat), "peak_mb": peak / 2**20}
+
+
+def stub_ner(texts):
+    """Stand-in NER pipeline: numbers are prices, the first word a product"""
+    if isinstance(texts, str):
+        return stub_ner([texts])[0]
+    results = []
+    for text in texts:
+        entities = [
+            {"entity_group": "PRICE", "word": m.group(), "score": 0.9}
+            for m in re.finditer(r"\d+", text)
+        ]
+        if text.split():
+            entities.insert(
+                0, {"entity_group": "PRODUCT", "word": text.split()[0], "score": 0.8}
+            )
+        results.append(entities)
+    return results
+
+
+def _vendor_posts(n, seed):
+    """Synthetic posts spread over about one vendor per 50 posts"""
+    df = pd.DataFrame(synthetic_messages(n, seed=seed))
+    df["channel"] = [f"@vendor{i % max(1, n // 50)}" for i in range(n)]
+    return df
+
+
+def _suite_stages(n, seed, tokenizer, workdir):
+    """Yield (name, fn, items) for every stage of the suite at size n"""
+    from scripts.conll_io import write_conll
+    from scripts.ner_data_utils import load_conll_data, tokenize_and_align_labels
+    from scripts.vendor_analytics import calculate_vendor_metrics, lending_scorecard
+
+    preprocessor = AmharicPreprocessor()
+    messages = synthetic_messages(n, seed=seed)
+    yield "preprocess_message", lambda: [
+        preprocessor.preprocess_message(m) for m in messages
+    ], n
+
+    data = synthetic_conll(n, seed=seed)
+    conll_path = os.path.join(workdir, f"synthetic_{n}.conll")
+    write_conll(zip(data["tokens"], data["ner_tags"]), conll_path)
+    yield "load_conll_data", lambda: load_conll_data(conll_path), n
+
+    if tokenizer is not None:
+        labels = sorted({tag for tags in data["ner_tags"] for tag in tags})
+        label2id = {label: i for i, label in enumerate(labels)}
+        yield "tokenize_and_align_labels", lambda: tokenize_and_align_labels(
+            data, tokenizer, label2id
+        ), n
+
+    posts = _vendor_posts(n, seed)
+    yield "calculate_vendor_metrics", lambda: calculate_vendor_metrics(
+        posts, stub_ner
+    ), n
+
+    metrics = calculate_vendor_metrics(posts, stub_ner)
+    yield "lending_scorecard", lambda: lending_scorecard(metrics), len(metrics)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes=(1000, 10000, 50000), seed=0, repeat=3, tokenizer=None):
+    """Measure every pipeline stage at several corpus sizes
+
+    Returns a JSON-serializable dict: ``meta`` describes the run and
+    ``results[stage][size]`` holds items_per_sec and peak_mb. The
+    tokenize_and_align_labels stage runs only with a ``tokenizer``.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in sizes:
+            for name, fn, items in _suite_stages(n, seed, tokenizer, workdir):
+                results.setdefault(name, {})[str(n)] = {
+                    "items": items,
+                    **_measure(fn, items, repeat),
+                }
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": datetime.now(timezone.utc).isoformat(),
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare_results(baseline, current, threshold=0.1, min_mb=0.5):
+    """List regressions between two run_suite results
+
+    A stage regresses when its throughput drops, or its peak memory
+    grows, by more than ``threshold`` (a fraction). Memory growth under
+    ``min_mb`` is noise and never counts. Stages or sizes missing from
+    either run are ignored.
+    """
+    regressions = []
+    for stage, sizes in current["results"].items():
+        for size, now in sizes.items():
+            before = baseline["results"].get(stage, {}).get(size)
+            if before is None:
+                continue
+            for metric, worse in (
+                ("items_per_sec", now["items_per_sec"] < before["items_per_sec"]),
+                ("peak_mb", now["peak_mb"] > before["peak_mb"] + min_mb),
+            ):
+                if not before[metric]:
+                    continue
+                change = now[metric] / before[metric] - 1
+                if worse and abs(change) > threshold:
+                    regressions.append(
+                        {
+                            "stage": stage,
+                            "size": size,
+                            "metric": metric,
+                            "baseline": before[metric],
+                            "current": now[metric],
+                            "change": change,
+                        }
+                    )
+    return regressions
+
+
+def benchmark_preprocessor(n=10000, seed=0, repeat=3):
+    """Compare messages/sec of the per-message and batch preprocessing paths"""
+    messages = synthetic_messages(n, seed=seed)
+    preprocessor = AmharicPreprocessor()
+
+    # Both paths end in a DataFrame, as the notebooks consume one
+    per_message = _throughput(
+        lambda: pd.DataFrame([preprocessor.preprocess_message(m) for m in messages]),
+        n,
+        repeat,
+    )
+    batch = _throughput(lambda: preprocessor.preprocess_batch(messages), n, repeat)
+
+    return {
+        "messages": n,
+        "per_message_msgs_per_sec": per_message,
+        "batch_msgs_per_sec": batch,
+        "speedup": batch / per_message,
+    }
+
+
+def benchmark_preprocessor_methods(n=10000, seed=0, repeat=3):
+    """Messages/sec of each AmharicPreprocessor text method on its own
+
+    Each method gets the input it sees in the pipeline: raw text for
+    normalization, normalized text for cleaning and cleaned text for
+    tokenization and feature extraction. Duplicates are dropped so every
+    call does real work.
+    """
+    preprocessor = AmharicPreprocessor()
+    raw = list(dict.fromkeys(m["text"] for m in synthetic_messages(n, seed=seed)))
+    normalized = [preprocessor.normalize_amharic(text) for text in raw]
+    cleaned = [preprocessor.clean_text(text) for text in normalized]
+
+    result = {"messages": len(raw)}
+    for name, texts in (
+        ("normalize_amharic", raw),
+        ("clean_text", normalized),
+        ("tokenize_amharic", cleaned),
+        ("tokenize_with_offsets", cleaned),
+        ("extract_features", cleaned),
+    ):
+        method = getattr(preprocessor, name)
+        result[f"{name}_msgs_per_sec"] = _throughput(
+            lambda: [method(text) for text in texts], len(texts), repeat
+        )
+    preprocessor.tokenize_batch(cleaned[:1])  # build the class table once
+    result["tokenize_batch_msgs_per_sec"] = _throughput(
+        lambda: preprocessor.tokenize_batch(cleaned), len(cleaned), repeat
+    )
+    result["tokenize_batch_offsets_msgs_per_sec"] = _throughput(
+        lambda: preprocessor.tokenize_batch(cleaned, with_offsets=True),
+        len(cleaned),
+        repeat,
+    )
+    return result
+
+
+def benchmark_ner_tokenization(
+    tokenizer, n=5000, seed=0, batch_size=16, max_length=128, repeat=3
+):
+    """Compare fixed max_length padding with dynamic padding for NER inputs
+
+    Reports tokens/sec of tokenize_and_align_labels and the share of padded
+    positions a model would process for fixed padding, dynamic padding on
+    sequential batches and dynamic padding on length-bucketed batches.
+    """
+    from scripts.ner_data_utils import (
+        length_bucketed_batches,
+        padding_ratio,
+        tokenize_and_align_labels,
+    )
+
+    data = synthetic_conll(n, seed=seed)
+    labels = sorted({tag for tags in data["ner_tags"] for tag in tags})
+    label2id = {label: i for i, label in enumerate(labels)}
+
+    result = {"sentences": n}
+    for mode, padding in (("max_length", "max_length"), ("dynamic", False)):
+        encoded = tokenize_and_align_labels(
+            data, tokenizer, label2id, padding=padding, max_length=max_length
+        )
+        real_tokens = sum(map(sum, encoded["attention_mask"]))
+        result[f"{mode}_tokens_per_sec"] = _throughput(
+            lambda: tokenize_and_align_labels(
+                data, tokenizer, label2id, padding=padding, max_length=max_length
+            ),
+            real_tokens,
+            repeat,
+        )
+
+    lengths = [len(ids) for ids in encoded["input_ids"]]
+    sequential = [
+        list(range(i, min(i + batch_size, n))) for i in range(0, n, batch_size)
+    ]
+    result["max_length_padding_ratio"] = 1 - sum(lengths) / (max_length * n)
+    result["dynamic_padding_ratio"] = padding_ratio(lengths, sequential)
+    result["bucketed_padding_ratio"] = padding_ratio(
+        lengths, length_bucketed_batches(lengths, batch_size, seed=seed)
+    )
+    return result
+
+
+def benchmark_ner_inference(
+    model_path,
+    n=500,
+    seed=0,
+    batch_size=32,
+    backend="torch",
+    quantize=False,
+    num_threads=None,
+    repeat=3,
+):
+    """Compare texts/sec of per-call pipeline inference and NERInferenceEngine"""
+    from transformers import pipeline
+
+    from scripts.ner_inference import NERInferenceEngine
+
+    preprocessor = AmharicPreprocessor()
+    texts = [
+        preprocessor.clean_text(m["text"]) for m in synthetic_messages(n, seed=seed)
+    ]
+
+    nlp = pipeline(
+        "token-classification", model=model_path, aggregation_strategy="simple"
+    )
+    engine = NERInferenceEngine(
+        model_path,
+        backend=backend,
+        quantize=quantize,
+        num_threads=num_threads,
+        batch_size=batch_size,
+    )
+    per_call = _throughput(lambda: [nlp(text) for text in texts], n, repeat)
+    batched = _throughput(lambda: engine(texts), n, repeat)
+    return {
+        "texts": n,
+        "pipeline_texts_per_sec": per_call,
+        "engine_texts_per_sec": batched,
+        "speedup": batched / per_call,
+    }
+
+
+def _print_regressions(regressions):
+    for r in regressions:
+        print(
+            f"REGRESSION {r['stage']} @ {r['size']}: {r['metric']} "
+            f"{r['baseline']:,.2f} -> {r['current']:,.2f} ({r['change']:+.1%})"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline throughput benchmarks")
+    parser.add_argument(
+        "stage",
+        choices=[
+            "preprocessor",
+            "preprocessor-methods",
+            "ner-tokenization",
+            "ner-inference",
+            "suite",
+            "compare",
+        ],
+    )
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tokenizer", default="xlm-roberta-base")
+    parser.add_argument("--model", help="fine-tuned model directory")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default="torch")
+    parser.add_argument("--quantize", action="store_true")
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--output", help="suite: JSON file for the results")
+    parser.add_argument("--current", help="compare: JSON results to check")
+    parser.add_argument("--baseline", help="JSON results of an earlier commit")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument(
+        "--no-tokenizer", action="store_true", help="suite: skip tokenization"
+    )
+    parser.add_argument("--metrics", help="write per-stage timings as JSON")
+    parser.add_argument("--profile", help="write cProfile stats of the run")
+    parser.add_argument("--sample", help="write collapsed stacks of the run")
+    args = parser.parse_args()
+    if args.stage == "compare":
+        if not args.current:
+            parser.error("compare needs --current")
+        if not args.baseline:
+            parser.error("compare needs --baseline")
+
+    with ExitStack() as stack:
+        if args.metrics:
+            instrumentation.enable()
+            stack.callback(instrumentation.metrics.dump, args.metrics)
+        if args.profile:
+            stack.enter_context(instrumentation.profile(args.profile))
+        if args.sample:
+            sampler = stack.enter_context(instrumentation.StackSampler())
+            stack.callback(sampler.write_collapsed, args.sample)
+        _run(args)
+
+
+def _run(args):
+    if args.stage in ("suite", "compare"):
+        if args.stage == "suite":
+            tokenizer = None
+            if not args.no_tokenizer:
+                from transformers import AutoTokenizer
+
+                tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+            current = run_suite(args.sizes, args.seed, args.repeat, tokenizer)
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as f:
+                    json.dump(current, f, indent=2)
+            for stage, sizes in current["results"].items():
+                for size, r in sizes.items():
+                    print(
+                        f"{stage} @ {size}: {r['items_per_sec']:,.2f} items/sec, "
+                        f"peak {r['peak_mb']:,.2f} MB"
+                    )
+        else:
+            with open(args.current, encoding="utf-8") as f:
+                current = json.load(f)
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as f:
+                regressions = compare_results(json.load(f), current, args.threshold)
+            _print_regressions(regressions)
+            if regressions:
+                raise SystemExit(1)
+        return
+
+    if args.stage == "preprocessor":
+        result = benchmark_preprocessor(args.size, args.seed, args.repeat)
+    elif args.stage == "preprocessor-methods":
+        result = benchmark_preprocessor_methods(args.size, args.seed, args.repeat)
+    elif args.stage == "ner-tokenization":
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+        result = benchmark_ner_tokenization(
+            tokenizer, args.size, args.seed, repeat=args.repeat
+        )
+    elif args.stage == "ner-inference":
+        result = benchmark_ner_inference(
+            args.model,
+            args.size,
+            args.seed,
+            backend=args.backend,
+            quantize=args.quantize,
+            num_threads=args.threads,
+            repeat=args.repeat,
+        )
+
+    for key, value in result.items():
+        print(f"{key}: {value:,.2f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+
+class CheckpointStore:
+    """SQLite table of the last scraped message id per channel"""
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                channel TEXT PRIMARY KEY,
+                last_message_id INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """)
+        self.conn.commit()
+
+    def get(self, channel):
+        """Return the high-water mark for channel, or 0 if never scraped"""
+        row = self.conn.execute(
+            "SELECT last_message_id FROM checkpoints WHERE channel = ?", (channel,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def set(self, channel, message_id):
+        """Advance the high-water mark; it never moves backwards"""
+        self.conn.execute(
+            """
+            INSERT INTO checkpoints (channel, last_message_id, updated_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(channel) DO UPDATE SET
+                last_message_id = MAX(last_message_id, excluded.last_message_id),
+                updated_at = excluded.updated_at
+            """,
+            (channel, int(message_id), datetime.now(timezone.utc).isoformat()),
+        )
+        self.conn.commit()
+
+    def all(self):
+        """Return {channel: last_message_id} for every channel"""
+        return dict(
+            self.conn.execute("SELECT channel, last_message_id FROM checkpoints")
+        )
+
+    def close(self):
+        self.conn.close()
@@ -1,8 +1,53 @@
 import pandas as pd
 import ast
+import json
 import os
 import sys
-from tqdm import tqdm
+import time
+
+from scripts.conll_io import format_conll, write_conll
+
+# Shortcuts for the entity types in span edits
+ENTITY_KEYS = {"p": "PRODUCT", "l": "LOC", "r": "PRICE", "o": "O"}
+
+
+def spans_to_labels(tokens, entities):
+    """BIO labels for space-joined tokens from character-offset entities
+
+    ``entities`` are pipeline results for ``" ".join(tokens)``. A token
+    takes the type of the first entity it overlaps, and the first token
+    of every entity gets ``B-``.
+    """
+    starts, position = [], 0
+    for token in tokens:
+        starts.append(position)
+        position += len(token) + 1
+
+    labels = ["O"] * len(tokens)
+    for entity in entities:
+        entity_type = entity["entity_group"]
+        first = True
+        for j, start in enumerate(starts):
+            end = start + len(tokens[j])
+            if labels[j] != "O" or end <= entity["start"] or start >= entity["end"]:
+                continue
+            labels[j] = ("B-" if first else "I-") + entity_type
+            first = False
+    return labels
+
+
+def set_span(labels, start, end, entity_type):
+    """Return labels with tokens start..end (inclusive) set to one entity"""
+    labels = list(labels)
+    for j in range(start, end + 1):
+        if entity_type == "O":
+            labels[j] = "O"
+        else:
+            labels[j] = ("B-" if j == start else "I-") + entity_type
+    # A token after the span cannot continue it
+    if end + 1 < len(labels) and labels[end + 1].startswith("I-"):
+        labels[end + 1] = "B-" + labels[end + 1][2:]
+    return labels
 
 
 class CoNLLAnnotator:
@@ -10,8 +55,12 @@ class CoNLLAnnotator:
         """
         Initialize the CoNLL annotator with a sample dataset
         """
-        self.sample = pd.read_csv(sample_path)
+        if sample_path.endswith(".parquet"):
+            self.sample = pd.read_parquet(sample_path)
+        else:
+            self.sample = pd.read_csv(sample_path)
         self.labels = []
+        self.suggestions = {}
         self.entity_types = {
             "B-PRODUCT": "Product (Beginning)",
             "I-PRODUCT": "Product (Inside)",
@@ -22,75 +71,195 @@ class CoNLLAnnotator:
             "O": "Other",
         }
 
-    def start_cli_labeling(self):
+    def _tokens(self, row):
+        tokens = row["tokens"]
+        if isinstance(tokens, str):
+            # CSV samples store the token list as its repr
+            tokens = ast.literal_eval(tokens)
+        return [str(token) for token in tokens]
+
+    def prelabel(self, nlp_pipeline, batch_size=64):
+        """
+        Suggest labels for the whole sample with a NER model
+
+        Messages go to ``nlp_pipeline`` (an NERInferenceEngine or a
+        transformers pipeline) as lists of space-joined tokens, so
+        annotation only confirms or corrects the suggested spans.
+        """
+        rows = list(self.sample.iterrows())
+        for start in range(0, len(rows), batch_size):
+            batch = [
+                (row["message_id"], self._tokens(row))
+                for _, row in rows[start : start + batch_size]
+            ]
+            outputs = nlp_pipeline([" ".join(tokens) for _, tokens in batch])
+            for (message_id, tokens), entities in zip(batch, outputs):
+                self.suggestions[message_id] = spans_to_labels(tokens, entities)
+        return len(self.suggestions)
+
+    def _progress_path(self, output_path):
+        return output_path + ".progress"
+
+    def _resume(self, output_path):
+        """
+        Read finished messages from the progress file
+
+        Each line records a message id, the size of the CoNLL file after
+        its sentence was appended, and the seconds spent on it. The CoNLL
+        file is cut back to the last recorded size, dropping a sentence
+        whose write was interrupted. A CoNLL file without a progress file
+        (labeled elsewhere, or by an older version) is kept as it is: its
+        size is recorded with no message id and new sentences follow it.
+        """
+        done, seconds, size = set(), 0.0, 0
+        progress_path = self._progress_path(output_path)
+        if not os.path.exists(progress_path):
+            if os.path.exists(output_path) and os.path.getsize(output_path):
+                size = os.path.getsize(output_path)
+                with open(progress_path, "w", encoding="utf-8") as f:
+                    record = {"message_id": None, "size": size, "seconds": 0.0}
+                    f.write(json.dumps(record) + "\n")
+                print(
+                    f"{output_path} has no progress file; appending after its "
+                    f"{size} bytes"
+                )
+            return done, seconds
+        with open(progress_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash
+                    break
+                if record["message_id"] is not None:
+                    done.add(str(record["message_id"]))
+                seconds += record["seconds"]
+                size = record["size"]
+        if os.path.exists(output_path) and os.path.getsize(output_path) > size:
+            with open(output_path, "r+b") as f:
+                f.truncate(size)
+        return done, seconds
+
+    def _show(self, tokens, labels):
+        for j, (token, label) in enumerate(zip(tokens, labels)):
+            print(f"{j+1:>3} {token:<20} {label}")
+
+    def _edit(self, tokens, labels, input_fn):
         """
-        Start command-line interface for labeling tokens
+        Confirm or correct labels; returns None to quit
+
+        Enter accepts. ``3 r`` or ``3-4 r`` labels tokens 3 to 4 as a
+        span (p=PRODUCT, l=LOC, r=PRICE, o=O), ``u`` undoes the last edit
+        and ``q`` stops the session.
+        """
+        history = []
+        while True:
+            self._show(tokens, labels)
+            choice = input_fn("Enter=accept, '3-4 r' edit, u=undo, q=quit: ").strip()
+            if not choice:
+                return labels
+            if choice.lower() == "q":
+                return None
+            if choice.lower() == "u":
+                if history:
+                    labels = history.pop()
+                continue
+            try:
+                span, key = choice.split()
+                first, _, last = span.partition("-")
+                start, end = int(first) - 1, int(last or first) - 1
+                if not 0 <= start <= end < len(tokens):
+                    raise ValueError
+                entity_type = ENTITY_KEYS[key.lower()]
+            except (KeyError, ValueError):
+                print(f"Could not read {choice!r}")
+                continue
+            history.append(labels)
+            labels = set_span(labels, start, end, entity_type)
+
+    def start_cli_labeling(
+        self, output_path="labeled_data.conll", input_fn=input, clear=True
+    ):
+        """
+        Start command-line interface for labeling messages
+
+        Every finished message is appended to ``output_path`` at once,
+        and a rerun resumes after the messages already labeled there.
         """
         print("Starting CoNLL Annotation Tool")
         print("=" * 60)
         print("Entity Types:")
-        for code, label in self.entity_types.items():
-            print(f"{code}: {label}")
+        for key, entity_type in ENTITY_KEYS.items():
+            print(f"{key}: {entity_type}")
         print("=" * 60)
-        print(f"Total messages to label: {len(self.sample)}")
-
-        for i, row in self.sample.iterrows():
-            os.system("cls" if os.name == "nt" else "clear")
-            print(f"Message {i+1}/{len(self.sample)}")
-            print(f"ID: {row['message_id']}")
-            print("-" * 60)
-            print(row["cleaned_text"])
-            print("-" * 60)
-
-            tokens = ast.literal_eval(row["tokens"])
-            message_labels = []
-
-            for j, token in enumerate(tokens):
-                print(f"\nToken {j+1}/{len(tokens)}: {token}")
-                print("Select label:")
-                for code in self.entity_types:
-                    print(f"{code[0]} - {code}")
-
-                choice = input("Choice (or 'b' to go back): ").upper()
-                if choice == "B":
-                    if message_labels:
-                        message_labels.pop()
-                    tokens = tokens[: len(message_labels)]
-                    if tokens:
-                        token = tokens[-1]
-                        j = len(tokens) - 1
-                        print(f"\nRepeating token {j+1}/{len(tokens)}: {token}")
-                    continue
-
-                if choice in [k[0] for k in self.entity_types]:
-                    label_code = [k for k in self.entity_types if k.startswith(choice)][
-                        0
-                    ]
-                    message_labels.append((token, label_code))
-                else:
-                    message_labels.append((token, "O"))
-
-            self.labels.append(
-                {
-                    "message_id": row["message_id"],
-                    "tokens": tokens,
-                    "labels": [l[1] for l in message_labels],
-                }
-            )
-            print(f"Message {i+1} completed!")
-
-        print("\nLabeling complete! Saving results...")
-        self.save_to_conll()
+
+        done, seconds = self._resume(output_path)
+        remaining = [
+            row
+            for _, row in self.sample.iterrows()
+            if str(row["message_id"]) not in done
+        ]
+        print(f"Messages to label: {len(remaining)} ({len(done)} already done)")
+
+        with open(output_path, "ab") as conll, open(
+            self._progress_path(output_path), "a", encoding="utf-8"
+        ) as progress:
+            for i, row in enumerate(remaining):
+                if clear:
+                    os.system("cls" if os.name == "nt" else "clear")
+                print(f"Message {len(done) + i + 1}/{len(self.sample)}")
+                print(f"ID: {row['message_id']}")
+                print("-" * 60)
+                print(row["cleaned_text"])
+                print("-" * 60)
+
+                tokens = self._tokens(row)
+                started = time.perf_counter()
+                labels = self._edit(
+                    tokens,
+                    self.suggestions.get(row["message_id"], ["O"] * len(tokens)),
+                    input_fn,
+                )
+                if labels is None:
+                    print("Stopped; rerun to resume")
+                    break
+                elapsed = time.perf_counter() - started
+
+                conll.write(format_conll(tokens, labels).encode("utf-8"))
+                conll.flush()
+                os.fsync(conll.fileno())
+                progress.write(
+                    json.dumps(
+                        {
+                            "message_id": str(row["message_id"]),
+                            "size": conll.tell(),
+                            "seconds": round(elapsed, 3),
+                        }
+                    )
+                    + "\n"
+                )
+                progress.flush()
+                self.labels.append(
+                    {
+                        "message_id": row["message_id"],
+                        "tokens": tokens,
+                        "labels": labels,
+                    }
+                )
+                seconds += elapsed
+
+        labeled = len(done) + len(self.labels)
+        rate = labeled / seconds * 3600 if seconds else 0.0
+        print(f"Labeled {labeled} messages, {rate:.0f} messages/hour")
+        return {"labeled": labeled, "seconds": seconds, "messages_per_hour": rate}
 
     def save_to_conll(self, output_path="labeled_data.conll"):
         """
         Save labeled data to CoNLL format file
         """
-        with open(output_path, "w", encoding="utf-8") as f:
-            for item in self.labels:
-                for token, label in zip(item["tokens"], item["labels"]):
-                    f.write(f"{token}\t{label}\n")
-                f.write("\n")
+        write_conll(
+            ((item["tokens"], item["labels"]) for item in self.labels), output_path
+        )
         print(f"Saved {len(self.labels)} messages to {output_path}")
         print("You can now proceed to model training with this file")
 
@@ -102,6 +271,11 @@ def main():
         return
 
     annotator = CoNLLAnnotator()
+    if len(sys.argv) > 1:
+        # Optional model directory for pre-labeling
+        from scripts.ner_inference import NERInferenceEngine
+
+        annotator.prelabel(NERInferenceEngine(sys.argv[1]))
     annotator.start_cli_labeling()
 
 
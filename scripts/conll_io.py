@@ -0,0 +1,183 @@
+import argparse
+import json
+import os
+from array import array
+
+import numpy as np
+
+# File names inside a compact CoNLL directory
+VOCAB_FILE = "vocab.txt"
+LABELS_FILE = "labels.json"
+TOKEN_IDS_FILE = "token_ids.npy"
+LABEL_IDS_FILE = "label_ids.npy"
+OFFSETS_FILE = "offsets.npy"
+
+
+def iter_conll(file_path):
+    """Lazily yield (tokens, labels) sentences from a CoNLL file"""
+    tokens, labels = [], []
+    with open(file_path, "r", encoding="utf-8", buffering=1 << 20) as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                if tokens:
+                    yield tokens, labels
+                    tokens, labels = [], []
+            else:
+                tokens.append(parts[0])
+                labels.append(parts[1])
+    if tokens:
+        yield tokens, labels
+
+
+def format_conll(tokens, labels):
+    """One CoNLL sentence block, ending with its blank line"""
+    return "".join(f"{token}\t{label}\n" for token, label in zip(tokens, labels)) + "\n"
+
+
+def write_conll(sentences, output_path):
+    """Write (tokens, labels) sentences to a CoNLL file, one write per sentence"""
+    count = 0
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        for tokens, labels in sentences:
+            f.write(format_conll(tokens, labels))
+            count += 1
+    return count
+
+
+def conll_to_compact(conll_path, output_dir):
+    """Convert a CoNLL file into the compact memory-mappable format
+
+    The directory holds the token vocabulary (one token per line), the
+    label list, int32 token ids and int16 label ids for every token, and
+    int64 sentence offsets into those arrays.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    vocab, label_list = {}, {}
+    token_ids, label_ids = array("i"), array("h")
+    offsets = array("q", [0])
+
+    for tokens, labels in iter_conll(conll_path):
+        for token, label in zip(tokens, labels):
+            token_ids.append(vocab.setdefault(token, len(vocab)))
+            label_ids.append(label_list.setdefault(label, len(label_list)))
+        offsets.append(len(token_ids))
+
+    with open(os.path.join(output_dir, VOCAB_FILE), "w", encoding="utf-8") as f:
+        f.write("".join(f"{token}\n" for token in vocab))
+    with open(os.path.join(output_dir, LABELS_FILE), "w", encoding="utf-8") as f:
+        json.dump(list(label_list), f, ensure_ascii=False)
+    np.save(
+        os.path.join(output_dir, TOKEN_IDS_FILE), np.frombuffer(token_ids, np.int32)
+    )
+    np.save(
+        os.path.join(output_dir, LABEL_IDS_FILE), np.frombuffer(label_ids, np.int16)
+    )
+    np.save(os.path.join(output_dir, OFFSETS_FILE), np.frombuffer(offsets, np.int64))
+    return len(offsets) - 1
+
+
+class CompactCoNLL:
+    """Memory-mapped view of a corpus written by conll_to_compact
+
+    Opening only maps the arrays, so sentences are decoded on access and
+    even very large corpora load instantly.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.token_ids = np.load(os.path.join(path, TOKEN_IDS_FILE), mmap_mode="r")
+        self.label_ids = np.load(os.path.join(path, LABEL_IDS_FILE), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(path, LABELS_FILE), "r", encoding="utf-8") as f:
+            self.label_list = json.load(f)
+        self._vocab = None
+
+    @property
+    def vocab(self):
+        """Token strings indexed by token id, read on first use"""
+        if self._vocab is None:
+            with open(os.path.join(self.path, VOCAB_FILE), "r", encoding="utf-8") as f:
+                self._vocab = f.read().split("\n")[:-1]
+        return self._vocab
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def sentence_ids(self, index):
+        """Return the (token_ids, label_ids) arrays of one sentence"""
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.token_ids[start:end], self.label_ids[start:end]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        token_ids, label_ids = self.sentence_ids(index)
+        vocab, label_list = self.vocab, self.label_list
+        return [vocab[i] for i in token_ids], [label_list[i] for i in label_ids]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def to_arrow(self):
+        """Return a pyarrow Table with list<string> 'tokens' and 'ner_tags'
+
+        Built from the id and offset arrays without per-sentence Python
+        objects, so it is the fast way into a Hugging Face Dataset.
+        """
+        import pyarrow as pa
+
+        # 32-bit list offsets unless the corpus exceeds 2**31 tokens
+        if len(self.offsets) and self.offsets[-1] >= 2**31:
+            list_array, offsets = pa.LargeListArray, pa.array(self.offsets)
+        else:
+            list_array = pa.ListArray
+            offsets = pa.array(np.asarray(self.offsets, dtype=np.int32))
+        vocab = pa.array(self.vocab, type=pa.string())
+        labels = pa.array(self.label_list, type=pa.string())
+        tokens = vocab.take(pa.array(np.asarray(self.token_ids)))
+        tags = labels.take(pa.array(np.asarray(self.label_ids, dtype=np.int32)))
+        return pa.table(
+            {
+                "tokens": list_array.from_arrays(offsets, tokens),
+                "ner_tags": list_array.from_arrays(offsets, tags),
+            }
+        )
+
+    def to_dict(self):
+        """Return {'tokens': [...], 'ner_tags': [...]} like load_conll_data"""
+        vocab = np.asarray(self.vocab, dtype=object)
+        labels = np.asarray(self.label_list, dtype=object)
+        tokens = vocab[self.token_ids].tolist()
+        tags = labels[self.label_ids].tolist()
+        bounds = self.offsets.tolist()
+        return {
+            "tokens": [tokens[s:e] for s, e in zip(bounds, bounds[1:])],
+            "ner_tags": [tags[s:e] for s, e in zip(bounds, bounds[1:])],
+        }
+
+
+def compact_to_conll(compact_path, conll_path):
+    """Convert a compact corpus back to a CoNLL file"""
+    return write_conll(CompactCoNLL(compact_path), conll_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert CoNLL corpora")
+    parser.add_argument("command", choices=["to-compact", "to-conll"])
+    parser.add_argument("source")
+    parser.add_argument("target")
+    args = parser.parse_args()
+
+    if args.command == "to-compact":
+        count = conll_to_compact(args.source, args.target)
+    else:
+        count = compact_to_conll(args.source, args.target)
+    print(f"Converted {count} sentences to {args.target}")
+
+
+if __name__ == "__main__":
+    main()
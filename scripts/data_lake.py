@@ -0,0 +1,163 @@
+import os
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from scripts.message_sink import raw_message_schema
+from scripts.preprocessor import MESSAGE_COLUMNS
+
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+
+def partitioning():
+    """Hive-style channel=.../month=YYYY-MM directory layout
+
+    Months rather than days: a vendor channel posts tens of messages a
+    day, and day partitions would leave thousands of tiny files whose
+    discovery costs more than the reads they save.
+    """
+    return ds.partitioning(
+        pa.schema([("channel", pa.string()), ("month", pa.string())]), flavor="hive"
+    )
+
+
+def preprocessed_schema():
+    """Arrow schema of AmharicPreprocessor output, with list columns"""
+    return pa.schema(
+        [
+            ("message_id", pa.int64()),
+            ("channel", pa.string()),
+            ("timestamp", TIMESTAMP),
+            ("views", pa.int64()),
+            ("media_path", pa.string()),
+            ("original_length", pa.int64()),
+            ("raw_text", pa.string()),
+            ("normalized_text", pa.string()),
+            ("cleaned_text", pa.string()),
+            ("tokens", pa.list_(pa.string())),
+            ("token_count", pa.int64()),
+            ("contains_price", pa.int8()),
+            ("contains_location", pa.int8()),
+            ("contains_product", pa.int8()),
+            ("price_value", pa.float64()),
+            ("location_mentioned", pa.list_(pa.string())),
+        ]
+    )
+
+
+def _timestamps(values):
+    """Parse ISO date strings once into UTC timestamps"""
+    parsed = pd.to_datetime(
+        pd.Series(values, dtype=object), utc=True, format="ISO8601", errors="coerce"
+    )
+    return pa.array(parsed, type=TIMESTAMP)
+
+
+def _write(table, root, timestamp_column):
+    # Sorted rows give tight row group statistics for time filters
+    table = table.sort_by(timestamp_column)
+    month = pc.strftime(table.column(timestamp_column), format="%Y-%m")
+    table = table.append_column("month", month)
+    ds.write_dataset(
+        table,
+        root,
+        format="parquet",
+        partitioning=partitioning(),
+        # A unique name per write, so appends never replace earlier files
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        # A backfill spans many channel/month pairs in one write
+        max_partitions=1 << 16,
+    )
+    # Written even for no rows, so read_messages can return a typed empty
+    # frame; dataset discovery skips files starting with "_"
+    os.makedirs(root, exist_ok=True)
+    pq.write_metadata(table.schema, os.path.join(root, "_common_metadata"))
+    return table.num_rows
+
+
+def write_raw_messages(messages, root, channel):
+    """Append scraped message dicts for one channel to the raw dataset
+
+    ``channel`` is the handle (e.g. "@shop"), the key the preprocessed
+    dataset and the scorecard use, so the datasets filter and join alike.
+    """
+    table = pa.Table.from_pylist(list(messages), schema=raw_message_schema())
+    index = table.schema.get_field_index("date")
+    table = table.set_column(
+        index, pa.field("date", TIMESTAMP), _timestamps(table.column("date"))
+    )
+    table = table.append_column("channel", pa.array([channel] * table.num_rows))
+    return _write(table, root, "date")
+
+
+def write_preprocessed(df, root):
+    """Append a preprocessed DataFrame to the preprocessed dataset"""
+    df = df[MESSAGE_COLUMNS].copy()
+    df["timestamp"] = _timestamps(df["timestamp"]).to_pandas()
+    for name in ("tokens", "location_mentioned"):
+        # Lists may come back from Parquet as arrays
+        df[name] = [None if v is None else list(v) for v in df[name]]
+    table = pa.Table.from_pandas(df, schema=preprocessed_schema(), preserve_index=False)
+    return _write(table, root, "timestamp")
+
+
+def _utc(value):
+    value = pd.Timestamp(value)
+    return value.tz_localize("UTC") if value.tzinfo is None else value.tz_convert("UTC")
+
+
+def _empty_frame(root, columns=None):
+    schema = pq.read_schema(os.path.join(root, "_common_metadata"))
+    # Partition columns come last, as in a discovered dataset
+    table = pa.schema(
+        [field for field in schema if field.name not in ("channel", "month")]
+        + list(partitioning().schema)
+    ).empty_table()
+    if columns is not None:
+        table = table.select(columns)
+    return table.to_pandas()
+
+
+def read_messages(
+    root, channels=None, since=None, until=None, columns=None, filter=None
+):
+    """Read a raw or preprocessed dataset into a DataFrame
+
+    ``channels`` and the ``since`` (inclusive) / ``until`` (exclusive)
+    dates or timestamps prune whole partition directories, then row
+    groups by their statistics. ``columns`` projects columns, so only
+    those are read, and ``filter`` adds any pyarrow.dataset expression,
+    e.g. ``ds.field("views") > 1000``. A dataset that has had no rows
+    yet gives an empty frame with its columns.
+    """
+    dataset = ds.dataset(root, format="parquet", partitioning=partitioning())
+    if not dataset.files:
+        return _empty_frame(root, columns)
+    # Raw messages keep Telegram's "date", preprocessed ones "timestamp"
+    time_field = ds.field(
+        "timestamp" if "timestamp" in dataset.schema.names else "date"
+    )
+    conditions = []
+    if channels is not None:
+        if isinstance(channels, str):
+            channels = [channels]
+        conditions.append(ds.field("channel").isin(list(channels)))
+    if since is not None:
+        since = _utc(since)
+        conditions.append(ds.field("month") >= since.strftime("%Y-%m"))
+        conditions.append(time_field >= pa.scalar(since, type=TIMESTAMP))
+    if until is not None:
+        until = _utc(until)
+        conditions.append(ds.field("month") <= until.strftime("%Y-%m"))
+        conditions.append(time_field < pa.scalar(until, type=TIMESTAMP))
+    if filter is not None:
+        conditions.append(filter)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
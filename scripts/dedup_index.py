@@ -0,0 +1,291 @@
+import os
+import sqlite3
+import zlib
+
+import numpy as np
+import pandas as pd
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingles(tokens, size=3):
+    """Token n-grams of a message; short messages give one shingle"""
+    if len(tokens) <= size:
+        return ["\x1f".join(tokens)] if tokens else []
+    return ["\x1f".join(tokens[i : i + size]) for i in range(len(tokens) - size + 1)]
+
+
+class DedupIndex:
+    """Persistent MinHash/LSH index of near-duplicate messages
+
+    Each message's token shingles are MinHashed into ``num_perm`` values
+    and split into ``bands`` LSH bands. A SQLite table maps every band
+    bucket to the cluster that first used it. A lookup is therefore one
+    indexed read per band, whatever the size of the index. Candidate
+    clusters are confirmed by comparing against the signature of the
+    cluster's first message. The message joins the most similar cluster
+    at or above ``threshold``, or starts a new one. Signatures are
+    stored per cluster rather than per message, so the index stays
+    small with tens of millions of messages. Messages are hashed
+    ``chunk_size`` at a time, which bounds the hashing memory whatever
+    the number of messages added in one call.
+    """
+
+    def __init__(
+        self,
+        path,
+        num_perm=128,
+        bands=16,
+        threshold=0.7,
+        shingle_size=3,
+        seed=1,
+        chunk_size=2048,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.chunk_size = chunk_size
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=(num_perm, 1), dtype=np.uint64)
+        # Odd multipliers that fold each band's rows into one 64-bit key
+        self._band_mix = rng.randint(1, 1 << 62, size=self.rows, dtype=np.uint64) | 1
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER NOT NULL,
+                key INTEGER NOT NULL,
+                cluster_id INTEGER NOT NULL,
+                PRIMARY KEY (band, key)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS clusters (
+                cluster_id INTEGER PRIMARY KEY,
+                signature BLOB NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                channel TEXT NOT NULL,
+                message_id INTEGER NOT NULL,
+                cluster_id INTEGER NOT NULL,
+                PRIMARY KEY (channel, message_id)
+            ) WITHOUT ROWID;
+            """)
+        self._check_params(
+            {
+                "num_perm": num_perm,
+                "bands": bands,
+                "shingle_size": shingle_size,
+                "seed": seed,
+            }
+        )
+
+    def _check_params(self, params):
+        """Refuse to reopen an index built with different hashing settings"""
+        stored = dict(self.conn.execute("SELECT key, value FROM meta"))
+        if not stored:
+            self.conn.executemany(
+                "INSERT INTO meta VALUES (?, ?)",
+                ((key, str(value)) for key, value in params.items()),
+            )
+            self.conn.commit()
+            return
+        for key, value in params.items():
+            if stored.get(key) != str(value):
+                raise ValueError(
+                    f"Index at {self.path} was built with {key}={stored.get(key)}"
+                )
+
+    def signatures(self, token_lists):
+        """Return (signatures, present): uint32 MinHash rows per message and a
+        mask of the messages that had any tokens"""
+        token_lists = list(token_lists)
+        result = np.zeros((len(token_lists), self.num_perm), dtype=np.uint32)
+        present = np.zeros(len(token_lists), dtype=bool)
+        for start in range(0, len(token_lists), self.chunk_size):
+            chunk = slice(start, start + self.chunk_size)
+            result[chunk], present[chunk] = self._chunk_signatures(token_lists[chunk])
+        return result, present
+
+    def _chunk_signatures(self, token_lists):
+        hashes, counts = [], []
+        for tokens in token_lists:
+            message_shingles = shingles(list(tokens), self.shingle_size)
+            hashes.extend(zlib.crc32(s.encode("utf-8")) for s in message_shingles)
+            counts.append(len(message_shingles))
+        counts = np.array(counts, dtype=np.int64)
+        result = np.zeros((len(counts), self.num_perm), dtype=np.uint32)
+        if not hashes:
+            return result, counts > 0
+
+        values = np.array(hashes, dtype=np.uint64)
+        # In place, so the (num_perm, shingles) array exists only once
+        permuted = self._a * values
+        permuted += self._b
+        permuted %= MERSENNE_PRIME
+        permuted &= MAX_HASH
+        # Minimum over each message's shingles, skipping empty messages
+        present = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[present]
+        result[present] = np.minimum.reduceat(permuted, starts, axis=1).T
+        return result, present
+
+    def _band_keys(self, signatures):
+        bands = signatures.reshape(len(signatures), self.bands, self.rows)
+        keys = (bands.astype(np.uint64) * self._band_mix).sum(axis=2, dtype=np.uint64)
+        return keys.view(np.int64)
+
+    def _similarity(self, signature, cluster_signature):
+        return float(np.mean(signature == cluster_signature))
+
+    def _match(self, signature, keys):
+        """Best matching cluster id for a signature, or None"""
+        candidates = set()
+        for band, key in enumerate(keys.tolist()):
+            row = self.conn.execute(
+                "SELECT cluster_id FROM buckets WHERE band = ? AND key = ?",
+                (band, key),
+            ).fetchone()
+            if row is not None:
+                candidates.add(row[0])
+
+        best, best_similarity = None, self.threshold
+        for cluster_id in candidates:
+            (blob,) = self.conn.execute(
+                "SELECT signature FROM clusters WHERE cluster_id = ?", (cluster_id,)
+            ).fetchone()
+            similarity = self._similarity(
+                signature, np.frombuffer(blob, dtype=np.uint32)
+            )
+            if similarity >= best_similarity:
+                best, best_similarity = cluster_id, similarity
+        return best
+
+    def add_many(self, channels, message_ids, token_lists):
+        """Index messages and return their cluster ids
+
+        Messages already in the index keep their cluster; messages without
+        tokens get None. Runs in one transaction.
+        """
+        channels = [str(channel) for channel in channels]
+        message_ids = [int(message_id) for message_id in message_ids]
+        token_lists = list(token_lists)
+        cluster_ids = []
+
+        with self.conn:
+            for start in range(0, len(token_lists), self.chunk_size):
+                end = start + self.chunk_size
+                cluster_ids.extend(
+                    self._add_chunk(
+                        channels[start:end],
+                        message_ids[start:end],
+                        token_lists[start:end],
+                    )
+                )
+        return cluster_ids
+
+    def _add_chunk(self, channels, message_ids, token_lists):
+        signatures, present = self._chunk_signatures(token_lists)
+        keys = self._band_keys(signatures)
+        cluster_ids = []
+        for i, (channel, message_id) in enumerate(zip(channels, message_ids)):
+            row = self.conn.execute(
+                "SELECT cluster_id FROM messages WHERE channel = ? AND message_id = ?",
+                (channel, message_id),
+            ).fetchone()
+            if row is not None or not present[i]:
+                cluster_ids.append(row[0] if row else None)
+                continue
+
+            cluster_id = self._match(signatures[i], keys[i])
+            if cluster_id is None:
+                cluster_id = self.conn.execute(
+                    "INSERT INTO clusters (signature, size) VALUES (?, 0)",
+                    (signatures[i].tobytes(),),
+                ).lastrowid
+            self.conn.execute(
+                "UPDATE clusters SET size = size + 1 WHERE cluster_id = ?",
+                (cluster_id,),
+            )
+            self.conn.execute(
+                "INSERT INTO messages VALUES (?, ?, ?)",
+                (channel, message_id, cluster_id),
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)",
+                ((band, key, cluster_id) for band, key in enumerate(keys[i].tolist())),
+            )
+            cluster_ids.append(cluster_id)
+        return cluster_ids
+
+    def add(self, channel, message_id, tokens):
+        """Index one message and return its cluster id"""
+        return self.add_many([channel], [message_id], [tokens])[0]
+
+    def query(self, tokens):
+        """Cluster id of the closest indexed duplicate, without inserting"""
+        signatures, present = self.signatures([tokens])
+        if not present[0]:
+            return None
+        return self._match(signatures[0], self._band_keys(signatures)[0])
+
+    def cluster_sizes(self, cluster_ids):
+        """Return {cluster_id: number of indexed messages}"""
+        sizes = {}
+        ids = [int(c) for c in set(cluster_ids) if c is not None]
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            sizes.update(
+                self.conn.execute(
+                    "SELECT cluster_id, size FROM clusters WHERE cluster_id IN "
+                    f"({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+            )
+        return sizes
+
+    def stats(self):
+        """Return message and cluster counts"""
+        (messages,) = self.conn.execute("SELECT COUNT(*) FROM messages").fetchone()
+        (clusters,) = self.conn.execute("SELECT COUNT(*) FROM clusters").fetchone()
+        return {"messages": messages, "clusters": clusters}
+
+    def close(self):
+        self.conn.close()
+
+
+def assign_clusters(df, index, collapse=False, tokens_column="tokens"):
+    """Add a cluster_id column from a DedupIndex, optionally collapsing
+
+    ``df`` is a preprocessed frame (message_id, channel and tokens
+    columns). With ``collapse=True`` only the first message of each
+    cluster is kept and a cluster_size column counts the rows it
+    stands for. Messages without tokens are never collapsed.
+    """
+    df = df.copy()
+    df["cluster_id"] = pd.array(
+        index.add_many(df["channel"], df["message_id"], df[tokens_column]),
+        dtype="Int64",
+    )
+    if not collapse:
+        return df
+
+    clustered = df["cluster_id"].notna()
+    sizes = df["cluster_id"].value_counts()
+    df["cluster_size"] = df["cluster_id"].map(sizes).fillna(1).astype(int)
+    return df[~clustered | ~df["cluster_id"].duplicated()]
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+
+def content_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _clean_entity(entity):
+    """Keep the JSON-serializable fields of a pipeline entity"""
+    return {
+        "entity_group": entity["entity_group"],
+        "word": entity["word"],
+        "start": int(entity["start"]) if entity.get("start") is not None else None,
+        "end": int(entity["end"]) if entity.get("end") is not None else None,
+        "score": float(entity["score"]),
+    }
+
+
+class EntityCache:
+    """SQLite cache of NER results per message
+
+    Rows are keyed by channel, message id and model version, and store the
+    hash of the text they were computed from. A message only goes through
+    the model again when it is new, its text changed or the model version
+    differs.
+    """
+
+    def __init__(self, path, model_version, batch_size=256):
+        self.path = path
+        self.model_version = str(model_version)
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entities (
+                channel TEXT NOT NULL,
+                message_id INTEGER NOT NULL,
+                model_version TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                entities TEXT NOT NULL,
+                PRIMARY KEY (channel, message_id, model_version)
+            )
+            """)
+        self.conn.commit()
+
+    def _lookup(self, channel, message_ids):
+        rows = {}
+        ids = list(message_ids)
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows.update(
+                (row[0], (row[1], row[2]))
+                for row in self.conn.execute(
+                    f"""
+                    SELECT message_id, content_hash, entities FROM entities
+                    WHERE channel = ? AND model_version = ?
+                    AND message_id IN ({placeholders})
+                    """,
+                    (channel, self.model_version, *chunk),
+                )
+            )
+        return rows
+
+    def extract(self, channels, message_ids, texts, nlp_pipeline):
+        """Return the entity list of every message, running only cache misses
+
+        Misses are sent to ``nlp_pipeline`` as lists of texts, one model
+        pass per message for all entity types, and stored as they finish.
+        """
+        texts = ["" if not isinstance(text, str) else text for text in texts]
+        hashes = [content_hash(text) for text in texts]
+        results = [None] * len(texts)
+
+        by_channel = {}
+        for i, (channel, message_id) in enumerate(zip(channels, message_ids)):
+            by_channel.setdefault(str(channel), []).append((i, int(message_id)))
+
+        missing = []
+        for channel, items in by_channel.items():
+            cached = self._lookup(channel, {message_id for _, message_id in items})
+            for i, message_id in items:
+                hit = cached.get(message_id)
+                if hit is not None and hit[0] == hashes[i]:
+                    results[i] = json.loads(hit[1])
+                else:
+                    missing.append((i, channel, message_id))
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start : start + self.batch_size]
+            outputs = nlp_pipeline([texts[i] for i, _, _ in batch])
+            rows = []
+            for (i, channel, message_id), entities in zip(batch, outputs):
+                results[i] = [_clean_entity(entity) for entity in entities]
+                rows.append(
+                    (
+                        channel,
+                        message_id,
+                        self.model_version,
+                        hashes[i],
+                        json.dumps(results[i], ensure_ascii=False),
+                    )
+                )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self.conn.commit()
+        return results
+
+    def stats(self):
+        """Return hit and miss counts and the number of cached rows"""
+        (rows,) = self.conn.execute("SELECT COUNT(*) FROM entities").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "rows": rows}
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,296 @@
+import atexit
+import cProfile
+import functools
+import inspect
+import json
+import math
+import os
+import platform
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Sub-buckets per power of two in latency histograms (~19% wide each)
+_SUB_BUCKETS = 4
+
+
+class Histogram:
+    """Log-bucketed latency histogram with exact count, sum, min and max
+
+    Buckets split every power of two of microseconds into four, so
+    percentiles are estimated to within about 10% using a few hundred
+    integer counters at most.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = Counter()
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        mantissa, exponent = math.frexp(max(seconds * 1e6, 1e-3))
+        self.buckets[
+            exponent * _SUB_BUCKETS + int((mantissa - 0.5) * 2 * _SUB_BUCKETS)
+        ] += 1
+
+    def _bucket_mid(self, index):
+        exponent, sub = divmod(index, _SUB_BUCKETS)
+        low = math.ldexp(0.5 + sub / (2 * _SUB_BUCKETS), exponent)
+        high = math.ldexp(0.5 + (sub + 1) / (2 * _SUB_BUCKETS), exponent)
+        return (low + high) / 2 / 1e6
+
+    def percentile(self, q):
+        """Estimated q-th percentile (0-100) in seconds"""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(max(self._bucket_mid(index), self.min), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "mean_s": self.total / self.count if self.count else 0.0,
+            "min_s": self.min if self.count else 0.0,
+            "p50_s": self.percentile(50),
+            "p90_s": self.percentile(90),
+            "p99_s": self.percentile(99),
+            "max_s": self.max,
+        }
+
+
+class Metrics:
+    """Counters and latency histograms for one pipeline run
+
+    Disabled by default: ``timed`` functions then make one flag check
+    before calling through, and ``incr``/``observe`` return at once.
+    Updates take a lock, since scraper media workers and NER threads
+    report concurrently.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = Counter()
+            self.histograms = {}
+            self.started = time.time()
+
+    def incr(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += value
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        """Time a block of code into the ``name`` histogram"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def summary(self):
+        """JSON-serializable snapshot of the run so far"""
+        with self._lock:
+            return {
+                "meta": {
+                    "started": datetime.fromtimestamp(
+                        self.started, timezone.utc
+                    ).isoformat(),
+                    "seconds": time.time() - self.started,
+                    "python": platform.python_version(),
+                    "pid": os.getpid(),
+                    "argv": sys.argv,
+                },
+                "counters": dict(sorted(self.counters.items())),
+                "timings": {
+                    name: histogram.summary()
+                    for name, histogram in sorted(self.histograms.items())
+                },
+            }
+
+    def dump(self, path):
+        """Write the summary as JSON and return it"""
+        summary = self.summary()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+# Process-wide registry the instrumented modules report to
+metrics = Metrics()
+
+
+def enable(dump_path=None):
+    """Start collecting; with ``dump_path`` the summary is written at exit"""
+    metrics.enabled = True
+    if dump_path:
+        atexit.register(metrics.dump, dump_path)
+
+
+def disable():
+    metrics.enabled = False
+
+
+def timed(name=None):
+    """Decorator recording every call's latency, for sync and async functions
+
+    ``name`` defaults to ``<module>.<qualified name>``.
+    """
+
+    def decorate(fn):
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not metrics.enabled:
+                    return await fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    metrics.observe(label, time.perf_counter() - start)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metrics.observe(label, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorate
+
+
+async def timed_aiter(aiterable, name):
+    """Yield from an async iterable, timing each wait for the next item
+
+    Unlike timing a whole ``async for`` loop, this leaves out the time the
+    consumer spends on each item.
+    """
+    iterator = aiterable.__aiter__()
+    while True:
+        start = time.perf_counter()
+        try:
+            item = await iterator.__anext__()
+        except StopAsyncIteration:
+            return
+        metrics.observe(name, time.perf_counter() - start)
+        yield item
+
+
+@contextmanager
+def profile(path):
+    """Run a block under cProfile and save the stats to ``path``
+
+    The file loads with ``pstats``, snakeviz or ``python -m pstats``.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+class StackSampler:
+    """Background sampler of one thread's Python stack
+
+    Every ``interval`` seconds the target thread's stack is recorded, and
+    ``write_collapsed`` writes the counts in the collapsed-stack format
+    that py-spy, flamegraph.pl and speedscope read. This shows where a
+    slow run spends its time when py-spy cannot attach, e.g. without
+    ptrace rights.
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.main_thread().ident
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                    f":{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def write_collapsed(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+# PIPELINE_METRICS=<path> turns collection on for a whole run
+if os.environ.get("PIPELINE_METRICS"):
+    enable(os.environ["PIPELINE_METRICS"])
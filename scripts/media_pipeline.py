@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import deque
+
+from telethon.tl.types import MessageMediaDocument, MessageMediaPhoto
+
+
+def _photo_size(photo):
+    """Largest byte size among a photo's stored sizes, if known"""
+    size = None
+    for photo_size in getattr(photo, "sizes", None) or []:
+        # Progressive JPEGs list several sizes; stripped thumbnails have none
+        candidates = getattr(photo_size, "sizes", None) or [
+            getattr(photo_size, "size", None) or 0
+        ]
+        size = max(size or 0, max(candidates))
+    return size
+
+
+def media_info(message):
+    """Return (media_type, extension, telegram_file_id, size) for a message"""
+    media = message.media
+    if isinstance(media, MessageMediaPhoto) and media.photo is not None:
+        return "photo", "jpg", ("photo", media.photo.id), _photo_size(media.photo)
+    if isinstance(media, MessageMediaDocument) and media.document is not None:
+        doc = media.document
+        ext = doc.mime_type.split("/")[-1] if doc.mime_type else "bin"
+        return "document", ext, ("document", doc.id), getattr(doc, "size", None)
+    return None, None, None, None
+
+
+class MediaDownloader:
+    """Download message media on a bounded asyncio worker pool
+
+    Files are stored once per content hash as ``{sha256[:2]}/{sha256}.{ext}``
+    under ``media_dir``, and every download is recorded in
+    ``manifest.jsonl``. Media already seen under the same Telegram file id
+    is not downloaded again. Media larger than ``max_size`` bytes is
+    skipped or recorded in ``deferred.jsonl`` (``oversize="defer"``) for a
+    later pass. Media submitted while the queue is full waits in an
+    overflow list that refills the queue as workers free it, so callers
+    never wait on media and none of it is dropped.
+    """
+
+    def __init__(
+        self,
+        media_dir,
+        workers=4,
+        queue_size=100,
+        max_size=None,
+        oversize="defer",
+        logger=None,
+    ):
+        if oversize not in ("skip", "defer"):
+            raise ValueError("oversize must be 'skip' or 'defer'")
+        self.media_dir = media_dir
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_size = max_size
+        self.oversize = oversize
+        self.logger = logger or logging.getLogger("MediaDownloader")
+        self.stats = {
+            "queued": 0,
+            "overflow": 0,
+            "downloaded": 0,
+            "duplicates": 0,
+            "deferred": 0,
+            "skipped": 0,
+            "failed": 0,
+        }
+        self.queue = None
+        self._overflow = deque()
+        self._tasks = []
+        self._tmp_dir = os.path.join(media_dir, ".tmp")
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+        self.manifest_path = os.path.join(media_dir, "manifest.jsonl")
+        self.deferred_path = os.path.join(media_dir, "deferred.jsonl")
+        # Telegram file id -> stored path, to skip re-downloading reposts
+        self.known_files = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if entry.get("file_id"):
+                        self.known_files[tuple(entry["file_id"])] = entry["path"]
+
+    def _start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _append(self, path, entry):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def submit(self, message, channel=None):
+        """Queue a message's media without waiting; returns the media status"""
+        media_type, ext, file_id, size = media_info(message)
+        if media_type is None:
+            return None
+        if self.queue is None:
+            self._start()
+
+        entry = {
+            "message_id": message.id,
+            "channel": channel,
+            "media_type": media_type,
+            "file_id": list(file_id),
+            "size": size,
+        }
+
+        if file_id in self.known_files:
+            self.stats["duplicates"] += 1
+            self._append(
+                self.manifest_path,
+                {**entry, "path": self.known_files[file_id], "status": "duplicate"},
+            )
+            return "duplicate"
+
+        if self.max_size is not None and size is not None and size > self.max_size:
+            return self._reject(entry, "too_large")
+
+        try:
+            self.queue.put_nowait((message, ext, entry))
+        except asyncio.QueueFull:
+            self._overflow.append((message, ext, entry))
+            self.stats["overflow"] += 1
+        self.stats["queued"] += 1
+        return "queued"
+
+    def _reject(self, entry, reason):
+        if self.oversize == "defer":
+            self.stats["deferred"] += 1
+            self._append(self.deferred_path, {**entry, "reason": reason})
+            return "deferred"
+        self.stats["skipped"] += 1
+        return "skipped"
+
+    def _store(self, tmp_path, ext):
+        """Hash a downloaded file and move it to its content address"""
+        digest = hashlib.sha256()
+        with open(tmp_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+
+        target_dir = os.path.join(self.media_dir, sha256[:2])
+        os.makedirs(target_dir, exist_ok=True)
+        path = os.path.join(target_dir, f"{sha256}.{ext}")
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            return sha256, path, False
+        os.replace(tmp_path, path)
+        return sha256, path, True
+
+    async def _worker(self):
+        while True:
+            message, ext, entry = await self.queue.get()
+            tmp_path = os.path.join(
+                self._tmp_dir, f"{entry['channel']}_{message.id}_{id(message)}"
+            )
+            try:
+                file_id = tuple(entry["file_id"])
+                if file_id in self.known_files:
+                    self.stats["duplicates"] += 1
+                    entry = {
+                        **entry,
+                        "path": self.known_files[file_id],
+                        "status": "duplicate",
+                    }
+                else:
+                    # Telethon may append an extension and returns the real path
+                    tmp_path = await message.download_media(file=tmp_path) or tmp_path
+                    sha256, path, new = await asyncio.to_thread(
+                        self._store, tmp_path, ext
+                    )
+                    self.known_files[file_id] = path
+                    self.stats["downloaded" if new else "duplicates"] += 1
+                    entry = {
+                        **entry,
+                        "sha256": sha256,
+                        "path": path,
+                        "status": "downloaded" if new else "duplicate",
+                    }
+                self._append(self.manifest_path, entry)
+            except Exception as e:
+                self.stats["failed"] += 1
+                self.logger.error(f"Media download error: {str(e)}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            finally:
+                # Refill before task_done, so close() cannot see an empty
+                # queue while overflow remains
+                while self._overflow and not self.queue.full():
+                    self.queue.put_nowait(self._overflow.popleft())
+                self.queue.task_done()
+
+    async def close(self):
+        """Wait for queued downloads to finish and stop the workers"""
+        if self.queue is None:
+            return
+        await self.queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.queue = None
+        self._tasks = []
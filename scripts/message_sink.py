@@ -0,0 +1,119 @@
+import json
+import os
+
+
+def raw_message_schema():
+    """Arrow schema of the records produced by TelegramScraper"""
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("id", pa.int64()),
+            ("text", pa.string()),
+            ("date", pa.string()),
+            ("views", pa.int64()),
+            ("forwards", pa.int64()),
+            ("sender_id", pa.int64()),
+            ("media_path", pa.string()),
+            ("media_type", pa.string()),
+            ("media_status", pa.string()),
+            (
+                "reactions",
+                pa.list_(pa.struct([("emoticon", pa.string()), ("count", pa.int64())])),
+            ),
+            ("url", pa.string()),
+        ]
+    )
+
+
+class JsonlMessageSink:
+    """Append scraped messages to a JSON Lines file, flushing in batches
+
+    Every message becomes one line as soon as it is written. Lines are
+    flushed and fsynced to disk every ``batch_size`` messages and on close,
+    so a crash loses at most the current batch. ``on_flush`` is called
+    after every flush, e.g. to advance a checkpoint.
+    """
+
+    def __init__(self, path, batch_size=100, fsync=True, on_flush=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.on_flush = on_flush
+        self.count = 0
+        self._unflushed = 0
+        self.f = open(path, "a", encoding="utf-8")
+
+    def write(self, record):
+        """Append one message"""
+        self.f.write(json.dumps(record, ensure_ascii=False))
+        self.f.write("\n")
+        self.count += 1
+        self._unflushed += 1
+        if self._unflushed >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Push buffered lines to disk"""
+        self.f.flush()
+        if self.fsync:
+            os.fsync(self.f.fileno())
+        self._unflushed = 0
+        if self.on_flush is not None:
+            self.on_flush()
+
+    def close(self):
+        if not self.f.closed:
+            self.flush()
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_jsonl(path):
+    """Yield records from a JSON Lines file, skipping a torn final line"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Only the last line can be partial after a crash
+                continue
+
+
+def compact_jsonl_to_parquet(
+    jsonl_path, parquet_path=None, chunk_size=10000, dedupe=False
+):
+    """Rewrite a scraped JSONL file as Parquet, one row group per chunk
+
+    With ``dedupe=True`` only the first record of each message id is kept.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parquet_path = parquet_path or os.path.splitext(jsonl_path)[0] + ".parquet"
+    schema = raw_message_schema()
+
+    with pq.ParquetWriter(parquet_path, schema) as writer:
+        records = []
+        seen = set()
+        for record in iter_jsonl(jsonl_path):
+            if dedupe:
+                if record["id"] in seen:
+                    continue
+                seen.add(record["id"])
+            records.append(record)
+            if len(records) == chunk_size:
+                writer.write_table(pa.Table.from_pylist(records, schema=schema))
+                records = []
+        if records:
+            writer.write_table(pa.Table.from_pylist(records, schema=schema))
+
+    return parquet_path
@@ -0,0 +1,410 @@
+import json
+import os
+import sqlite3
+
+import numpy as np
+
+from scripts.entity_cache import content_hash
+from scripts.instrumentation import timed
+
+METHODS = ("occlusion", "lime", "integrated_gradients")
+
+# Kernel width of LIME's default text explainer (cosine distance)
+_LIME_KERNEL_WIDTH = 0.25
+
+
+def _lime_masks(n_samples, n_tokens, rng):
+    """Random keep-masks as LIME draws them for text
+
+    Each sample removes a uniformly drawn number of tokens. The first
+    sample keeps every token.
+    """
+    removed = rng.integers(1, n_tokens + 1, size=n_samples)
+    ranks = rng.random((n_samples, n_tokens)).argsort(axis=1).argsort(axis=1)
+    masks = ranks >= removed[:, None]
+    masks[0] = True
+    return masks
+
+
+def _lime_weights(masks, target_scores, alpha=1.0):
+    """Weighted ridge fit of target scores on kept tokens
+
+    ``masks`` is (samples, tokens) and ``target_scores`` is (samples,
+    targets). Returns a (targets, tokens) array of coefficients.
+    """
+    kept = masks.mean(axis=1)
+    distance = 1.0 - np.sqrt(kept)
+    weights = np.sqrt(np.exp(-(distance**2) / _LIME_KERNEL_WIDTH**2))
+
+    x = masks.astype(np.float64)
+    x_mean = np.average(x, axis=0, weights=weights)
+    y_mean = np.average(target_scores, axis=0, weights=weights)
+    xw = (x - x_mean) * weights[:, None]
+    yw = (target_scores - y_mean) * weights[:, None]
+    gram = xw.T @ xw + alpha * np.eye(x.shape[1])
+    return np.linalg.solve(gram, xw.T @ yw).T
+
+
+class TokenAttributor:
+    """Explains an NERInferenceEngine's token labels by input token
+
+    For every text, each token the model tags as an entity (every token
+    with ``all_tokens=True``) is a target, and each input token gets a
+    weight for how much it raises the probability of the target's
+    predicted label. ``method`` picks how:
+
+    - "occlusion": masks one token at a time; the weight is the drop in
+      the target's probability. One forward pass per token.
+    - "lime": masks ``samples`` random subsets of tokens and fits a
+      weighted linear model to the target probabilities, like LIME's text
+      explainer.
+    - "integrated_gradients": integrates gradients along ``steps`` points
+      from the masked input to the real one. Needs the torch backend
+      without quantization, and costs ``steps`` forward and one backward
+      pass per target.
+
+    Perturbed inputs of ``chunk_size`` texts at a time are sent to the
+    engine together, so they run in a few large length-sorted batches
+    instead of thousands of single passes. With ``cache_path``,
+    explanations go into a SQLite cache keyed by text hash,
+    ``model_version`` and method settings.
+    """
+
+    def __init__(
+        self,
+        engine,
+        method="occlusion",
+        samples=200,
+        steps=32,
+        all_tokens=False,
+        cache_path=None,
+        model_version=None,
+        seed=0,
+        chunk_size=32,
+    ):
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {', '.join(METHODS)}")
+        if cache_path and model_version is None:
+            raise ValueError("model_version is required with cache_path")
+        if method == "integrated_gradients" and (
+            engine.backend != "torch"
+            or not hasattr(engine.model, "get_input_embeddings")
+            or engine.quantize
+        ):
+            raise ValueError(
+                "integrated_gradients needs the torch backend without quantization"
+            )
+        self.engine = engine
+        self.method = method
+        self.samples = samples
+        self.steps = steps
+        self.all_tokens = all_tokens
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.model_version = str(model_version)
+        self.hits = 0
+        self.misses = 0
+
+        tokenizer = engine.tokenizer
+        self.mask_id = next(
+            i
+            for i in (
+                tokenizer.mask_token_id,
+                tokenizer.unk_token_id,
+                tokenizer.pad_token_id,
+                0,
+            )
+            if i is not None
+        )
+
+        self.conn = None
+        if cache_path:
+            if os.path.dirname(cache_path):
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            self.conn = sqlite3.connect(cache_path)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS attributions (
+                    model_version TEXT NOT NULL,
+                    method TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    explanation TEXT NOT NULL,
+                    PRIMARY KEY (model_version, method, content_hash)
+                ) WITHOUT ROWID
+                """)
+            self.conn.commit()
+
+    @property
+    def method_key(self):
+        """Method name with the settings that change its results"""
+        key = self.method
+        if self.method == "lime":
+            key += f":{self.samples}:{self.seed}"
+        elif self.method == "integrated_gradients":
+            key += f":{self.steps}"
+        return key + (":all" if self.all_tokens else "")
+
+    def _real_positions(self, encoded, i):
+        # Special and padding tokens have empty offsets
+        offsets = np.asarray(encoded["offset_mapping"][i]).reshape(-1, 2)
+        return np.flatnonzero(offsets[:, 1] > offsets[:, 0])
+
+    def _run(self, sequences):
+        """Probabilities of every sequence, batched by the engine"""
+        probs = [None] * len(sequences)
+        for batch, _, batch_probs in self.engine.batch_probabilities(sequences):
+            for row, i in enumerate(batch):
+                probs[i] = batch_probs[row, : len(sequences[i])]
+        return probs
+
+    def _masks(self, text, n_tokens):
+        if self.method == "occlusion":
+            # The unmasked text, then each token masked on its own
+            return np.vstack(
+                [np.ones(n_tokens, dtype=bool), ~np.eye(n_tokens, dtype=bool)]
+            )
+        if not n_tokens:
+            return np.ones((1, 0), dtype=bool)
+        # Seeded by the text, so results do not depend on chunking
+        rng = np.random.default_rng([self.seed, int(content_hash(text)[:8], 16)])
+        return _lime_masks(self.samples, n_tokens, rng)
+
+    def _perturbation_chunk(self, texts, encoded):
+        """Explanations for texts, from one set of batched forward passes"""
+        sequences, spans, masks, positions = [], [], [], []
+        for i, text in enumerate(texts):
+            ids = np.asarray(encoded["input_ids"][i])
+            real = self._real_positions(encoded, i)
+            positions.append(real)
+            text_masks = self._masks(text, len(real))
+            perturbed = np.repeat(ids[None, :], len(text_masks), axis=0)
+            perturbed[:, real] = np.where(text_masks, ids[real], self.mask_id)
+            spans.append((len(sequences), len(sequences) + len(text_masks)))
+            sequences.extend(perturbed)
+            masks.append(text_masks)
+
+        probs = self._run(sequences)
+        explanations = []
+        for i, (start, end) in enumerate(spans):
+            real = positions[i]
+            # (perturbations, real tokens, labels)
+            text_probs = np.stack(probs[start:end])[:, real]
+            label_ids = text_probs[0].argmax(axis=-1)
+            targets = self._targets(label_ids)
+            target_scores = text_probs[:, targets, label_ids[targets]]
+            if not len(targets):
+                attributions = np.zeros((0, len(real)))
+            elif self.method == "occlusion":
+                attributions = (target_scores[0] - target_scores[1:]).T
+            else:
+                attributions = _lime_weights(masks[i], target_scores)
+            explanations.append(
+                self._explanation(
+                    texts[i],
+                    encoded,
+                    i,
+                    real,
+                    label_ids,
+                    text_probs[0],
+                    targets,
+                    attributions,
+                )
+            )
+        return explanations
+
+    def _integrated_gradients(self, text, encoded, i):
+        import torch
+
+        model = self.engine.model
+        ids = torch.tensor([encoded["input_ids"][i]])
+        real = self._real_positions(encoded, i)
+        embeddings = model.get_input_embeddings()
+        with torch.no_grad():
+            inputs = embeddings(ids)[0]
+            baseline = inputs.clone()
+            mask = embeddings(torch.tensor([self.mask_id]))[0]
+            baseline[torch.from_numpy(real)] = mask
+            delta = inputs - baseline
+            logits = model(inputs_embeds=inputs[None]).logits[0]
+        probs = torch.softmax(logits.float(), dim=-1).numpy()[real]
+        label_ids = probs.argmax(axis=-1)
+        targets = self._targets(label_ids)
+
+        # Midpoint rule; steps are run engine.batch_size at a time
+        alphas = (torch.arange(self.steps, dtype=inputs.dtype) + 0.5) / self.steps
+        gradients = torch.zeros((len(targets),) + inputs.shape, dtype=inputs.dtype)
+        for start in range(0, self.steps, self.engine.batch_size):
+            alpha = alphas[start : start + self.engine.batch_size, None, None]
+            path = (baseline + alpha * delta).requires_grad_(True)
+            path_probs = torch.softmax(model(inputs_embeds=path).logits, dim=-1)
+            for t, target in enumerate(targets):
+                score = path_probs[:, int(real[target]), int(label_ids[target])].sum()
+                (grad,) = torch.autograd.grad(score, path, retain_graph=True)
+                gradients[t] += grad.sum(dim=0).detach()
+        attributions = (gradients / self.steps * delta).sum(dim=-1).numpy()
+        return self._explanation(
+            text, encoded, i, real, label_ids, probs, targets, attributions[:, real]
+        )
+
+    def _targets(self, label_ids):
+        if self.all_tokens:
+            return np.arange(len(label_ids))
+        labels = np.array([self.engine.id2label[int(j)] for j in label_ids])
+        return np.flatnonzero(labels != "O")
+
+    def _explanation(
+        self, text, encoded, i, real, label_ids, probs, targets, attributions
+    ):
+        ids = np.asarray(encoded["input_ids"][i])[real]
+        offsets = np.asarray(encoded["offset_mapping"][i]).reshape(-1, 2)[real]
+        return {
+            "text": text,
+            "tokens": self.engine.tokenizer.convert_ids_to_tokens(ids.tolist()),
+            "offsets": offsets.tolist(),
+            "labels": [self.engine.id2label[int(j)] for j in label_ids],
+            "scores": [float(probs[j, k]) for j, k in enumerate(label_ids)],
+            "targets": [int(t) for t in targets],
+            "attributions": np.asarray(attributions, dtype=np.float32)
+            .reshape(len(targets), len(real))
+            .tolist(),
+        }
+
+    def _explain_uncached(self, texts):
+        encoded = self.engine.encode(texts)
+        if self.method == "integrated_gradients":
+            return [
+                self._integrated_gradients(text, encoded, i)
+                for i, text in enumerate(texts)
+            ]
+        return self._perturbation_chunk(texts, encoded)
+
+    def _lookup(self, hashes):
+        rows = {}
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start : start + 500]
+            rows.update(
+                self.conn.execute(
+                    f"""
+                    SELECT content_hash, explanation FROM attributions
+                    WHERE model_version = ? AND method = ?
+                    AND content_hash IN ({",".join("?" * len(chunk))})
+                    """,
+                    (self.model_version, self.method_key, *chunk),
+                )
+            )
+        return rows
+
+    @timed()
+    def explain(self, texts):
+        """Explanations of texts, in input order
+
+        A string gives one explanation dict, a list gives a list. Each has
+        the text's tokens, offsets, predicted labels and their
+        probabilities, the ``targets`` (token indices explained) and
+        ``attributions``, one row of token weights per target.
+        """
+        if isinstance(texts, str):
+            return self.explain([texts])[0]
+        texts = [text if isinstance(text, str) else "" for text in texts]
+        positions = {}
+        for i, text in enumerate(texts):
+            positions.setdefault(content_hash(text), []).append(i)
+
+        results = [None] * len(texts)
+        cached = self._lookup(list(positions)) if self.conn else {}
+        for key, explanation in cached.items():
+            for i in positions[key]:
+                results[i] = json.loads(explanation)
+        missing = [key for key in positions if key not in cached]
+        self.hits += len(positions) - len(missing)
+        self.misses += len(missing)
+
+        for start in range(0, len(missing), self.chunk_size):
+            keys = missing[start : start + self.chunk_size]
+            explanations = self._explain_uncached(
+                [texts[positions[key][0]] for key in keys]
+            )
+            for key, explanation in zip(keys, explanations):
+                for i in positions[key]:
+                    results[i] = explanation
+            if self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO attributions VALUES (?, ?, ?, ?)",
+                    (
+                        (
+                            self.model_version,
+                            self.method_key,
+                            key,
+                            json.dumps(explanation, ensure_ascii=False),
+                        )
+                        for key, explanation in zip(keys, explanations)
+                    ),
+                )
+                self.conn.commit()
+        return results
+
+    def stats(self):
+        """Return hit and miss counts of distinct texts"""
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+
+
+def top_tokens(explanation, k=3):
+    """Summarize an explanation: the k most supporting tokens per target"""
+    tokens = explanation["tokens"]
+    summary = []
+    for target, weights in zip(explanation["targets"], explanation["attributions"]):
+        order = np.argsort(weights)[::-1][:k]
+        summary.append(
+            {
+                "token": tokens[target],
+                "label": explanation["labels"][target],
+                "support": [(tokens[j], float(weights[j])) for j in order],
+            }
+        )
+    return summary
+
+
+def main():
+    import argparse
+
+    from scripts.ner_inference import NERInferenceEngine
+    from utils.helpers import load_data
+
+    parser = argparse.ArgumentParser(description="Explain NER predictions by token")
+    parser.add_argument("--model", required=True, help="NER model directory")
+    parser.add_argument(
+        "--data", required=True, help="preprocessed CSV, Parquet or lake"
+    )
+    parser.add_argument("--output", default="explanations.jsonl")
+    parser.add_argument("--method", choices=METHODS, default="occlusion")
+    parser.add_argument("--samples", type=int, default=200, help="LIME samples")
+    parser.add_argument("--steps", type=int, default=32, help="IG steps")
+    parser.add_argument("--limit", type=int, help="explain only the first N posts")
+    parser.add_argument("--text-column", default="cleaned_text")
+    parser.add_argument("--cache", help="SQLite attribution cache")
+    parser.add_argument("--model-version", help="cache key, e.g. the training run")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default="torch")
+    args = parser.parse_args()
+
+    texts = load_data(args.data)[args.text_column].fillna("").tolist()[: args.limit]
+    engine = NERInferenceEngine(args.model, backend=args.backend)
+    attributor = TokenAttributor(
+        engine,
+        method=args.method,
+        samples=args.samples,
+        steps=args.steps,
+        cache_path=args.cache,
+        model_version=args.model_version or os.path.abspath(args.model),
+    )
+    with open(args.output, "w", encoding="utf-8") as f:
+        for explanation in attributor.explain(texts):
+            f.write(json.dumps(explanation, ensure_ascii=False) + "\n")
+    attributor.close()
+    print(f"Wrote {len(texts)} explanations to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,92 @@
-from datasets import Dataset, ClassLabel
-from transformers import AutoTokenizer
 import pandas as pd
+import numpy as np
+import os
 
+from scripts.conll_io import CompactCoNLL, iter_conll
+from scripts.instrumentation import timed
+
+@timed()
 def load_conll_data(file_path):
-    """Load CoNLL formatted data into Hugging Face Dataset"""
+    """Load CoNLL formatted data into Hugging Face Dataset
+
+    Accepts a CoNLL file or a directory written by conll_to_compact.
+    """
+    # Imported here so that importing this module stays fast
+    from datasets import Dataset
+
+    if os.path.isdir(file_path):
+        return Dataset(CompactCoNLL(file_path).to_arrow())
+
     tokens, labels = [], []
-    current_tokens, current_labels = [], []
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                if current_tokens:
-                    tokens.append(current_tokens)
-                    labels.append(current_labels)
-                    current_tokens, current_labels = [], []
-            else:
-                parts = line.split()
-                current_tokens.append(parts[0])
-                current_labels.append(parts[1])
+    for sentence_tokens, sentence_labels in iter_conll(file_path):
+        tokens.append(sentence_tokens)
+        labels.append(sentence_labels)
     
     return Dataset.from_dict({
         'tokens': tokens,
         'ner_tags': labels
     })
 
-def tokenize_and_align_labels(dataset, tokenizer, label2id):
-    """Tokenize text and align NER labels with subword tokens"""
+def align_labels(tokenized_inputs, ner_tags, label2id):
+    """Label the first subword of every word and mask the rest with -100
+
+    Works on padded and unpadded (ragged) encodings alike, since padding
+    and special tokens have no word id.
+    """
+    labels = []
+    for i, tags in enumerate(ner_tags):
+        word_ids = tokenized_inputs.word_ids(batch_index=i)
+        tag_ids = [label2id.get(tag, -100) for tag in tags]
+        # Pair each word id with the previous one to find first subwords
+        labels.append([
+            -100 if word_idx is None or word_idx == previous else tag_ids[word_idx]
+            for word_idx, previous in zip(word_ids, [None, *word_ids])
+        ])
+    return labels
+
+@timed()
+def tokenize_and_align_labels(dataset, tokenizer, label2id, padding="max_length", max_length=128):
+    """Tokenize text and align NER labels with subword tokens
+
+    With ``padding=False`` examples keep their own length, to be padded per
+    batch by DataCollatorForTokenClassification (see train_model).
+    """
     tokenized_inputs = tokenizer(
         dataset["tokens"],
         truncation=True,
         is_split_into_words=True,
-        padding="max_length",
-        max_length=128
+        padding=padding,
+        max_length=max_length
     )
     
-    labels = []
-    for i, label in enumerate(dataset["ner_tags"]):
-        word_ids = tokenized_inputs.word_ids(batch_index=i)
-        previous_word_idx = None
-        label_ids = []
-        
-        for word_idx in word_ids:
-            if word_idx is None:
-                label_ids.append(-100)
-            elif word_idx != previous_word_idx:
-                label_ids.append(label2id.get(label[word_idx], -100))
-            else:
-                label_ids.append(-100)
-            previous_word_idx = word_idx
-            
-        labels.append(label_ids)
-    
-    tokenized_inputs["labels"] = labels
-    return tokenized_inputs
\ No newline at end of file
+    tokenized_inputs["labels"] = align_labels(tokenized_inputs, dataset["ner_tags"], label2id)
+    return tokenized_inputs
+
+def length_bucketed_batches(lengths, batch_size, bucket_size=50, shuffle=True, seed=0):
+    """Group example indices into batches of similar length
+
+    Indices are shuffled, cut into buckets of ``bucket_size`` batches,
+    sorted by length within each bucket and split into batches, so each
+    batch pads to a length close to its longest member.
+    """
+    lengths = np.asarray(lengths)
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(lengths)) if shuffle else np.arange(len(lengths))
+
+    batches = []
+    step = batch_size * bucket_size
+    for start in range(0, len(order), step):
+        bucket = order[start:start + step]
+        bucket = bucket[np.argsort(-lengths[bucket], kind="stable")]
+        batches.extend(bucket[i:i + batch_size] for i in range(0, len(bucket), batch_size))
+
+    if shuffle:
+        batches = [batches[i] for i in rng.permutation(len(batches))]
+    return [batch.tolist() for batch in batches]
+
+def padding_ratio(lengths, batches):
+    """Fraction of padded positions when each batch pads to its longest example"""
+    lengths = np.asarray(lengths)
+    real = sum(lengths[batch].sum() for batch in batches)
+    total = sum(lengths[batch].max() * len(batch) for batch in batches)
+    return 1 - real / total if total else 0.0
@@ -0,0 +1,232 @@
+import os
+
+import numpy as np
+from transformers import AutoConfig, AutoTokenizer
+
+from scripts.instrumentation import timed
+
+
+def group_entities(text, offsets, label_ids, scores, id2label):
+    """Merge token predictions into entity spans
+
+    Follows the "simple" aggregation of the transformers pipeline: adjacent
+    tokens of the same entity type form one span unless a token is tagged
+    ``B-``. Returns dicts with entity_group, word, start, end and score.
+    """
+    entities = []
+    current = None
+    for (start, end), label_id, score in zip(offsets, label_ids, scores):
+        if start == end:
+            # Special and padding tokens have empty offsets
+            continue
+        label = id2label[int(label_id)]
+        if label == "O":
+            current = None
+            continue
+        prefix, _, entity = label.partition("-")
+        if not entity:
+            prefix, entity = "I", label
+        if current is not None and current["entity_group"] == entity and prefix != "B":
+            current["end"] = int(end)
+            current["scores"].append(float(score))
+        else:
+            current = {
+                "entity_group": entity,
+                "start": int(start),
+                "end": int(end),
+                "scores": [float(score)],
+            }
+            entities.append(current)
+
+    for entity in entities:
+        scores = entity.pop("scores")
+        entity["score"] = sum(scores) / len(scores)
+        entity["word"] = text[entity["start"] : entity["end"]]
+    return entities
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    np.exp(logits, out=logits)
+    return logits / logits.sum(axis=-1, keepdims=True)
+
+
+class NERInferenceEngine:
+    """Batched CPU inference for a token-classification model
+
+    Texts are tokenized in chunks, sorted by length and run in batches
+    padded only to their longest member, so little time goes into padding.
+    ``backend="torch"`` runs under ``torch.inference_mode`` and can apply
+    dynamic int8 quantization to the Linear layers (``quantize=True``);
+    ``backend="onnx"`` runs an exported model with ONNX Runtime. Calling
+    the engine works like the transformers pipeline with
+    ``aggregation_strategy="simple"``: a string gives a list of entities,
+    a list of strings gives one list per text. Texts longer than
+    ``max_length`` tokens are truncated.
+    """
+
+    def __init__(
+        self,
+        model_path,
+        backend="torch",
+        quantize=False,
+        num_threads=None,
+        batch_size=32,
+        max_length=512,
+        chunk_size=2048,
+        onnx_path=None,
+    ):
+        if backend not in ("torch", "onnx"):
+            raise ValueError("backend must be 'torch' or 'onnx'")
+        self.model_path = model_path
+        self.backend = backend
+        self.quantize = quantize
+        self.num_threads = num_threads
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.chunk_size = chunk_size
+        self.onnx_path = onnx_path or os.path.join(model_path, "model.onnx")
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        config = AutoConfig.from_pretrained(model_path)
+        self.id2label = {int(k): v for k, v in config.id2label.items()}
+        self._load_model()
+
+    def _load_model(self):
+        if self.backend == "torch":
+            import torch
+            from transformers import AutoModelForTokenClassification
+
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
+            model = AutoModelForTokenClassification.from_pretrained(self.model_path)
+            model.eval()
+            if self.quantize:
+                model = torch.ao.quantization.quantize_dynamic(
+                    model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+            self.model = model
+        else:
+            import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            if self.num_threads:
+                options.intra_op_num_threads = self.num_threads
+            self.model = ort.InferenceSession(
+                self.onnx_path, options, providers=["CPUExecutionProvider"]
+            )
+            self._onnx_inputs = {i.name for i in self.model.get_inputs()}
+
+    @timed()
+    def _forward(self, input_ids, attention_mask):
+        """Return logits as a (batch, seq_len, num_labels) float32 array"""
+        if self.backend == "torch":
+            import torch
+
+            with torch.inference_mode():
+                logits = self.model(
+                    input_ids=torch.from_numpy(input_ids),
+                    attention_mask=torch.from_numpy(attention_mask),
+                ).logits
+            return logits.float().numpy()
+
+        feed = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._onnx_inputs:
+            feed["token_type_ids"] = np.zeros_like(input_ids)
+        return self.model.run(None, feed)[0]
+
+    def encode(self, texts):
+        """Tokenize texts with offsets, truncating to ``max_length``"""
+        return self.tokenizer(
+            texts,
+            truncation=True,
+            max_length=self.max_length,
+            return_offsets_mapping=True,
+        )
+
+    def batch_probabilities(self, input_ids):
+        """Yield (indices, ids, probs) for length-sorted, padded batches
+
+        ``input_ids`` are encoded texts; ``indices`` say which texts a
+        batch holds and ``probs`` are the label probabilities of its
+        tokens, padded to the batch's longest text.
+        """
+        pad_id = self.tokenizer.pad_token_id or 0
+        order = sorted(range(len(input_ids)), key=lambda i: len(input_ids[i]))
+
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start : start + self.batch_size]
+            width = max(len(input_ids[i]) for i in batch)
+            ids = np.full((len(batch), width), pad_id, dtype=np.int64)
+            mask = np.zeros((len(batch), width), dtype=np.int64)
+            for row, i in enumerate(batch):
+                ids[row, : len(input_ids[i])] = input_ids[i]
+                mask[row, : len(input_ids[i])] = 1
+            yield batch, ids, _softmax(self._forward(ids, mask))
+
+    def token_vectors(self):
+        """Input embedding matrix of the model, or None if unavailable"""
+        if self.backend != "torch" or not hasattr(self.model, "get_input_embeddings"):
+            return None
+        return self.model.get_input_embeddings().weight.detach().float().numpy()
+
+    def _predict_chunk(self, texts):
+        encoded = self.encode(texts)
+        input_ids = encoded["input_ids"]
+        results = [None] * len(texts)
+
+        for batch, _, probs in self.batch_probabilities(input_ids):
+            label_ids = probs.argmax(axis=-1)
+            scores = probs.max(axis=-1)
+            for row, i in enumerate(batch):
+                length = len(input_ids[i])
+                results[i] = group_entities(
+                    texts[i],
+                    encoded["offset_mapping"][i],
+                    label_ids[row, :length],
+                    scores[row, :length],
+                    self.id2label,
+                )
+        return results
+
+    def predict(self, texts):
+        """Yield the entity list of every text, in input order"""
+        chunk = []
+        for text in texts:
+            chunk.append(text if isinstance(text, str) else "")
+            if len(chunk) >= self.chunk_size:
+                yield from self._predict_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from self._predict_chunk(chunk)
+
+    def __call__(self, texts):
+        if isinstance(texts, str):
+            return self._predict_chunk([texts])[0]
+        return list(self.predict(texts))
+
+
+def export_onnx(model_path, output_path=None, opset=17):
+    """Export a fine-tuned model to ONNX for backend="onnx" """
+    import torch
+    from transformers import AutoModelForTokenClassification
+
+    output_path = output_path or os.path.join(model_path, "model.onnx")
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForTokenClassification.from_pretrained(model_path)
+    model.eval()
+    sample = tokenizer(["ዋጋ 500 ብር"], return_tensors="pt")
+    torch.onnx.export(
+        model,
+        (sample["input_ids"], sample["attention_mask"]),
+        output_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch", 1: "sequence"},
+        },
+        opset_version=opset,
+    )
+    return output_path
@@ -1,24 +1,123 @@
-from transformers import AutoModelForTokenClassification, TrainingArguments, Trainer
+import functools
+
 import numpy as np
-from datasets import load_metric
 
-metric = load_metric("seqeval")
+# Tag codes for the chunk rules; any other leading character is _OTHER
+_O, _B, _I, _E, _S, _DOT, _OTHER = range(7)
+_TAG_CODES = {"O": _O, "B": _B, "I": _I, "E": _E, "S": _S, ".": _DOT}
+
+def _label_codes(id2label):
+    """Tag and type code arrays indexed by label id, parsed as seqeval does"""
+    size = max(id2label) + 1
+    tags = np.full(size, _O, dtype=np.int8)
+    types = np.zeros(size, dtype=np.int64)
+    type_names = ["_"]
+    for label_id, label in id2label.items():
+        tags[label_id] = _TAG_CODES.get(label[0], _OTHER)
+        type_name = label[1:].split("-", maxsplit=1)[-1] or "_"
+        if type_name not in type_names:
+            type_names.append(type_name)
+        types[label_id] = type_names.index(type_name)
+    return tags, types, type_names
+
+def _chunks(tags, types, first, last):
+    """(start, end, type) arrays of the entity chunks in a flat sequence
+
+    Applies the conlleval start/end-of-chunk rules that seqeval's default
+    mode uses, with an "O" before the first and after the last token of
+    every sentence (``first``/``last`` mark them). As in seqeval, a chunk
+    runs from the latest start (or the first token) to its end and takes
+    the type of its last token; with _OTHER tags starts and ends need not
+    alternate.
+    """
+    prev_tags = np.roll(tags, 1)
+    prev_types = np.roll(types, 1)
+    prev_tags[first] = _O
+    prev_types[first] = 0
+    next_tags = np.roll(tags, -1)
+    next_types = np.roll(types, -1)
+    next_tags[last] = _O
+    next_types[last] = 0
+
+    def ends(tag, nxt, tag_type, next_type):
+        inside = (tag == _B) | (tag == _I)
+        return ((tag == _E) | (tag == _S)
+                | (inside & ((nxt == _B) | (nxt == _S) | (nxt == _O)))
+                | ((tag != _O) & (tag != _DOT) & (tag_type != next_type)))
+
+    def starts(prev, tag, prev_type, tag_type):
+        continues = (tag == _E) | (tag == _I)
+        return ((tag == _B) | (tag == _S)
+                | (continues & ((prev == _E) | (prev == _S) | (prev == _O)))
+                | ((tag != _O) & (tag != _DOT) & (prev_type != tag_type)))
+
+    start = np.flatnonzero(starts(prev_tags, tags, prev_types, types))
+    end = np.flatnonzero(ends(tags, next_tags, types, next_types))
+    latest = np.searchsorted(start, end, side="right") - 1
+    # An end before any start (latest -1) picks the appended first token
+    begin = np.append(start, 0)[latest]
+    return begin, end, types[end]
+
+def entity_scores(predictions, labels, id2label):
+    """Entity-level precision/recall/F1 and token accuracy on id arrays
+
+    ``predictions`` and ``labels`` are (examples, tokens) label ids as the
+    Trainer passes them, with -100 marking positions to ignore. Results
+    match seqeval's default (conlleval) mode: overall micro-averaged
+    scores and per-type scores with their support.
+    """
+    predictions = np.asarray(predictions)
+    labels = np.asarray(labels)
+    valid = labels != -100
+    true_ids = labels[valid]
+    pred_ids = predictions[valid]
+
+    # Sentence boundaries in the flattened, row-major valid tokens
+    rows = np.nonzero(valid)[0]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = rows[1:] != rows[:-1]
+    last = np.ones(len(rows), dtype=bool)
+    last[:-1] = first[1:]
+
+    tags, types, type_names = _label_codes(id2label)
+    counts = {}
+    keys = {}
+    for name, ids in (("true", true_ids), ("pred", pred_ids)):
+        start, end, chunk_types = _chunks(tags[ids], types[ids], first, last)
+        keys[name] = (start * (len(ids) + 1) + end) * len(type_names) + chunk_types
+        counts[name] = np.bincount(chunk_types, minlength=len(type_names))
+    # Keys are unique, one chunk per end position
+    correct_keys = np.intersect1d(keys["true"], keys["pred"], assume_unique=True)
+    correct = np.bincount(correct_keys % len(type_names), minlength=len(type_names))
 
-def compute_metrics(p):
+    def scores(n_correct, n_pred, n_true):
+        precision = n_correct / n_pred if n_pred else 0.0
+        recall = n_correct / n_true if n_true else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        return precision, recall, f1
+
+    results = {}
+    for type_id, type_name in enumerate(type_names):
+        if not counts["true"][type_id] and not counts["pred"][type_id]:
+            continue
+        precision, recall, f1 = scores(correct[type_id], counts["pred"][type_id],
+                                       counts["true"][type_id])
+        results[type_name] = {"precision": float(precision), "recall": float(recall),
+                              "f1": float(f1), "number": int(counts["true"][type_id])}
+
+    precision, recall, f1 = scores(correct.sum(), counts["pred"].sum(), counts["true"].sum())
+    results["overall_precision"] = float(precision)
+    results["overall_recall"] = float(recall)
+    results["overall_f1"] = float(f1)
+    results["overall_accuracy"] = float((true_ids == pred_ids).mean()) if len(true_ids) else 0.0
+    return results
+
+def compute_metrics(p, id2label):
+    """Trainer metrics callback; bind ``id2label`` with functools.partial"""
     predictions, labels = p
     predictions = np.argmax(predictions, axis=2)
-    
-    true_predictions = [
-        [label_list[p] for (p, l) in zip(prediction, label) if l != -100]
-        for prediction, label in zip(predictions, labels)
-    ]
-    
-    true_labels = [
-        [label_list[l] for (p, l) in zip(prediction, label) if l != -100]
-        for prediction, label in zip(predictions, labels)
-    ]
-    
-    results = metric.compute(predictions=true_predictions, references=true_labels)
+
+    results = entity_scores(predictions, labels, id2label)
     return {
         "precision": results["overall_precision"],
         "recall": results["overall_recall"],
@@ -26,14 +125,29 @@ def compute_metrics(p):
         "accuracy": results["overall_accuracy"],
     }
 
-def train_model(model_name, tokenized_dataset, id2label, label2id, run_name):
+def train_model(model_name, tokenized_dataset, id2label, label2id, run_name,
+                tokenizer=None, dynamic_padding=False):
+    """Fine-tune a token classification model
+
+    Set ``dynamic_padding=True`` for datasets tokenized with
+    ``padding=False``: batches are then drawn from length-grouped buckets
+    and padded only to their longest example.
+    """
+    # Imported here so that importing this module stays fast
+    from transformers import (
+        AutoModelForTokenClassification,
+        DataCollatorForTokenClassification,
+        TrainingArguments,
+        Trainer,
+    )
+
     model = AutoModelForTokenClassification.from_pretrained(
         model_name,
         num_labels=len(id2label),
         id2label=id2label,
         label2id=label2id
     )
-    
+
     training_args = TrainingArguments(
         output_dir=f"./results/{run_name}",
         evaluation_strategy="epoch",
@@ -42,17 +156,25 @@ def train_model(model_name, tokenized_dataset, id2label, label2id, run_name):
         per_device_eval_batch_size=16,
         num_train_epochs=3,
         weight_decay=0.01,
-        report_to="none"
+        report_to="none",
+        group_by_length=dynamic_padding
     )
-    
+
+    data_collator = None
+    if dynamic_padding:
+        if tokenizer is None:
+            raise ValueError("dynamic_padding requires the tokenizer")
+        data_collator = DataCollatorForTokenClassification(tokenizer)
+
     trainer = Trainer(
         model=model,
         args=training_args,
         train_dataset=tokenized_dataset["train"],
         eval_dataset=tokenized_dataset["test"],
         tokenizer=tokenizer,
-        compute_metrics=compute_metrics
+        data_collator=data_collator,
+        compute_metrics=functools.partial(compute_metrics, id2label=id2label)
     )
-    
+
     trainer.train()
     return trainer, model
\ No newline at end of file
@@ -0,0 +1,232 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+from scripts.preprocessor import AmharicPreprocessor
+
+# Whitespace and commas between the objects of a JSON array
+_SEPARATORS = re.compile(r"[\s,]*")
+
+# One preprocessor per worker process, built by _init_worker
+_PREPROCESSOR = None
+
+
+def _init_worker():
+    """Create the worker-local preprocessor"""
+    global _PREPROCESSOR
+    _PREPROCESSOR = AmharicPreprocessor()
+
+
+def _preprocess_chunk(index, frame):
+    """Preprocess one chunk inside a worker process"""
+    return index, _PREPROCESSOR.preprocess_frame(frame)
+
+
+def iter_json_array(path, block_size=1 << 20):
+    """Yield the objects of a JSON array file without loading it whole
+
+    Objects are decoded in place from a moving index; the consumed part
+    of the buffer is only dropped when the next block is read.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        while not buffer:
+            block = f.read(block_size)
+            if not block:
+                break
+            buffer = block.lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"Expected a JSON array in {path}")
+        position = 1
+        eof = False
+
+        while True:
+            position = _SEPARATORS.match(buffer, position).end()
+            if buffer.startswith("]", position):
+                return
+            try:
+                obj, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                block = f.read(block_size)
+                eof = not block
+                buffer = buffer[position:] + block
+                position = 0
+                continue
+            yield obj
+
+
+def iter_message_chunks(path, chunk_size=5000):
+    """Yield DataFrame chunks from a scraper JSON, JSONL or CSV export"""
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".csv":
+        yield from pd.read_csv(path, chunksize=chunk_size, encoding="utf-8")
+        return
+
+    if ext == ".jsonl":
+        yield from pd.read_json(
+            path,
+            lines=True,
+            chunksize=chunk_size,
+            dtype=False,
+            convert_dates=False,
+            encoding="utf-8",
+        )
+        return
+
+    if ext != ".json":
+        raise ValueError(f"Unsupported input format: {path}")
+
+    records = []
+    for record in iter_json_array(path):
+        records.append(record)
+        if len(records) == chunk_size:
+            yield pd.DataFrame(records)
+            records = []
+    if records:
+        yield pd.DataFrame(records)
+
+
+class _JsonlWriter:
+    """Append preprocessed chunks to a JSON Lines file"""
+
+    def __init__(self, path):
+        self.f = open(path, "w", encoding="utf-8")
+
+    def write(self, df):
+        if df.empty:
+            return
+        text = df.to_json(orient="records", lines=True, force_ascii=False)
+        self.f.write(text if text.endswith("\n") else text + "\n")
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class _ParquetWriter:
+    """Append preprocessed chunks as row groups of one Parquet file"""
+
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema(
+            [
+                ("message_id", pa.int64()),
+                ("channel", pa.string()),
+                ("timestamp", pa.string()),
+                ("views", pa.int64()),
+                ("media_path", pa.string()),
+                ("original_length", pa.int64()),
+                ("raw_text", pa.string()),
+                ("normalized_text", pa.string()),
+                ("cleaned_text", pa.string()),
+                ("tokens", pa.list_(pa.string())),
+                ("token_count", pa.int64()),
+                ("contains_price", pa.int64()),
+                ("contains_location", pa.int64()),
+                ("contains_product", pa.int64()),
+                ("price_value", pa.float64()),
+                ("location_mentioned", pa.list_(pa.string())),
+            ]
+        )
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, df):
+        table = self.pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+
+class ParallelPreprocessor:
+    """Preprocess scraped exports across worker processes in bounded chunks
+
+    Input is read chunk by chunk and at most ``max_pending`` chunks are in
+    flight at once, so memory stays bounded regardless of file size.
+    Results are written as chunks finish, either in input order
+    (``ordered=True``) or in completion order.
+    """
+
+    def __init__(self, workers=None, chunk_size=5000, ordered=True, max_pending=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.ordered = ordered
+        self.max_pending = max_pending or 2 * self.workers
+
+    def _open_writer(self, output_path):
+        ext = os.path.splitext(output_path)[1].lower()
+        if ext == ".parquet":
+            return _ParquetWriter(output_path)
+        if ext == ".jsonl":
+            return _JsonlWriter(output_path)
+        raise ValueError(f"Unsupported output format: {output_path}")
+
+    def run(self, input_path, output_path, channel=None):
+        """Preprocess input_path into output_path and return run statistics"""
+        start = time.perf_counter()
+        writer = self._open_writer(output_path)
+        chunks = iter_message_chunks(input_path, self.chunk_size)
+        pending = set()
+        finished = {}
+        next_index = 0
+        submitted = 0
+        messages = 0
+
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker
+            ) as executor:
+                exhausted = False
+                while True:
+                    # Keep the pool busy without reading ahead unboundedly
+                    while not exhausted and submitted - next_index < self.max_pending:
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            exhausted = True
+                            break
+                        if channel is not None and "channel" not in chunk.columns:
+                            chunk = chunk.assign(channel=channel)
+                        pending.add(
+                            executor.submit(_preprocess_chunk, submitted, chunk)
+                        )
+                        submitted += 1
+
+                    if not pending:
+                        break
+
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, result = future.result()
+                        messages += len(result)
+                        if self.ordered:
+                            finished[index] = result
+                        else:
+                            writer.write(result)
+                            next_index += 1
+
+                    while next_index in finished:
+                        writer.write(finished.pop(next_index))
+                        next_index += 1
+        finally:
+            writer.close()
+
+        elapsed = time.perf_counter() - start
+        return {
+            "input": input_path,
+            "output": output_path,
+            "chunks": submitted,
+            "messages": messages,
+            "seconds": elapsed,
+            "msgs_per_sec": messages / elapsed if elapsed else 0.0,
+        }
@@ -1,9 +1,82 @@
 import re
 import emoji
 import unicodedata
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 
+from scripts.instrumentation import timed
+
+# Output columns of AmharicPreprocessor.preprocess_message, in order
+MESSAGE_COLUMNS = [
+    "message_id",
+    "channel",
+    "timestamp",
+    "views",
+    "media_path",
+    "original_length",
+    "raw_text",
+    "normalized_text",
+    "cleaned_text",
+    "tokens",
+    "token_count",
+    "contains_price",
+    "contains_location",
+    "contains_product",
+    "price_value",
+    "location_mentioned",
+]
+
+
+# Joiners and modifiers that let emoji sequences span neighbouring characters
+EMOJI_JOINERS = "\u200d\ufe0f\u20e3"
+
+
+def _emoji_run_pattern():
+    """Build a pattern matching runs of characters that can form an emoji"""
+    code_points = sorted(
+        {ord(c) for key in emoji.EMOJI_DATA for c in key if ord(c) > 127}
+        - {ord(c) for c in EMOJI_JOINERS}
+    )
+    # Collapse code points into ranges so the character class stays small
+    ranges = []
+    for code_point in code_points:
+        if ranges and code_point == ranges[-1][1] + 1:
+            ranges[-1][1] = code_point
+        else:
+            ranges.append([code_point, code_point])
+    char_class = "".join(
+        (
+            re.escape(chr(low))
+            if low == high
+            else f"{re.escape(chr(low))}-{re.escape(chr(high))}"
+        )
+        for low, high in ranges
+    )
+    return re.compile(f"[{char_class}]+")
+
+
+# Characters of word tokens and of single-character punctuation tokens
+TOKEN_CHARS = r"\w\u1200-\u137F'"
+PUNCTUATION = ".,!?;:/"
+
+# Bit flags of the code-point class table
+WORD_CHAR, PUNCT_CHAR, DIGIT_CHAR = 1, 2, 4
+
+
+@lru_cache(maxsize=1)
+def _char_class_table():
+    """Lookup table of token character classes for every code point"""
+    table = np.zeros(0x110000, dtype=np.uint8)
+    all_chars = "".join(map(chr, range(0x110000)))
+    # Mark runs with the same regex classes the tokenizer patterns use
+    for pattern, flag in ((f"[{TOKEN_CHARS}]+", WORD_CHAR), (r"\d+", DIGIT_CHAR)):
+        for match in re.finditer(pattern, all_chars):
+            table[match.start() : match.end()] |= flag
+    for char in PUNCTUATION:
+        table[ord(char)] |= PUNCT_CHAR
+    return table
+
 
 class AmharicPreprocessor:
     """Comprehensive preprocessing pipeline for Amharic Telegram data"""
@@ -11,8 +84,12 @@ class AmharicPreprocessor:
     def __init__(self):
         # Initialize patterns and rules
         self.currency_pattern = re.compile(r"(\d+)(ብር)", re.IGNORECASE)
+        # Keyword scans are alternations whose branches all start with a
+        # literal, which lets the regex engine skip straight to candidate
+        # first characters. Only the Latin keywords are case-insensitive.
         self.price_pattern = re.compile(
-            r"(ዋጋ|በ|ብር|br|birr|price)\s*[:]?\s*(\d[\d,.]*)", re.IGNORECASE
+            r"(ዋጋ|በ|ብር|b(?i:r|irr)|B(?i:r|irr)|p(?i:rice)|P(?i:rice))"
+            r"\s*[:]?\s*(\d[\d,.]*)"
         )
         self.location_keywords = [
             "ቦታ",
@@ -24,7 +101,51 @@ class AmharicPreprocessor:
             "ከ",
             "በ",
         ]
+        self.location_pattern = re.compile(
+            "|".join(map(re.escape, self.location_keywords))
+        )
+        self.abbreviations = {
+            "ሜትር": "ሜትር",
+            "ኪ.ሜ.": "ኪሎሜትር",
+            "ኪ.ግ.": "ኪሎግራም",
+            "ሴ.ሜ.": "ሴንቲሜትር",
+            "ፒ.ሲ.": "ፒሲ",
+            "ኤም.": "ኤም",
+            "ቲ.ቪ.": "ቲቪ",
+        }
+
+        # Precompiled cleaning, normalization and tokenization patterns
+        # Currency spacing and abbreviation expansion in one pass. None of
+        # the replacements creates a match for another alternative, so
+        # this equals applying the patterns one after another.
+        self.normalize_pattern = re.compile(
+            r"(\d+)ብር|"
+            + "|".join(
+                re.escape(abbreviation)
+                for abbreviation, replacement in self.abbreviations.items()
+                if abbreviation != replacement
+            )
+        )
+        self.emoji_run_pattern = _emoji_run_pattern()
+        self.emoji_joiner_pattern = re.compile(f"[{EMOJI_JOINERS}]")
+        self._emoji_run_cache = {}
+        self.url_pattern = re.compile(r"http\S+|www\S+|https\S+")
+        self.mention_pattern = re.compile(r"@\w+")
+        self.phone_pattern = re.compile(r"(\+251|0)?9\d{8}\b")
+        self.disallowed_pattern = re.compile(r"[^\w\s\u1200-\u137F.,!?;:ብር/]")
+        self.whitespace_pattern = re.compile(r"\s+")
+        self.token_split_pattern = re.compile(r"(\d+)(ብር)")
+        self.token_pattern = re.compile(f"[{TOKEN_CHARS}]+|[{re.escape(PUNCTUATION)}]")
+        # Same tokens without the digit/ብር substitution, so match offsets
+        # point into the input text
+        self.offset_token_pattern = re.compile(
+            f"[{TOKEN_CHARS}](?:(?!(?<=\\d)ብር)[{TOKEN_CHARS}])*"
+            f"|[{re.escape(PUNCTUATION)}]"
+        )
+        self.location_candidate_pattern = re.compile(r"([\u1200-\u137F]{3,})")
+        self.product_pattern = re.compile(r"(ሽያጭ|ይገኛል|ተሸጧል|ዋጋ|ገዢ)")
 
+    @timed()
     def normalize_amharic(self, text):
         """Handle Amharic-specific linguistic normalization"""
         if not text or not isinstance(text, str):
@@ -33,47 +154,120 @@ class AmharicPreprocessor:
         # Unicode normalization
         text = unicodedata.normalize("NFC", text)
 
-        # Standardize currency
-        text = self.currency_pattern.sub(r"\1 ብር", text)
-
-        # Handle abbreviations
-        replacements = {
-            r"ሜትር": "ሜትር",
-            r"ኪ\.ሜ\.": "ኪሎሜትር",
-            r"ኪ\.ግ\.": "ኪሎግራም",
-            r"ሴ\.ሜ\.": "ሴንቲሜትር",
-            r"ፒ\.ሲ\.": "ፒሲ",
-            r"ኤም\.": "ኤም",
-            r"ቲ\.ቪ\.": "ቲቪ",
-        }
-        for pattern, replacement in replacements.items():
-            text = re.sub(pattern, replacement, text)
+        # Standardize currency and handle abbreviations
+        return self.normalize_pattern.sub(self._normalize_match, text)
 
-        return text
+    def _normalize_match(self, match):
+        digits = match.group(1)
+        if digits is not None:
+            return digits + " ብር"
+        return self.abbreviations[match.group()]
 
+    @timed()
     def clean_text(self, text):
         """Clean text while preserving Amharic content"""
         if not text or not isinstance(text, str):
             return ""
 
         # Remove emojis and URLs
-        text = emoji.replace_emoji(text, replace="")
-        text = re.sub(r"http\S+|www\S+|https\S+", "", text)
-        text = re.sub(r"@\w+", "", text)
-        text = re.sub(r"(\+251|0)?9\d{8}\b", "", text)
-        text = re.sub(r"[^\w\s\u1200-\u137F.,!?;:ብር/]", "", text)
-        text = re.sub(r"\s+", " ", text).strip()
+        if self.emoji_joiner_pattern.search(text):
+            text = emoji.replace_emoji(text, replace="")
+        else:
+            text = self.emoji_run_pattern.sub(self._strip_emoji_run, text)
+        text = self.url_pattern.sub("", text)
+        text = self.mention_pattern.sub("", text)
+        text = self.phone_pattern.sub("", text)
+        text = self.disallowed_pattern.sub("", text)
+        text = self.whitespace_pattern.sub(" ", text).strip()
 
         return text
 
+    def _strip_emoji_run(self, match):
+        """Remove emoji from a run of emoji-capable characters"""
+        run = match.group()
+        stripped = self._emoji_run_cache.get(run)
+        if stripped is None:
+            if len(self._emoji_run_cache) > 10000:
+                self._emoji_run_cache.clear()
+            stripped = emoji.replace_emoji(run, replace="")
+            self._emoji_run_cache[run] = stripped
+        return stripped
+
+    @timed()
     def tokenize_amharic(self, text):
         """Linguistically-aware tokenization"""
         if not text:
             return []
 
-        text = re.sub(r"(\d+)(ብር)", r"\1 \2", text)
-        return re.findall(r"[\w\u1200-\u137F']+|[.,!?;:ብር/]", text)
+        text = self.token_split_pattern.sub(r"\1 \2", text)
+        return self.token_pattern.findall(text)
+
+    @timed()
+    def tokenize_with_offsets(self, text):
+        """Tokenize like tokenize_amharic, also returning (start, end) offsets
+
+        Offsets index into ``text``, so a token is ``text[start:end]``.
+        """
+        tokens, offsets = [], []
+        if not text:
+            return tokens, offsets
+        for match in self.offset_token_pattern.finditer(text):
+            tokens.append(match.group())
+            offsets.append(match.span())
+        return tokens, offsets
 
+    @timed()
+    def tokenize_batch(self, texts, with_offsets=False):
+        """Tokenize many texts at once with the code-point class table
+
+        Gives the same tokens as tokenize_amharic for each text. Token
+        boundaries for the whole batch are found with array operations on
+        the texts' code points, which is much faster than one regex pass
+        per text. With ``with_offsets=True`` returns ``(tokens, offsets)``
+        where offsets are ``(start, end)`` pairs into each text.
+        """
+        texts = [text or "" for text in texts]
+        if not texts:
+            return ([], []) if with_offsets else []
+
+        # Newlines are neither word nor punctuation, so no token spans texts
+        joined = "\n".join(texts)
+        code_points = np.frombuffer(
+            joined.encode("utf-32-le", "surrogatepass"), dtype=np.uint32
+        )
+        classes = _char_class_table()[code_points]
+        word = (classes & WORD_CHAR).astype(bool)
+        punct = (classes & PUNCT_CHAR).astype(bool)
+        digit = (classes & DIGIT_CHAR).astype(bool)
+
+        # ብር after a digit starts a new token, like token_split_pattern
+        currency = np.zeros(len(code_points) + 1, dtype=bool)
+        currency[1:-1] = (
+            digit[:-1]
+            & (code_points[1:] == ord("ብ"))
+            & np.append(code_points[2:] == ord("ር"), False)
+        )
+        prev_word = np.concatenate(([False], word[:-1]))
+        next_word = np.concatenate((word[1:], [False]))
+        starts = np.flatnonzero((word & (~prev_word | currency[:-1])) | punct)
+        ends = np.flatnonzero((word & (~next_word | currency[1:])) | punct) + 1
+
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+        text_starts = np.concatenate(([0], np.cumsum(lengths + 1)[:-1]))
+        bounds = np.searchsorted(starts, text_starts).tolist() + [len(starts)]
+        start_list, end_list = starts.tolist(), ends.tolist()
+        tokens = [joined[start:end] for start, end in zip(start_list, end_list)]
+        batch_tokens = [tokens[a:b] for a, b in zip(bounds, bounds[1:])]
+        if not with_offsets:
+            return batch_tokens
+
+        # Shift offsets from the joined string to each text
+        shift = np.repeat(text_starts, np.diff(bounds))
+        offsets = list(zip((starts - shift).tolist(), (ends - shift).tolist()))
+        batch_offsets = [offsets[a:b] for a, b in zip(bounds, bounds[1:])]
+        return batch_tokens, batch_offsets
+
+    @timed()
     def extract_features(self, text):
         """Extract Amharic-specific features"""
         features = {
@@ -97,19 +291,20 @@ class AmharicPreprocessor:
                 pass
 
         # Location detection
-        if any(keyword in text for keyword in self.location_keywords):
+        if self.location_pattern.search(text):
             features["contains_location"] = 1
-            location_candidates = re.findall(r"([\u1200-\u137F]{3,})", text)
+            location_candidates = self.location_candidate_pattern.findall(text)
             features["location_mentioned"] = (
                 location_candidates[:3] if location_candidates else None
             )
 
         # Product detection
-        if re.search(r"(ሽያጭ|ይገኛል|ተሸጧል|ዋጋ|ገዢ)", text):
+        if self.product_pattern.search(text):
             features["contains_product"] = 1
 
         return features
 
+    @timed()
     def preprocess_message(self, message):
         """Full preprocessing pipeline for a message"""
         # Metadata extraction
@@ -141,3 +336,96 @@ class AmharicPreprocessor:
         }
 
         return {**metadata, **content, **features}
+
+    def _process_texts(self, texts):
+        """Run the text pipeline over many texts, returning column lists"""
+        normalize = self.normalize_amharic
+        clean = self.clean_text
+        extract = self.extract_features
+
+        columns = {
+            name: []
+            for name in MESSAGE_COLUMNS[MESSAGE_COLUMNS.index("normalized_text") :]
+        }
+        # Reposted listings repeat verbatim, so each distinct text runs once
+        distinct = list(dict.fromkeys(texts))
+        normalized = [normalize(raw_text) for raw_text in distinct]
+        cleaned = [clean(normalized_text) for normalized_text in normalized]
+        seen = {
+            raw_text: result
+            for raw_text, result in zip(
+                distinct,
+                zip(
+                    normalized,
+                    cleaned,
+                    self.tokenize_batch(cleaned),
+                    map(extract, cleaned),
+                ),
+            )
+        }
+        for raw_text in texts:
+            result = seen[raw_text]
+            normalized_text, cleaned_text, tokens, features = result
+            columns["normalized_text"].append(normalized_text)
+            columns["cleaned_text"].append(cleaned_text)
+            columns["tokens"].append(list(tokens))
+            columns["token_count"].append(len(tokens))
+            columns["contains_price"].append(features["contains_price"])
+            columns["contains_location"].append(features["contains_location"])
+            columns["contains_product"].append(features["contains_product"])
+            columns["price_value"].append(features["price_value"])
+            location = features["location_mentioned"]
+            columns["location_mentioned"].append(
+                list(location) if location is not None else None
+            )
+
+        return columns
+
+    @timed()
+    def preprocess_batch(self, messages):
+        """Preprocess an iterable of message dicts into a DataFrame"""
+        metadata = {name: [] for name in MESSAGE_COLUMNS[:6]}
+        texts = []
+        for message in messages:
+            raw_text = message.get("text", "")
+            metadata["message_id"].append(message.get("id"))
+            metadata["channel"].append(message.get("channel"))
+            metadata["timestamp"].append(message.get("date"))
+            metadata["views"].append(message.get("views", 0))
+            metadata["media_path"].append(message.get("media"))
+            metadata["original_length"].append(len(raw_text))
+            texts.append(raw_text)
+
+        columns = {**metadata, "raw_text": texts, **self._process_texts(texts)}
+        return pd.DataFrame(columns, columns=MESSAGE_COLUMNS)
+
+    @timed()
+    def preprocess_frame(self, df):
+        """Preprocess a DataFrame of scraped messages column-wise
+
+        Produces the same columns as preprocess_message, one row per input
+        row, preserving the input index. Missing text is treated as empty.
+        """
+
+        def column(name, default=None):
+            if name in df.columns:
+                return df[name].tolist()
+            return [default] * len(df)
+
+        if "text" in df.columns:
+            raw_text = df["text"].fillna("").astype(str)
+        else:
+            raw_text = pd.Series("", index=df.index, dtype=object)
+        texts = raw_text.tolist()
+
+        columns = {
+            "message_id": column("id"),
+            "channel": column("channel"),
+            "timestamp": column("date"),
+            "views": column("views", 0),
+            "media_path": column("media"),
+            "original_length": raw_text.str.len().tolist(),
+            "raw_text": texts,
+            **self._process_texts(texts),
+        }
+        return pd.DataFrame(columns, columns=MESSAGE_COLUMNS, index=df.index)
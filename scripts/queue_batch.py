@@ -0,0 +1,37 @@
+import asyncio
+import time
+
+
+async def fill_batch(queue, items, size, timeout, end=None):
+    """Add items from an asyncio queue to ``items`` until it holds ``size``
+
+    Items already queued are taken at once; for more, each get waits
+    only until ``timeout`` seconds from now. Returns True as soon as the
+    ``end`` marker is read (it is not added), False otherwise. Shared by
+    the streaming pipeline and the service's micro-batcher.
+    """
+    deadline = time.monotonic() + timeout
+    while len(items) < size:
+        if not queue.empty():
+            item = queue.get_nowait()
+        else:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # asyncio.wait rather than wait_for, which can swallow a
+            # cancellation that races with the get completing
+            get = asyncio.ensure_future(queue.get())
+            try:
+                await asyncio.wait({get}, timeout=remaining)
+            finally:
+                if not get.done():
+                    get.cancel()
+            # A cancelled get stays pending until the loop runs it, and
+            # leaves its item in the queue
+            if not get.done():
+                break
+            item = get.result()
+        if end is not None and item is end:
+            return True
+        items.append(item)
+    return False
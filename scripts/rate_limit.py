@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Asyncio token bucket shared by concurrent Telegram requests
+
+    Tokens refill continuously at ``rate`` per second up to ``capacity``.
+    Each request takes one token, waiting when the bucket is empty, so
+    the combined request rate of all channels stays under ``rate``.
+    """
+
+    def __init__(self, rate=20.0, capacity=None, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens=1):
+        """Wait until ``tokens`` are available and take them"""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from scripts.parallel_preprocessor import _init_worker, _preprocess_chunk
+from scripts.queue_batch import fill_batch
+from scripts.rate_limit import TokenBucket
+
+# Marks the end of a queue's input
+_DONE = object()
+
+
+async def _collect(queue, size, timeout):
+    """Take up to ``size`` items, waiting at most ``timeout`` after the first
+
+    Returns (items, done); ``done`` is True once the end marker was read.
+    """
+    item = await queue.get()
+    if item is _DONE:
+        return [], True
+    items = [item]
+    done = await fill_batch(queue, items, size, timeout, end=_DONE)
+    return items, done
+
+
+class StreamingPipeline:
+    """Scrape, preprocess, extract entities and update the scorecard as one stream
+
+    Stages run concurrently and hand work over through bounded queues of
+    ``queue_size`` items, so a slow stage holds back the ones before it
+    instead of letting memory grow:
+
+    - scraping: one task per channel, fetching only messages newer than
+      the vendor's last scored message, oldest first, sharing a token
+      bucket of ``rate`` requests per second;
+    - preprocessing: batches of up to ``preprocess_batch`` messages, or
+      whatever arrived within ``flush_interval`` seconds, run on
+      ``preprocess_workers`` worker processes;
+    - NER: ``ner_workers`` threads send ``ner_batch`` texts at a time to
+      ``nlp_pipeline`` (a list-accepting callable such as
+      NERInferenceEngine);
+    - scoring: batches are folded into the IncrementalScorecard in the
+      order they were scraped, since the scorecard skips message ids at
+      or below a vendor's high-water mark.
+
+    ``text_column`` picks the preprocessed text the model sees.
+    ``on_preprocessed`` is called with every preprocessed frame, e.g. to
+    append it to the data lake.
+    """
+
+    def __init__(
+        self,
+        scraper,
+        nlp_pipeline,
+        scorecard,
+        queue_size=1000,
+        rate=20.0,
+        preprocess_workers=2,
+        preprocess_batch=200,
+        ner_workers=1,
+        ner_batch=64,
+        flush_interval=1.0,
+        text_column="cleaned_text",
+        on_preprocessed=None,
+        executor=None,
+    ):
+        self.scraper = scraper
+        self.nlp_pipeline = nlp_pipeline
+        self.scorecard = scorecard
+        self.queue_size = queue_size
+        self.rate = rate
+        self.preprocess_workers = preprocess_workers
+        self.preprocess_batch = preprocess_batch
+        self.ner_workers = ner_workers
+        self.ner_batch = ner_batch
+        self.flush_interval = flush_interval
+        self.text_column = text_column
+        self.on_preprocessed = on_preprocessed
+        self.executor = executor
+        self.logger = logging.getLogger("StreamingPipeline")
+
+    async def _scrape(self, handles, limit, out_queue, stats):
+        rate_limiter = TokenBucket(self.rate)
+        last_ids = self.scorecard.last_message_ids()
+
+        async def scrape(handle):
+            try:
+                entity = await self.scraper.client.get_entity(handle)
+                async for message in self.scraper._iter_new(
+                    entity, limit, rate_limiter, min_id=last_ids.get(handle, 0)
+                ):
+                    message["channel"] = handle
+                    await out_queue.put((time.monotonic(), message))
+                    stats["scraped"] += 1
+            except Exception as e:
+                # One broken channel must not stop the others
+                self.logger.error(f"Scraping {handle} failed: {str(e)}")
+                stats["failed_channels"].append(handle)
+
+        await asyncio.gather(*(scrape(handle) for handle in handles))
+        await out_queue.put(_DONE)
+
+    async def _batch(self, in_queue, out_queue):
+        """Group scraped messages into numbered batches"""
+        sequence = 0
+        done = False
+        while not done:
+            items, done = await _collect(
+                in_queue, self.preprocess_batch, self.flush_interval
+            )
+            if items:
+                await out_queue.put((sequence, items))
+                sequence += 1
+        await out_queue.put(_DONE)
+
+    async def _preprocess(self, in_queue, out_queue, executor, stats):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await in_queue.get()
+            if batch is _DONE:
+                # Leave the marker for the sibling workers
+                await in_queue.put(_DONE)
+                return
+            sequence, items = batch
+            frame = pd.DataFrame([message for _, message in items])
+            _, processed = await loop.run_in_executor(
+                executor, _preprocess_chunk, sequence, frame
+            )
+            if self.on_preprocessed is not None:
+                self.on_preprocessed(processed)
+            stats["preprocessed"] += len(processed)
+            started = min(scraped_at for scraped_at, _ in items)
+            await out_queue.put((sequence, started, processed))
+
+    def _extract(self, texts):
+        entities = []
+        for start in range(0, len(texts), self.ner_batch):
+            entities.extend(self.nlp_pipeline(texts[start : start + self.ner_batch]))
+        return entities
+
+    async def _ner(self, in_queue, out_queue, stats):
+        while True:
+            batch = await in_queue.get()
+            if batch is _DONE:
+                await in_queue.put(_DONE)
+                return
+            sequence, started, processed = batch
+            texts = processed[self.text_column].fillna("").astype(str).tolist()
+            entities = await asyncio.to_thread(self._extract, texts)
+            stats["extracted"] += len(texts)
+            await out_queue.put((sequence, started, processed, entities))
+
+    async def _score(self, in_queue, stats):
+        """Apply batches to the scorecard in scrape order"""
+        waiting = {}
+        next_sequence = 0
+        while True:
+            batch = await in_queue.get()
+            if batch is _DONE:
+                return
+            waiting[batch[0]] = batch
+            while next_sequence in waiting:
+                _, started, processed, entities = waiting.pop(next_sequence)
+                frame = pd.DataFrame(
+                    {
+                        "channel": processed["channel"].to_numpy(),
+                        "message_id": processed["message_id"].to_numpy(),
+                        "date": processed["timestamp"].to_numpy(),
+                        "views": processed["views"].to_numpy(),
+                        "text": processed[self.text_column].to_numpy(),
+                    }
+                )
+                stats["scored"] += self.scorecard.update(frame, entities=entities)
+                stats["max_latency"] = max(
+                    stats["max_latency"], time.monotonic() - started
+                )
+                next_sequence += 1
+
+    async def run(self, handles, limit=None):
+        """Push new posts of every channel through all stages once
+
+        Returns run statistics: message counts per stage, failed
+        channels, seconds, and the longest time from scraping a message
+        to its scorecard update.
+        """
+        start = time.perf_counter()
+        stats = {
+            "scraped": 0,
+            "preprocessed": 0,
+            "extracted": 0,
+            "scored": 0,
+            "failed_channels": [],
+            "max_latency": 0.0,
+        }
+        scraped, batches, preprocessed, extracted = (
+            asyncio.Queue(self.queue_size) for _ in range(4)
+        )
+        executor = self.executor or ProcessPoolExecutor(
+            max_workers=self.preprocess_workers, initializer=_init_worker
+        )
+
+        preprocess_tasks = [
+            asyncio.create_task(
+                self._preprocess(batches, preprocessed, executor, stats)
+            )
+            for _ in range(self.preprocess_workers)
+        ]
+        ner_tasks = [
+            asyncio.create_task(self._ner(preprocessed, extracted, stats))
+            for _ in range(self.ner_workers)
+        ]
+
+        async def drain():
+            await asyncio.gather(
+                self._scrape(handles, limit, scraped, stats),
+                self._batch(scraped, batches),
+            )
+            await asyncio.gather(*preprocess_tasks)
+            await preprocessed.put(_DONE)
+            await asyncio.gather(*ner_tasks)
+            await extracted.put(_DONE)
+
+        tasks = [
+            asyncio.create_task(drain()),
+            asyncio.create_task(self._score(extracted, stats)),
+            *preprocess_tasks,
+            *ner_tasks,
+        ]
+        try:
+            # A failing stage would leave the others blocked on full queues
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            if self.executor is None:
+                executor.shutdown()
+
+        stats["seconds"] = time.perf_counter() - start
+        self.logger.info(
+            f"Scored {stats['scored']} of {stats['scraped']} new posts in "
+            f"{stats['seconds']:.1f}s (max latency {stats['max_latency']:.1f}s)"
+        )
+        return stats
+
+    async def run_forever(self, handles, interval=60.0):
+        """Repeat run every ``interval`` seconds to keep scores current"""
+        while True:
+            await self.run(handles)
+            await asyncio.sleep(interval)
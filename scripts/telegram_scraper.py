@@ -2,25 +2,38 @@ import os
 import asyncio
 import json
 import re
+import time
 import configparser
 from datetime import datetime
 from telethon import TelegramClient
+from telethon.errors import FloodWaitError
 from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument
 import pandas as pd
 import logging
 
+from scripts.checkpoint_store import CheckpointStore
+from scripts.instrumentation import metrics, timed, timed_aiter
+from scripts.media_pipeline import MediaDownloader, media_info
+from scripts.message_sink import JsonlMessageSink, compact_jsonl_to_parquet
+from scripts.rate_limit import TokenBucket
+
 
 class TelegramScraper:
     """Core Telegram scraping functionality"""
 
-    def __init__(self, config_path="credentials.ini"):
+    def __init__(self, config_path="credentials.ini", data_dir=None):
         self.config_path = config_path
         self.api_id = None
         self.api_hash = None
         self.phone = None
-        self.data_dir = "../data/raw/telegram_data"  # Default, can be overridden
-        self._load_config()
+        self.client = None
+        self.checkpoints = None
+        self.media_downloader = None
+        self.lake_dir = None
+        # Default, can be overridden
+        self.data_dir = data_dir or "../data/raw/telegram_data"
         self._setup_logging()
+        self._load_config()
 
     def _setup_logging(self):
         """Configure logging"""
@@ -86,15 +99,59 @@ class TelegramScraper:
             self.logger.error(f"Client initialization failed: {str(e)}")
             raise
 
+    def enable_media_pipeline(
+        self, workers=4, queue_size=100, max_size=None, oversize="defer"
+    ):
+        """Download media on a background worker pool instead of inline
+
+        Message processing then only queues media, so text scraping never
+        waits on downloads. See MediaDownloader for storage and options.
+        """
+        self.media_downloader = MediaDownloader(
+            os.path.join(self.data_dir, "media"),
+            workers=workers,
+            queue_size=queue_size,
+            max_size=max_size,
+            oversize=oversize,
+            logger=self.logger,
+        )
+        return self.media_downloader
+
+    def enable_data_lake(self, path=None):
+        """Write scraped messages to a Parquet data lake instead of JSON/CSV
+
+        Messages are appended to a dataset partitioned by channel handle,
+        as the preprocessed data is, and month (see scripts.data_lake),
+        with dates parsed and reactions stored as a list column, so loading
+        for analytics needs no re-parsing.
+        """
+        self.lake_dir = path or os.path.join(self.data_dir, "lake")
+        return self.lake_dir
+
+    @timed()
     async def _process_message(self, message):
         """Extract structured data from message"""
+        # Get channel ID safely
+        channel_id = None
+        try:
+            if hasattr(message.peer_id, "channel_id"):
+                channel_id = message.peer_id.channel_id
+        except AttributeError:
+            pass
+
         # Handle media files
         media_path = None
         media_type = None
-        if message.media:
+        media_status = None
+        if message.media and self.media_downloader is not None:
+            media_type = media_info(message)[0]
+            media_status = self.media_downloader.submit(message, channel=channel_id)
+        elif message.media:
             try:
                 media_path, media_type = await self._download_media(message)
+                media_status = "downloaded" if media_path else None
             except Exception as e:
+                media_status = "failed"
                 self.logger.error(f"Media download error: {str(e)}")
 
         # Process reactions
@@ -113,14 +170,6 @@ class TelegramScraper:
                         f"Unexpected reaction format in message {message.id}"
                     )
 
-        # Get channel ID safely
-        channel_id = None
-        try:
-            if hasattr(message.peer_id, "channel_id"):
-                channel_id = message.peer_id.channel_id
-        except AttributeError:
-            pass
-
         return {
             "id": message.id,
             "text": message.text or "",
@@ -130,10 +179,12 @@ class TelegramScraper:
             "sender_id": getattr(message, "sender_id", None),
             "media_path": media_path,
             "media_type": media_type,
+            "media_status": media_status,
             "reactions": reactions,
             "url": f"https://t.me/c/{channel_id}/{message.id}" if channel_id else None,
         }
 
+    @timed()
     async def _download_media(self, message):
         """Download media from message"""
         media_dir = os.path.join(self.data_dir, "media")
@@ -159,29 +210,151 @@ class TelegramScraper:
 
         return None, None
 
-    async def scrape_channel(self, channel_handle, limit=100):
-        """Scrape messages from a channel"""
+    async def _iter_processed(
+        self,
+        entity,
+        limit,
+        rate_limiter=None,
+        stats=None,
+        page_size=100,
+        max_flood_waits=5,
+        min_id=None,
+    ):
+        """Yield processed messages from a channel entity
+
+        Messages are fetched newest first in pages of ``page_size``, each
+        page taking one token from ``rate_limiter``. A FloodWait only pauses
+        this channel, which then resumes after the last message it got.
+        Given ``min_id``, only newer messages are fetched, oldest first.
+        """
+        offset_id = min_id or 0
+        extra = {"reverse": True} if min_id is not None else {}
+        fetched = 0
+        flood_waits = 0
+
+        while limit is None or fetched < limit:
+            page_limit = page_size if limit is None else min(page_size, limit - fetched)
+            if rate_limiter is not None:
+                await rate_limiter.acquire()
+
+            received = 0
+            try:
+                async for message in timed_aiter(
+                    self.client.iter_messages(
+                        entity, limit=page_limit, offset_id=offset_id, **extra
+                    ),
+                    "telegram_scraper.fetch",
+                ):
+                    received += 1
+                    fetched += 1
+                    offset_id = message.id
+                    try:
+                        processed = await self._process_message(message)
+                    except Exception as e:
+                        self.logger.error(
+                            f"Error processing message {message.id}: {str(e)}"
+                        )
+                        continue
+                    if stats is not None:
+                        stats["messages"] += 1
+                    metrics.incr("telegram_scraper.messages")
+                    yield processed
+            except FloodWaitError as e:
+                flood_waits += 1
+                if stats is not None:
+                    stats["flood_waits"] += 1
+                metrics.incr("telegram_scraper.flood_waits")
+                if flood_waits > max_flood_waits:
+                    raise
+                self.logger.warning(
+                    f"FloodWait of {e.seconds}s on {getattr(entity, 'title', entity)}, "
+                    "backing off this channel"
+                )
+                await asyncio.sleep(e.seconds)
+                continue
+
+            if received < page_limit:
+                break
+
+    async def scrape_channel(
+        self,
+        channel_handle,
+        limit=100,
+        stream=False,
+        batch_size=100,
+        compact=False,
+        rate_limiter=None,
+        stats=None,
+        incremental=False,
+    ):
+        """Scrape messages from a channel
+
+        With ``stream=True`` messages are appended to a JSONL file as they
+        arrive, flushed every ``batch_size`` messages, and the file path is
+        returned instead of the message list. ``compact=True`` additionally
+        rewrites the finished JSONL file as Parquet and returns that path.
+        ``incremental=True`` only fetches messages newer than the channel's
+        checkpoint and appends them to one per-channel dataset.
+        ``rate_limiter`` and ``stats`` are supplied by scrape_channels.
+        """
         self.logger.info(f"Starting scrape: {channel_handle}")
         channel_data = []
 
         try:
+            if rate_limiter is not None:
+                await rate_limiter.acquire()
             entity = await self.client.get_entity(channel_handle)
             # Sanitize channel name for directory
             channel_name = re.sub(r"[^\w\-_]", "", entity.title.replace(" ", "_"))
             channel_dir = os.path.join(self.data_dir, channel_name)
             os.makedirs(channel_dir, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-            async for message in self.client.iter_messages(entity, limit=limit):
-                try:
-                    processed = await self._process_message(message)
-                    channel_data.append(processed)
-                except Exception as e:
-                    self.logger.error(
-                        f"Error processing message {message.id}: {str(e)}"
-                    )
+            if incremental:
+                return await self._scrape_incremental(
+                    entity,
+                    channel_dir,
+                    channel_name,
+                    limit,
+                    batch_size,
+                    compact,
+                    rate_limiter,
+                    stats,
+                )
+
+            if stream:
+                jsonl_path = os.path.join(
+                    channel_dir, f"{channel_name}_{timestamp}.jsonl"
+                )
+                # Closing in the finally flushes whatever was fetched on failure
+                with JsonlMessageSink(jsonl_path, batch_size=batch_size) as sink:
+                    async for processed in self._iter_processed(
+                        entity, limit, rate_limiter, stats
+                    ):
+                        sink.write(processed)
+
+                self.logger.info(f"Streamed {sink.count} messages to {jsonl_path}")
+                if compact:
+                    parquet_path = compact_jsonl_to_parquet(jsonl_path)
+                    self.logger.info(f"Compacted {jsonl_path} to {parquet_path}")
+                    return parquet_path
+                return jsonl_path
+
+            async for processed in self._iter_processed(
+                entity, limit, rate_limiter, stats
+            ):
+                channel_data.append(processed)
+
+            if self.lake_dir:
+                from scripts.data_lake import write_raw_messages
+
+                write_raw_messages(channel_data, self.lake_dir, channel_handle)
+                self.logger.info(
+                    f"Saved {len(channel_data)} messages to {self.lake_dir}"
+                )
+                return channel_data
 
             # Save data
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             json_path = os.path.join(channel_dir, f"{channel_name}_{timestamp}.json")
             csv_path = os.path.join(channel_dir, f"{channel_name}_{timestamp}.csv")
 
@@ -200,8 +373,132 @@ class TelegramScraper:
             self.logger.error(f"Channel scraping failed: {str(e)}")
             return None
 
+    async def _iter_new(self, entity, limit, rate_limiter=None, stats=None, min_id=0):
+        """Yield processed messages newer than ``min_id``, oldest first
+
+        With no checkpoint yet (``min_id`` 0) and a ``limit``, these are the
+        newest ``limit`` messages, as a plain scrape returns, not the oldest
+        ones: they are fetched newest first and yielded once all arrived.
+        Without a limit the whole history is backfilled oldest first.
+        """
+        if not min_id and limit is not None:
+            seed = [
+                processed
+                async for processed in self._iter_processed(
+                    entity, limit, rate_limiter, stats
+                )
+            ]
+            for processed in reversed(seed):
+                yield processed
+            return
+        async for processed in self._iter_processed(
+            entity, limit, rate_limiter, stats, min_id=min_id
+        ):
+            yield processed
+
+    async def _scrape_incremental(
+        self,
+        entity,
+        channel_dir,
+        channel_name,
+        limit,
+        batch_size,
+        compact,
+        rate_limiter,
+        stats,
+    ):
+        """Append messages newer than the checkpoint to the channel dataset
+
+        Messages arrive oldest first, and the checkpoint advances after each
+        flushed batch. An interrupted run therefore resumes where it stopped
+        without leaving gaps, and ``{channel_name}.jsonl`` stays deduplicated.
+        The first run of a channel seeds the dataset with its newest
+        ``limit`` messages (see _iter_new); pass ``limit=None`` to backfill
+        the whole history instead.
+        """
+        if self.checkpoints is None:
+            self.checkpoints = CheckpointStore(
+                os.path.join(self.data_dir, "checkpoints.sqlite")
+            )
+        checkpoint_key = str(getattr(entity, "id", channel_name))
+        min_id = self.checkpoints.get(checkpoint_key)
+        last_id = min_id
+
+        def save_checkpoint():
+            if last_id > min_id:
+                self.checkpoints.set(checkpoint_key, last_id)
+
+        dataset_path = os.path.join(channel_dir, f"{channel_name}.jsonl")
+        with JsonlMessageSink(
+            dataset_path, batch_size=batch_size, on_flush=save_checkpoint
+        ) as sink:
+            async for processed in self._iter_new(
+                entity, limit, rate_limiter, stats, min_id=min_id
+            ):
+                last_id = processed["id"]
+                sink.write(processed)
+
+        if not sink.count:
+            self.logger.info(f"No new messages in {channel_name} after {min_id}")
+        else:
+            self.logger.info(
+                f"Appended {sink.count} new messages to {dataset_path} "
+                f"(checkpoint {min_id} -> {last_id})"
+            )
+
+        if compact:
+            return compact_jsonl_to_parquet(dataset_path, dedupe=True)
+        return dataset_path
+
+    async def scrape_channels(
+        self, channel_handles, concurrency=4, limit=100, rate=20.0, **kwargs
+    ):
+        """Scrape several channels concurrently on the shared client
+
+        At most ``concurrency`` channels run at once and all of them share
+        one token bucket of ``rate`` requests per second. Extra keyword
+        arguments are passed to scrape_channel. Returns the per-channel
+        scrape_channel results and per-channel throughput statistics.
+        """
+        rate_limiter = TokenBucket(rate)
+        semaphore = asyncio.Semaphore(concurrency)
+        results = dict.fromkeys(channel_handles)
+        stats = {}
+
+        async def run(channel_handle):
+            async with semaphore:
+                channel_stats = {"messages": 0, "flood_waits": 0}
+                start = time.perf_counter()
+                results[channel_handle] = await self.scrape_channel(
+                    channel_handle,
+                    limit=limit,
+                    rate_limiter=rate_limiter,
+                    stats=channel_stats,
+                    **kwargs,
+                )
+                elapsed = time.perf_counter() - start
+                channel_stats["seconds"] = elapsed
+                channel_stats["msgs_per_sec"] = (
+                    channel_stats["messages"] / elapsed if elapsed else 0.0
+                )
+                stats[channel_handle] = channel_stats
+                self.logger.info(
+                    f"{channel_handle}: {channel_stats['messages']} messages in "
+                    f"{elapsed:.1f}s ({channel_stats['msgs_per_sec']:.1f} msg/s, "
+                    f"{channel_stats['flood_waits']} FloodWaits)"
+                )
+
+        await asyncio.gather(*(run(handle) for handle in channel_handles))
+        return results, stats
+
     async def close(self):
         """Cleanup client connection"""
+        if self.media_downloader is not None:
+            await self.media_downloader.close()
+        if self.checkpoints is not None:
+            self.checkpoints.close()
+            self.checkpoints = None
+        self.media_downloader = None
         if self.client and self.client.is_connected():
             await self.client.disconnect()
             self.logger.info("Client disconnected")
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+from datasets import Dataset
+
+from scripts.ner_data_utils import tokenize_and_align_labels
+
+INDEX_FILE = "index.json"
+
+
+def corpus_fingerprint(dataset, chunk_size=10000):
+    """Hash the tokens and ner_tags of a Dataset or dict of columns"""
+    digest = hashlib.sha256()
+    for column in ("tokens", "ner_tags"):
+        values = dataset[column]
+        digest.update(column.encode())
+        for start in range(0, len(values), chunk_size):
+            chunk = values[start : start + chunk_size]
+            digest.update(json.dumps(chunk, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def tokenizer_fingerprint(tokenizer):
+    """Hash a tokenizer's name and its full vocabulary/pipeline definition"""
+    digest = hashlib.sha256()
+    digest.update(type(tokenizer).__name__.encode())
+    digest.update(str(getattr(tokenizer, "name_or_path", "")).encode())
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        # Serialized fast tokenizer: vocab, normalizer and pre-tokenizer.
+        # Truncation/padding state changes with each call, so it is dropped.
+        spec = json.loads(backend.to_str())
+        spec.pop("truncation", None)
+        spec.pop("padding", None)
+        digest.update(json.dumps(spec, sort_keys=True).encode("utf-8"))
+    else:
+        vocab = sorted(tokenizer.get_vocab().items())
+        digest.update(json.dumps(vocab, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _dir_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path)
+        for name in files
+    )
+
+
+class TokenizationCache:
+    """On-disk LRU cache around tokenize_and_align_labels
+
+    Entries are keyed by a hash of the corpus, the tokenizer fingerprint,
+    ``max_length``, ``padding`` and ``label2id``, and stored as Arrow
+    datasets that are memory-mapped on load. When the total size passes
+    ``max_bytes`` the least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir, max_bytes=5 * 2**30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.logger = logging.getLogger("TokenizationCache")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def key(self, dataset, tokenizer, label2id, max_length=128, padding="max_length"):
+        """Cache key for tokenizing dataset with these settings"""
+        parts = {
+            "corpus": corpus_fingerprint(dataset),
+            "tokenizer": tokenizer_fingerprint(tokenizer),
+            "max_length": max_length,
+            "padding": padding,
+            "label2id": sorted(label2id.items()),
+        }
+        return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    def tokenize(
+        self, dataset, tokenizer, label2id, max_length=128, padding="max_length"
+    ):
+        """Return the tokenized dataset, from cache when nothing changed"""
+        key = self.key(dataset, tokenizer, label2id, max_length, padding)
+        path = os.path.join(self.cache_dir, key)
+
+        if key in self.index and os.path.isdir(path):
+            self.hits += 1
+            self.index[key]["last_used"] = time.time()
+            self._save_index()
+            self.logger.info(f"Tokenization cache hit {key[:12]}")
+            return Dataset.load_from_disk(path)
+
+        self.misses += 1
+        self.logger.info(f"Tokenization cache miss {key[:12]}, tokenizing")
+        encoded = tokenize_and_align_labels(
+            dataset, tokenizer, label2id, padding=padding, max_length=max_length
+        )
+        columns = {
+            "tokens": list(dataset["tokens"]),
+            "ner_tags": list(dataset["ner_tags"]),
+            **{name: list(values) for name, values in encoded.items()},
+        }
+        Dataset.from_dict(columns).save_to_disk(path)
+
+        self.index[key] = {"bytes": _dir_size(path), "last_used": time.time()}
+        self._evict(keep=key)
+        self._save_index()
+        # Reload so the result is memory-mapped like a cache hit
+        return Dataset.load_from_disk(path)
+
+    def _evict(self, keep=None):
+        """Drop least recently used entries until under max_bytes"""
+        total = sum(entry["bytes"] for entry in self.index.values())
+        for key in sorted(self.index, key=lambda k: self.index[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self.index.pop(key)["bytes"]
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+            self.evictions += 1
+            self.logger.info(f"Evicted tokenization cache entry {key[:12]}")
+
+    def stats(self):
+        """Return hit, miss and eviction counts and the cache size"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.index),
+            "bytes": sum(entry["bytes"] for entry in self.index.values()),
+        }
@@ -2,11 +2,12 @@ import pandas as pd
 from dateutil.relativedelta import relativedelta
 import re
 
-def extract_prices(text, nlp_pipeline):
-    """Extract prices using NER model"""
-    results = nlp_pipeline(text)
+from scripts.instrumentation import timed
+
+def _prices(entities):
+    """Numeric values of the PRICE entities"""
     prices = []
-    for ent in results:
+    for ent in entities:
         if ent["entity_group"] == "PRICE":
             # Extract numeric values from price strings
             numbers = re.findall(r'\d+', ent["word"])
@@ -14,36 +15,77 @@ def extract_prices(text, nlp_pipeline):
                 prices.append(float(''.join(numbers)))
     return prices
 
-def calculate_vendor_metrics(df, nlp_pipeline):
-    """Calculate KPIs for each vendor"""
-    metrics = []
-    
-    for vendor, group in df.groupby('channel'):
-        # Activity metrics
-        group['date'] = pd.to_datetime(group['date'])
-        post_freq = group.resample('W', on='date').size().mean()
-        
-        # Engagement metrics
-        avg_views = group['views'].mean()
-        top_post = group.loc[group['views'].idxmax()]
-        
-        # Business metrics
-        all_prices = []
-        for text in group['text']:
-            all_prices.extend(extract_prices(text, nlp_pipeline))
-        avg_price = sum(all_prices) / len(all_prices) if all_prices else 0
-        
-        metrics.append({
-            'vendor': vendor,
-            'avg_views': avg_views,
-            'post_freq': post_freq,
-            'avg_price': avg_price,
-            'top_post_views': top_post['views'],
-            'top_post_product': extract_products(top_post['text'], nlp_pipeline)[0] if group['text'].any() else ''
-        })
-    
-    return pd.DataFrame(metrics)
+def _products(entities):
+    return [ent["word"] for ent in entities if ent["entity_group"] == "PRODUCT"]
+
+@timed()
+def extract_prices(text, nlp_pipeline):
+    """Extract prices using NER model"""
+    return _prices(nlp_pipeline(text))
+
+@timed()
+def extract_products(text, nlp_pipeline):
+    """Extract product names using NER model"""
+    return _products(nlp_pipeline(text))
+
+@timed()
+def extract_entities(df, nlp_pipeline, entity_cache=None):
+    """Run the model once per message, returning entity lists in row order
+    
+    All texts go to ``nlp_pipeline`` as one list, so a batching engine
+    such as NERInferenceEngine sees full batches. With an EntityCache only
+    new or edited messages reach the model.
+    """
+    texts = [text if isinstance(text, str) else '' for text in df['text']]
+    if entity_cache is None:
+        return list(nlp_pipeline(texts)) if texts else []
+    id_column = 'message_id' if 'message_id' in df else 'id'
+    return entity_cache.extract(df['channel'], df[id_column], texts, nlp_pipeline)
+
+@timed()
+def calculate_vendor_metrics(df, nlp_pipeline, entity_cache=None):
+    """Calculate KPIs for each vendor
+    
+    Columnar: dates are parsed once and every metric is a groupby
+    aggregation over all vendors at once.
+    """
+    columns = ['vendor', 'avg_views', 'post_freq', 'avg_price',
+               'top_post_views', 'top_post_product']
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    entities = extract_entities(df, nlp_pipeline, entity_cache)
+    frame = df[['channel', 'date', 'views']].reset_index(drop=True)
+    frame['date'] = pd.to_datetime(frame['date'])
+    frame['prices'] = [_prices(ents) for ents in entities]
+    by_vendor = frame.groupby('channel')
+    
+    # Activity metrics: posts per weekly bin, counting empty weeks between
+    # a vendor's first and last post as resample does
+    weekly = frame.groupby(['channel', pd.Grouper(key='date', freq='W')]).size()
+    weeks = weekly.reset_index(level='date').groupby('channel')['date'].agg(['min', 'max'])
+    n_weeks = (weeks['max'] - weeks['min']).dt.days // 7 + 1
+    post_freq = by_vendor.size() / n_weeks
+    
+    # Engagement metrics
+    avg_views = by_vendor['views'].mean()
+    top_idx = by_vendor['views'].idxmax()
+    
+    # Business metrics
+    prices = frame[['channel', 'prices']].explode('prices').dropna()
+    avg_price = (prices['prices'].astype(float).groupby(prices['channel']).mean()
+                 .reindex(avg_views.index, fill_value=0))
+    
+    top_products = [_products(entities[i]) for i in top_idx]
+    return pd.DataFrame({
+        'vendor': avg_views.index,
+        'avg_views': avg_views.to_numpy(),
+        'post_freq': post_freq.to_numpy(),
+        'avg_price': avg_price.to_numpy(),
+        'top_post_views': frame['views'].to_numpy()[top_idx.to_numpy()],
+        'top_post_product': [products[0] if products else '' for products in top_products]
+    }, columns=columns)
 
+@timed()
 def lending_scorecard(metrics_df):
     """Generate lending scorecard with weighted metrics"""
     # Normalize metrics
@@ -0,0 +1,229 @@
+import os
+import sqlite3
+from datetime import date, timedelta
+
+import pandas as pd
+
+from scripts.vendor_analytics import (
+    _prices,
+    _products,
+    extract_entities,
+    lending_scorecard,
+)
+
+METRIC_COLUMNS = [
+    "vendor",
+    "avg_views",
+    "post_freq",
+    "avg_price",
+    "top_post_views",
+    "top_post_product",
+]
+
+
+def _week_end(day):
+    """Sunday closing the week of day, the label of a 'W' resample bin"""
+    return day + timedelta(days=6 - day.weekday())
+
+
+class IncrementalScorecard:
+    """Vendor scorecard kept up to date from newly scraped posts only
+
+    Per-vendor running aggregates live in SQLite as one row per vendor and
+    day: post count, view count, sum and max, price sum and count, and the
+    top post of the day. Posts without a view count (the scraper gives
+    None) count as posts but are left out of the view metrics, as in
+    calculate_vendor_metrics. ``update`` folds in posts newer than each vendor's
+    last seen message id, so its cost depends on the new posts only.
+    ``metrics``/``scorecard`` sum the daily rows over an optional rolling
+    window and give the same numbers as calculate_vendor_metrics on the
+    posts in that window.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS vendor_days (
+                channel TEXT NOT NULL,
+                day TEXT NOT NULL,
+                posts INTEGER NOT NULL,
+                views_sum REAL NOT NULL,
+                views_max REAL NOT NULL,
+                price_sum REAL NOT NULL,
+                price_count INTEGER NOT NULL,
+                top_message_id INTEGER,
+                top_product TEXT,
+                views_count INTEGER NOT NULL,
+                PRIMARY KEY (channel, day)
+            );
+            CREATE TABLE IF NOT EXISTS vendors (
+                channel TEXT PRIMARY KEY,
+                last_message_id INTEGER NOT NULL
+            );
+            """)
+        self.conn.commit()
+
+    def last_message_ids(self):
+        """Return {channel: last message id folded into the aggregates}"""
+        return dict(self.conn.execute("SELECT channel, last_message_id FROM vendors"))
+
+    def update(self, df, nlp_pipeline=None, entity_cache=None, entities=None):
+        """Fold posts not seen before into the aggregates; returns their count
+
+        ``entities`` are entity lists already extracted for the rows of
+        ``df``; without them ``nlp_pipeline`` is run on the new posts.
+        """
+        id_column = "message_id" if "message_id" in df else "id"
+        seen = df["channel"].map(self.last_message_ids()).fillna(0)
+        is_new = (df[id_column] > seen).to_numpy()
+        new = df[is_new]
+        if new.empty:
+            return 0
+
+        if entities is None:
+            entities = extract_entities(new, nlp_pipeline, entity_cache)
+        else:
+            entities = [ents for ents, keep in zip(entities, is_new) if keep]
+        frame = new[["channel", "date", "views", id_column]].reset_index(drop=True)
+        frame["views"] = pd.to_numeric(frame["views"], errors="coerce")
+        frame["day"] = pd.to_datetime(frame["date"]).dt.strftime("%Y-%m-%d")
+        prices = [_prices(ents) for ents in entities]
+        frame["price_sum"] = [sum(p) for p in prices]
+        frame["price_count"] = [len(p) for p in prices]
+
+        grouped = frame.groupby(["channel", "day"])
+        days = grouped.agg(
+            posts=("views", "size"),
+            views_count=("views", "count"),
+            views_sum=("views", "sum"),
+            views_max=("views", "max"),
+            price_sum=("price_sum", "sum"),
+            price_count=("price_count", "sum"),
+        )
+        # Days whose posts all lack views have no top post
+        days["views_max"] = days["views_max"].fillna(0)
+        with_views = frame[frame["views"].notna()]
+        top_idx = with_views.groupby(["channel", "day"])["views"].idxmax()
+        top_idx = top_idx.reindex(days.index)
+        days["top_message_id"] = [
+            None if pd.isna(i) else int(frame[id_column].iat[int(i)]) for i in top_idx
+        ]
+        days["top_product"] = [
+            None if pd.isna(i) else next(iter(_products(entities[int(i)])), "")
+            for i in top_idx
+        ]
+        last_ids = frame.groupby("channel")[id_column].max()
+
+        with self.conn:
+            # SET expressions see the stored row, so the CASEs compare
+            # against the old views_max and views_count
+            self.conn.executemany(
+                """
+                INSERT INTO vendor_days VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(channel, day) DO UPDATE SET
+                    posts = posts + excluded.posts,
+                    views_count = views_count + excluded.views_count,
+                    views_sum = views_sum + excluded.views_sum,
+                    views_max = MAX(views_max, excluded.views_max),
+                    price_sum = price_sum + excluded.price_sum,
+                    price_count = price_count + excluded.price_count,
+                    top_message_id = CASE WHEN excluded.views_count > 0 AND (
+                        views_count = 0 OR excluded.views_max > views_max)
+                        THEN excluded.top_message_id ELSE top_message_id END,
+                    top_product = CASE WHEN excluded.views_count > 0 AND (
+                        views_count = 0 OR excluded.views_max > views_max)
+                        THEN excluded.top_product ELSE top_product END
+                """,
+                (
+                    (
+                        channel,
+                        day,
+                        int(row.posts),
+                        float(row.views_sum),
+                        float(row.views_max),
+                        float(row.price_sum),
+                        int(row.price_count),
+                        row.top_message_id,
+                        row.top_product,
+                        int(row.views_count),
+                    )
+                    for (channel, day), row in days.iterrows()
+                ),
+            )
+            self.conn.executemany(
+                """
+                INSERT INTO vendors VALUES (?, ?)
+                ON CONFLICT(channel) DO UPDATE SET
+                    last_message_id = MAX(last_message_id, excluded.last_message_id)
+                """,
+                ((channel, int(last)) for channel, last in last_ids.items()),
+            )
+        return len(new)
+
+    def metrics(self, window_days=None, as_of=None):
+        """Vendor metrics over the last window_days days up to as_of
+
+        ``as_of`` defaults to the latest day in the store; without a
+        window the whole history is used.
+        """
+        if as_of is None:
+            (latest,) = self.conn.execute("SELECT MAX(day) FROM vendor_days").fetchone()
+            if latest is None:
+                return pd.DataFrame(columns=METRIC_COLUMNS)
+            as_of = date.fromisoformat(latest)
+        start = (
+            as_of - timedelta(days=window_days - 1) if window_days else date.min
+        ).isoformat()
+
+        days = pd.read_sql_query(
+            """
+            SELECT * FROM vendor_days WHERE day >= ? AND day <= ?
+            ORDER BY channel, day
+            """,
+            self.conn,
+            params=(start, as_of.isoformat()),
+        )
+        if days.empty:
+            return pd.DataFrame(columns=METRIC_COLUMNS)
+
+        by_vendor = days.groupby("channel")
+        totals = by_vendor[
+            ["posts", "views_count", "views_sum", "price_sum", "price_count"]
+        ].sum()
+        first = by_vendor["day"].min().map(date.fromisoformat).map(_week_end)
+        last = by_vendor["day"].max().map(date.fromisoformat).map(_week_end)
+        n_weeks = (last - first).map(lambda delta: delta.days // 7 + 1)
+        with_views = days[days["views_count"] > 0]
+        top = (
+            with_views.loc[with_views.groupby("channel")["views_max"].idxmax()]
+            .set_index("channel")
+            .reindex(totals.index)
+        )
+        views_count = totals["views_count"]
+
+        price_count = totals["price_count"]
+        return pd.DataFrame(
+            {
+                "vendor": totals.index,
+                "avg_views": (
+                    totals["views_sum"] / views_count.where(views_count > 0)
+                ).to_numpy(),
+                "post_freq": (totals["posts"] / n_weeks).to_numpy(),
+                "avg_price": (totals["price_sum"] / price_count.where(price_count > 0))
+                .fillna(0)
+                .to_numpy(),
+                "top_post_views": top["views_max"].to_numpy(),
+                "top_post_product": top["top_product"].fillna("").to_numpy(),
+            },
+            columns=METRIC_COLUMNS,
+        )
+
+    def scorecard(self, window_days=None, as_of=None):
+        """lending_scorecard over the windowed metrics"""
+        return lending_scorecard(self.metrics(window_days, as_of))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from telethon.errors import FloodWaitError
+
+from scripts.benchmarks import synthetic_messages
+
+
+class FakeMessage(SimpleNamespace):
+    """Minimal stand-in for a Telethon message"""
+
+
+class FakeClient:
+    """In-memory Telegram client yielding synthetic channel history
+
+    Mirrors the parts of TelegramClient the scraper uses: ``get_entity``
+    and ``iter_messages`` with ``limit``, ``offset_id`` and ``min_id``,
+    returning newest messages first.
+    """
+
+    def __init__(self, channels, fail_after=None, flood_waits=None):
+        self.history = {}
+        self.requests = 0
+        self.delivered = 0
+        # Raise a connection error once this many messages were delivered
+        self.fail_after = fail_after
+        # Remaining FloodWait errors to raise mid-page, per channel handle
+        self.flood_waits = dict(flood_waits or {})
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for channel_id, (handle, count) in enumerate(channels.items(), start=1):
+            self.history[handle] = [
+                FakeMessage(
+                    id=i,
+                    text=record["text"],
+                    date=start + timedelta(hours=i),
+                    views=record["views"],
+                    forwards=0,
+                    sender_id=channel_id,
+                    media=None,
+                    reactions=None,
+                    peer_id=SimpleNamespace(channel_id=channel_id),
+                )
+                for i, record in enumerate(
+                    synthetic_messages(count, seed=channel_id), start=1
+                )
+            ]
+
+    def add_messages(self, handle, texts):
+        """Post new messages to a channel"""
+        messages = self.history[handle]
+        last = messages[-1]
+        for text in texts:
+            messages.append(
+                FakeMessage(
+                    **{
+                        **vars(last),
+                        "id": messages[-1].id + 1,
+                        "text": text,
+                        "date": messages[-1].date + timedelta(hours=1),
+                    }
+                )
+            )
+
+    async def get_entity(self, handle):
+        return SimpleNamespace(title=handle.lstrip("@"), id=handle)
+
+    async def iter_messages(
+        self, entity, limit=None, offset_id=0, min_id=0, reverse=False
+    ):
+        self.requests += 1
+        yielded = 0
+        history = self.history[entity.id]
+        for message in history if reverse else reversed(history):
+            if reverse:
+                # Oldest first; offset_id then means "after this id"
+                if message.id <= max(offset_id, min_id):
+                    continue
+            elif offset_id and message.id >= offset_id:
+                continue
+            elif message.id <= min_id:
+                return
+            if limit is not None and yielded >= limit:
+                return
+            if self.fail_after is not None and self.delivered >= self.fail_after:
+                raise ConnectionError("connection lost")
+            if yielded == 10 and self.flood_waits.get(entity.id):
+                self.flood_waits[entity.id] -= 1
+                raise FloodWaitError(request=None, capture=0)
+            yielded += 1
+            self.delivered += 1
+            yield message
+
+    def is_connected(self):
+        return True
+
+    async def disconnect(self):
+        pass
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+transformers = pytest.importorskip("transformers")
+
+from scripts.active_learning import (  # noqa: E402
+    UncertaintyScorer,
+    select_diverse,
+    select_for_annotation,
+    token_uncertainty,
+)
+from scripts.ner_inference import NERInferenceEngine  # noqa: E402
+
+ID2LABEL = {0: "O", 1: "B-PRODUCT", 2: "B-PRICE"}
+
+
+class LetterEngine(NERInferenceEngine):
+    """Confident on digits, unsure between labels on the letter "a" """
+
+    def _load_model(self):
+        self.model = None
+        self.forward_calls = 0
+
+    def _forward(self, input_ids, attention_mask):
+        self.forward_calls += 1
+        logits = np.zeros(input_ids.shape + (len(ID2LABEL),), dtype=np.float32)
+        logits[..., 0] = 8.0
+        unsure = input_ids == self.tokenizer.convert_tokens_to_ids("a")
+        logits[unsure] = 0.0
+        return logits
+
+
+@pytest.fixture
+def engine(tmp_path):
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]"] + list("0123456789abcd")
+    (tmp_path / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    tokenizer = transformers.BertTokenizerFast(
+        str(tmp_path / "vocab.txt"), do_lower_case=False
+    )
+    tokenizer.save_pretrained(str(tmp_path))
+    transformers.BertConfig(id2label=ID2LABEL).save_pretrained(str(tmp_path))
+    return LetterEngine(str(tmp_path), batch_size=4)
+
+
+def test_token_uncertainty_ignores_special_tokens():
+    probs = np.array([[[1.0, 0.0], [0.5, 0.5], [0.5, 0.5]]])
+    real = np.array([[True, True, False]])
+
+    entropy, margin = token_uncertainty(probs, real)
+
+    assert entropy[0] == pytest.approx(np.log(2) / 2)
+    assert margin[0] == pytest.approx(1.0)
+
+
+def test_select_diverse_skips_near_duplicates():
+    vectors = np.array([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+
+    assert select_diverse(np.array([0.9, 0.8, 0.5]), vectors, 2) == [0, 2]
+
+
+def test_selects_uncertain_messages_and_reuses_cached_scores(engine, tmp_path):
+    texts = ["a b", "a b", "a c", "1 2", "3 4 5", "d a", "a a d", "7"]
+    df = pd.DataFrame(
+        {
+            "message_id": range(len(texts)),
+            "cleaned_text": texts,
+            "tokens": [t.split() for t in texts],
+        }
+    )
+    cache = str(tmp_path / "scores.sqlite")
+    output = str(tmp_path / "sample.csv")
+    scorer = UncertaintyScorer(engine, cache_path=cache, model_version="v1")
+
+    sample = select_for_annotation(df, scorer, k=3, exclude_ids=[2], output_path=output)
+
+    # The duplicate post is scored and picked only once
+    assert scorer.stats() == {"hits": 0, "misses": 6}
+    assert sorted(sample["message_id"]) == [0, 5, 6]
+    assert sample["entropy"].iloc[0] == sample["entropy"].max()
+    assert list(pd.read_csv(output)["message_id"]) == list(sample["message_id"])
+
+    engine.forward_calls = 0
+    again = UncertaintyScorer(engine, cache_path=cache, model_version="v1")
+    pd.testing.assert_frame_equal(
+        select_for_annotation(df, again, k=3, exclude_ids=[2]), sample
+    )
+    assert engine.forward_calls == 0
+    assert again.stats() == {"hits": 6, "misses": 0}
@@ -0,0 +1,128 @@
+import asyncio
+import json
+
+import pytest
+
+from app.batcher import MicroBatcher, Overloaded
+from app.load_test import StubModel, asgi_request, run_load_test
+from app.service import ExtractionService, create_app
+from scripts.benchmarks import synthetic_messages
+
+
+def serve(coroutine_fn, **kwargs):
+    """Run coroutine_fn(app, service) against a started stub service"""
+
+    async def run():
+        service = ExtractionService(StubModel(0.01, 0.0), **kwargs)
+        await service.start()
+        try:
+            return await coroutine_fn(create_app(service), service)
+        finally:
+            await service.stop()
+
+    return asyncio.run(run())
+
+
+def post(app, payload):
+    return asgi_request(app, "POST", "/extract", json.dumps(payload).encode("utf-8"))
+
+
+def test_concurrent_requests_share_a_batch():
+    async def scenario(app, service):
+        responses = await asyncio.gather(
+            *(post(app, {"id": i, "text": f"ጫማ ዋጋ {i}00 ብር"}) for i in range(8))
+        )
+        return responses, service.metrics()
+
+    responses, metrics = serve(scenario, max_batch_size=8, max_latency=0.05)
+
+    for i, (status, body) in enumerate(responses):
+        result = json.loads(body)
+        assert status == 200
+        assert result["message_id"] == i
+        assert result["tokens"] == ["ጫማ", "ዋጋ", f"{i}00", "ብር"]
+        assert {"entity_group": "PRICE", "word": f"{i}00", "score": 0.9} in (
+            result["entities"]
+        )
+    assert metrics["batch_size"]["counts"] == {"8": 1}
+    assert metrics["requests"] == 8
+    assert metrics["latency"]["p99_s"] > 0
+
+
+def test_lone_request_waits_only_until_deadline():
+    async def scenario(app, service):
+        status, body = await post(app, {"messages": [{"text": "ዋጋ 5"}]})
+        return status, json.loads(body), service.metrics()
+
+    status, results, metrics = serve(scenario, max_latency=0.01)
+
+    assert status == 200 and len(results) == 1
+    assert metrics["batch_size"]["counts"] == {"1": 1}
+    assert metrics["latency"]["max_s"] < 1.0
+
+
+def test_full_queue_sheds_load():
+    async def scenario(app, service):
+        status, _ = await post(app, {"messages": [{"text": "a"}] * 3})
+        return status, service.metrics()
+
+    status, metrics = serve(scenario, max_queue=2)
+
+    assert status == 503
+    assert metrics["shed"] == 1 and metrics["queue_depth"] == 0
+
+
+def test_batcher_rejects_whole_submission():
+    async def scenario():
+        batcher = MicroBatcher(lambda items: items, max_queue=2)
+        await batcher.start()
+        with pytest.raises(Overloaded):
+            await batcher.submit([1, 2, 3])
+        assert batcher.depth == 0
+        result = await batcher.submit([1, 2])
+        await batcher.stop()
+        return result
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+
+def test_errors_and_routes():
+    def failing(texts):
+        raise RuntimeError("model crashed")
+
+    async def scenario(app, service):
+        service.nlp_pipeline = failing
+        return {
+            "failed": (await post(app, {"text": "a"}))[0],
+            "malformed": (await asgi_request(app, "POST", "/extract", b"{"))[0],
+            "not_text": (await post(app, {"text": 5}))[0],
+            "method": (await asgi_request(app, "GET", "/extract"))[0],
+            "missing": (await asgi_request(app, "GET", "/nope"))[0],
+            "health": (await asgi_request(app, "GET", "/health"))[0],
+            "errors": service.metrics()["errors"],
+        }
+
+    assert serve(scenario) == {
+        "failed": 500,
+        "malformed": 400,
+        "not_text": 400,
+        "method": 405,
+        "missing": 404,
+        "health": 200,
+        "errors": 1,
+    }
+
+
+def test_load_test_report():
+    async def scenario(app, service):
+        return await run_load_test(
+            lambda *request: asgi_request(app, *request),
+            synthetic_messages(20),
+            concurrency=16,
+            total=64,
+        )
+
+    report = serve(scenario, max_batch_size=16)
+
+    assert report["ok"] == 64 and report["shed"] == 0
+    assert report["p50_s"] <= report["p99_s"]
@@ -0,0 +1,44 @@
+import json
+import sys
+
+import pytest
+
+from scripts.benchmarks import compare_results, main, run_suite
+
+
+def test_suite_results_are_json_and_comparable():
+    result = run_suite(sizes=(60,), repeat=1)
+
+    assert set(result["results"]) == {
+        "preprocess_message",
+        "load_conll_data",
+        "calculate_vendor_metrics",
+        "lending_scorecard",
+    }
+    for sizes in result["results"].values():
+        assert sizes["60"]["items_per_sec"] > 0
+        assert sizes["60"]["peak_mb"] > 0
+    assert json.loads(json.dumps(result)) == result
+    assert compare_results(result, result) == []
+
+
+def test_compare_flags_slower_and_larger_stages():
+    def run(rate, peak):
+        return {"results": {"stage": {"100": {"items_per_sec": rate, "peak_mb": peak}}}}
+
+    assert compare_results(run(100.0, 10.0), run(95.0, 10.2)) == []
+    assert [
+        r["metric"] for r in compare_results(run(100.0, 10.0), run(80.0, 12.0))
+    ] == ["items_per_sec", "peak_mb"]
+
+
+@pytest.mark.parametrize(
+    "argv", [["compare", "--baseline", "a.json"], ["compare", "--current", "b.json"]]
+)
+def test_compare_requires_both_result_files(monkeypatch, capsys, argv):
+    monkeypatch.setattr(sys, "argv", ["benchmarks.py", *argv])
+    with pytest.raises(SystemExit) as exc:
+        main()
+
+    assert exc.value.code == 2
+    assert "compare needs" in capsys.readouterr().err
@@ -0,0 +1,98 @@
+import pandas as pd
+
+from scripts.coll_annotator import CoNLLAnnotator, set_span, spans_to_labels
+from scripts.conll_io import iter_conll
+
+
+def price_ner(texts):
+    """Tags runs of digits followed by ብር as PRICE"""
+    results = []
+    for text in texts:
+        start = text.find("500")
+        results.append(
+            [{"entity_group": "PRICE", "start": start, "end": start + 7, "score": 0.9}]
+            if start >= 0
+            else []
+        )
+    return results
+
+
+def test_spans_to_labels_and_set_span():
+    tokens = ["ጫማ", "ዋጋ", "500", "ብር"]
+    labels = spans_to_labels(tokens, price_ner([" ".join(tokens)])[0])
+
+    assert labels == ["O", "O", "B-PRICE", "I-PRICE"]
+    assert set_span(labels, 0, 0, "PRODUCT") == [
+        "B-PRODUCT",
+        "O",
+        "B-PRICE",
+        "I-PRICE",
+    ]
+    assert set_span(labels, 2, 2, "O") == ["O", "O", "O", "B-PRICE"]
+
+
+def sample_file(tmp_path, n=4):
+    df = pd.DataFrame(
+        {
+            "message_id": range(1, n + 1),
+            "cleaned_text": ["ጫማ ዋጋ 500 ብር"] * n,
+            "tokens": [str(["ጫማ", "ዋጋ", "500", "ብር"])] * n,
+        }
+    )
+    path = tmp_path / "sample.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def scripted(answers):
+    answers = iter(answers)
+    return lambda prompt: next(answers)
+
+
+def test_prelabeled_session_appends_and_resumes(tmp_path):
+    sample = sample_file(tmp_path)
+    output = str(tmp_path / "labeled.conll")
+    annotator = CoNLLAnnotator(sample)
+    assert annotator.prelabel(price_ner, batch_size=3) == 4
+
+    # Accept one, fix a product then undo a mistake on the next, then quit
+    answers = ["", "1 p", "2-3 l", "u", "", "q"]
+    stats = annotator.start_cli_labeling(output, scripted(answers), clear=False)
+    assert stats["labeled"] == 2
+
+    # A torn write after the last completed message is dropped on resume
+    with open(output, "a", encoding="utf-8") as f:
+        f.write("ጫማ\tB-PRO")
+    resumed = CoNLLAnnotator(sample)
+    stats = resumed.start_cli_labeling(output, scripted(["", ""]), clear=False)
+    assert stats["labeled"] == 4
+    assert [m["message_id"] for m in resumed.labels] == [3, 4]
+
+    assert [labels for _, labels in iter_conll(output)] == [
+        ["O", "O", "B-PRICE", "I-PRICE"],
+        ["B-PRODUCT", "O", "B-PRICE", "I-PRICE"],
+        ["O", "O", "O", "O"],
+        ["O", "O", "O", "O"],
+    ]
+
+
+def test_existing_conll_without_progress_is_kept(tmp_path, capsys):
+    sample = sample_file(tmp_path, n=1)
+    output = tmp_path / "labeled.conll"
+    output.write_text("ስልክ\tB-PRODUCT\n\n", encoding="utf-8")
+
+    annotator = CoNLLAnnotator(sample)
+    annotator.start_cli_labeling(str(output), scripted([""]), clear=False)
+    assert "appending after its" in capsys.readouterr().out
+
+    # Cutting back a torn write keeps the sentences labeled elsewhere
+    with open(output, "a", encoding="utf-8") as f:
+        f.write("ጫማ\tB-PRO")
+    stats = CoNLLAnnotator(sample).start_cli_labeling(
+        str(output), scripted([]), clear=False
+    )
+    assert stats["labeled"] == 1
+    assert [labels for _, labels in iter_conll(str(output))] == [
+        ["B-PRODUCT"],
+        ["O", "O", "O", "O"],
+    ]
@@ -0,0 +1,38 @@
+from scripts.conll_io import (
+    CompactCoNLL,
+    compact_to_conll,
+    conll_to_compact,
+    iter_conll,
+    write_conll,
+)
+
+SENTENCES = [
+    (["ጫማ", "ዋጋ", "500", "ብር"], ["B-PRODUCT", "O", "B-PRICE", "I-PRICE"]),
+    (["ቦሌ"], ["B-LOC"]),
+    (["ስልክ", "ዋጋ", "5000", "ብር"], ["B-PRODUCT", "O", "B-PRICE", "I-PRICE"]),
+]
+
+
+def test_iter_conll_keeps_final_sentence_without_blank_line(tmp_path):
+    path = tmp_path / "labeled.conll"
+    path.write_text("ጫማ\tB-PRODUCT\n\n\nቦሌ\tB-LOC\n", encoding="utf-8")
+
+    assert list(iter_conll(path)) == [(["ጫማ"], ["B-PRODUCT"]), (["ቦሌ"], ["B-LOC"])]
+
+
+def test_compact_round_trip(tmp_path):
+    conll_path = tmp_path / "labeled.conll"
+    write_conll(SENTENCES, conll_path)
+
+    assert conll_to_compact(conll_path, tmp_path / "compact") == 3
+    corpus = CompactCoNLL(tmp_path / "compact")
+
+    assert len(corpus) == 3
+    assert corpus[2] == SENTENCES[2]
+    assert list(corpus) == SENTENCES
+    assert corpus.to_arrow().to_pydict() == corpus.to_dict()
+
+    compact_to_conll(tmp_path / "compact", tmp_path / "restored.conll")
+    assert (tmp_path / "restored.conll").read_text("utf-8") == conll_path.read_text(
+        "utf-8"
+    )
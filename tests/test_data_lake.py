@@ -0,0 +1,92 @@
+from datetime import date
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from scripts.benchmarks import synthetic_messages
+from scripts.data_lake import (
+    read_messages,
+    write_preprocessed,
+    write_raw_messages,
+)
+from scripts.preprocessor import AmharicPreprocessor
+from utils.helpers import load_data
+
+
+def raw_records(n, start_id=1):
+    records = []
+    for i in range(n):
+        records.append(
+            {
+                "id": start_id + i,
+                "text": f"ጫማ ዋጋ {i} ብር",
+                "date": f"2024-{2 + i % 3:02d}-15T10:00:00+00:00",
+                "views": i * 10,
+                "reactions": [{"emoticon": "🔥", "count": i}],
+            }
+        )
+    return records
+
+
+def test_raw_roundtrip_with_partition_pruning(tmp_path):
+    root = str(tmp_path / "lake")
+    write_raw_messages(raw_records(30), root, "shoes")
+    write_raw_messages(raw_records(9, start_id=100), root, "phones")
+
+    assert sorted(p.name for p in (tmp_path / "lake").iterdir() if p.is_dir()) == [
+        "channel=phones",
+        "channel=shoes",
+    ]
+    everything = read_messages(root)
+    assert len(everything) == 39
+    assert isinstance(everything["date"].dtype, pd.DatetimeTZDtype)
+    first = everything.sort_values("id").iloc[0]
+    assert list(first["reactions"]) == [{"emoticon": "🔥", "count": 0}]
+
+    subset = read_messages(
+        root,
+        channels="shoes",
+        since=date(2024, 3, 1),
+        until="2024-04-15T10:00:00+00:00",
+        columns=["id", "views"],
+        filter=ds.field("views") >= 100,
+    )
+    assert list(subset.columns) == ["id", "views"]
+    assert sorted(subset["id"]) == [
+        r["id"]
+        for r in raw_records(30)
+        if r["views"] >= 100 and r["date"].startswith("2024-03")
+    ]
+
+
+def test_empty_write_reads_back_empty(tmp_path):
+    root = str(tmp_path / "lake")
+    other = str(tmp_path / "other")
+    assert write_raw_messages([], root, "@shop") == 0
+    write_raw_messages(raw_records(3), other, "@shop")
+
+    empty = read_messages(root, channels="@shop", since=date(2024, 3, 1))
+    assert empty.empty
+    assert list(empty.columns) == list(read_messages(other).columns)
+    assert isinstance(empty["date"].dtype, pd.DatetimeTZDtype)
+    assert list(read_messages(root, columns=["id", "channel"]).columns) == [
+        "id",
+        "channel",
+    ]
+
+
+def test_preprocessed_keeps_list_columns(tmp_path):
+    root = str(tmp_path / "lake")
+    df = AmharicPreprocessor().preprocess_batch(synthetic_messages(200, seed=2))
+
+    # Two writes append rather than overwrite
+    write_preprocessed(df.iloc[:100], root)
+    write_preprocessed(df.iloc[100:], root)
+
+    loaded = load_data(root, columns=["message_id", "tokens", "location_mentioned"])
+    loaded = loaded.sort_values("message_id").reset_index(drop=True)
+    assert len(loaded) == 200
+    assert [list(t) for t in loaded["tokens"]] == list(df["tokens"])
+    assert [None if v is None else list(v) for v in loaded["location_mentioned"]] == [
+        None if v is None else list(v) for v in df["location_mentioned"]
+    ]
@@ -0,0 +1,74 @@
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from scripts.dedup_index import DedupIndex, assign_clusters
+
+LISTING = "አዲስ ጫማ ይገኛል ዋጋ 2500 ብር ቦታ ቦሌ መገናኛ ለሁሉም ጥራት ያለው በቅናሽ".split()
+OTHER = "ስልክ ሽያጭ ዋጋ 9000 ብር ቦታ ፒያሳ ካዛንቺስ አዲስ ኦሪጅናል".split()
+
+
+def frame():
+    return pd.DataFrame(
+        {
+            "message_id": [1, 2, 1, 3, 4],
+            "channel": ["@a", "@a", "@b", "@a", "@b"],
+            "tokens": [LISTING, OTHER, LISTING[:-1] + ["ቅናሽ"], [], LISTING],
+        }
+    )
+
+
+def test_reposts_and_near_duplicates_share_a_cluster(tmp_path):
+    index = DedupIndex(str(tmp_path / "dedup.sqlite"))
+
+    clusters = assign_clusters(frame(), index)["cluster_id"].tolist()
+
+    assert clusters[0] == clusters[2] == clusters[4]
+    assert clusters[1] != clusters[0]
+    assert pd.isna(clusters[3])
+    assert index.query(LISTING) == clusters[0]
+    assert index.query("ፍጹም ሌላ መልእክት ነው".split()) is None
+
+
+def test_index_persists_and_collapses(tmp_path):
+    path = str(tmp_path / "dedup.sqlite")
+    first = DedupIndex(path)
+    first.add("@a", 1, LISTING)
+    first.close()
+
+    index = DedupIndex(path)
+    collapsed = assign_clusters(frame(), index, collapse=True)
+
+    assert collapsed["message_id"].tolist() == [1, 2, 3]
+    assert collapsed["cluster_size"].tolist() == [3, 1, 1]
+    assert index.stats() == {"messages": 4, "clusters": 2}
+    with pytest.raises(ValueError):
+        DedupIndex(path, num_perm=64)
+
+
+def test_hashing_memory_does_not_grow_with_frame(tmp_path):
+    vocab = [f"w{i}" for i in range(2000)]
+
+    def peak(n):
+        df = pd.DataFrame(
+            {
+                "message_id": range(n),
+                "channel": "@a",
+                "tokens": [
+                    [vocab[(i * 7 + j * 13) % len(vocab)] for j in range(40)]
+                    for i in range(n)
+                ],
+            }
+        )
+        index = DedupIndex(str(tmp_path / f"dedup{n}.sqlite"), chunk_size=256)
+        tracemalloc.start()
+        try:
+            assign_clusters(df, index)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            index.close()
+
+    # Four times the messages, not four times the (num_perm x shingles) array
+    assert peak(4000) < 1.5 * peak(1000)
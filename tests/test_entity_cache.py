@@ -0,0 +1,86 @@
+import re
+
+import pandas as pd
+
+from scripts.entity_cache import EntityCache
+from scripts.vendor_analytics import calculate_vendor_metrics
+
+
+class CountingNER:
+    """Tags numbers as PRICE and ጫማ as PRODUCT, counting texts seen"""
+
+    def __init__(self):
+        self.texts = []
+
+    def _entities(self, text):
+        self.texts.append(text)
+        entities = [
+            {
+                "entity_group": "PRICE",
+                "word": m.group(),
+                "start": m.start(),
+                "end": m.end(),
+                "score": 0.9,
+            }
+            for m in re.finditer(r"\d+", text)
+        ]
+        entities += [
+            {
+                "entity_group": "PRODUCT",
+                "word": m.group(),
+                "start": m.start(),
+                "end": m.end(),
+                "score": 0.8,
+            }
+            for m in re.finditer("ጫማ", text)
+        ]
+        return entities
+
+    def __call__(self, texts):
+        if isinstance(texts, str):
+            return self._entities(texts)
+        return [self._entities(text) for text in texts]
+
+
+def messages():
+    return pd.DataFrame(
+        {
+            "id": [1, 2, 1],
+            "channel": ["@a", "@a", "@b"],
+            "date": ["2024-01-01", "2024-01-09", "2024-01-02"],
+            "views": [10, 30, 5],
+            "text": ["ጫማ 100", "ጫማ 300 ብር", "ልብስ 50"],
+        }
+    )
+
+
+def test_cached_metrics_match_and_refresh_only_runs_changes(tmp_path):
+    df = messages()
+    expected = calculate_vendor_metrics(df, CountingNER())
+
+    ner = CountingNER()
+    cache = EntityCache(str(tmp_path / "entities.sqlite"), model_version="v1")
+    result = calculate_vendor_metrics(df, ner, entity_cache=cache)
+    pd.testing.assert_frame_equal(result, expected)
+    assert len(ner.texts) == 3
+
+    # Edit one post and add another; only those reach the model
+    df.loc[1, "text"] = "ጫማ 400 ብር"
+    df.loc[3] = [3, "@a", "2024-01-20", 1, "ጫማ 200"]
+    ner.texts = []
+    result = calculate_vendor_metrics(df, ner, entity_cache=cache)
+    assert sorted(ner.texts) == ["ጫማ 200", "ጫማ 400 ብር"]
+    assert result.loc[result.vendor == "@a", "avg_price"].item() == 700 / 3
+    assert result.loc[result.vendor == "@a", "top_post_product"].item() == "ጫማ"
+
+
+def test_new_model_version_misses(tmp_path):
+    path = str(tmp_path / "entities.sqlite")
+    df = messages()
+    EntityCache(path, "v1").extract(df.channel, df.id, df.text, CountingNER())
+
+    ner = CountingNER()
+    cache = EntityCache(path, "v2")
+    cache.extract(df.channel, df.id, df.text, ner)
+    assert len(ner.texts) == 3
+    assert cache.stats() == {"hits": 0, "misses": 3, "rows": 6}
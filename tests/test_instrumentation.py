@@ -0,0 +1,75 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from scripts import instrumentation
+from scripts.benchmarks import synthetic_messages
+from scripts.instrumentation import Histogram, StackSampler, metrics, timed
+from scripts.preprocessor import AmharicPreprocessor
+
+
+@pytest.fixture
+def enabled():
+    metrics.reset()
+    instrumentation.enable()
+    yield metrics
+    instrumentation.disable()
+    metrics.reset()
+
+
+def test_disabled_records_nothing():
+    metrics.reset()
+    AmharicPreprocessor().preprocess_batch(synthetic_messages(20))
+    metrics.incr("anything")
+
+    assert metrics.summary()["timings"] == {}
+    assert metrics.summary()["counters"] == {}
+
+
+def test_stages_report_when_enabled(enabled, tmp_path):
+    @timed("test.fetch")
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return 1
+
+    AmharicPreprocessor().preprocess_batch(synthetic_messages(50))
+    assert asyncio.run(fetch()) == 1
+    enabled.incr("test.messages", 50)
+
+    summary = enabled.dump(str(tmp_path / "metrics.json"))
+    with open(tmp_path / "metrics.json", encoding="utf-8") as f:
+        assert json.load(f) == json.loads(json.dumps(summary))
+    timings = summary["timings"]
+    assert timings["preprocessor.AmharicPreprocessor.preprocess_batch"]["count"] == 1
+    assert timings["preprocessor.AmharicPreprocessor.clean_text"]["count"] > 0
+    assert timings["test.fetch"]["min_s"] >= 0.01
+    assert summary["counters"] == {"test.messages": 50}
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    for i in range(1, 1001):
+        histogram.observe(i / 1e4)
+
+    assert histogram.count == 1000
+    assert histogram.percentile(50) == pytest.approx(0.05, rel=0.1)
+    assert histogram.percentile(99) == pytest.approx(0.099, rel=0.1)
+    assert histogram.percentile(100) <= histogram.max
+
+
+def test_stack_sampler_writes_collapsed_stacks(tmp_path):
+    def busy():
+        end = time.perf_counter() + 0.2
+        while time.perf_counter() < end:
+            pass
+
+    with StackSampler(interval=0.001) as sampler:
+        busy()
+    path = sampler.write_collapsed(str(tmp_path / "stacks.txt"))
+
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert any("busy (test_instrumentation.py" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+from telethon.tl.types import Document, MessageMediaDocument
+
+from scripts.media_pipeline import MediaDownloader
+
+
+def _message(message_id, file_id, content, size=None):
+    document = Document(
+        id=file_id,
+        access_hash=0,
+        file_reference=b"",
+        date=None,
+        mime_type="image/jpeg",
+        size=size if size is not None else len(content),
+        dc_id=1,
+        attributes=[],
+    )
+
+    async def download_media(file):
+        await asyncio.sleep(0)
+        with open(file, "wb") as f:
+            f.write(content)
+        return file
+
+    return SimpleNamespace(
+        id=message_id,
+        media=MessageMediaDocument(document=document),
+        download_media=download_media,
+    )
+
+
+def test_reposted_media_is_stored_once(tmp_path):
+    downloader = MediaDownloader(str(tmp_path), workers=2, max_size=1000)
+
+    async def run():
+        statuses = [
+            downloader.submit(_message(1, 10, b"shoe photo"), channel=1),
+            downloader.submit(_message(2, 11, b"shoe photo"), channel=2),
+            downloader.submit(_message(3, 10, b"shoe photo"), channel=1),
+            downloader.submit(_message(4, 12, b"x" * 5000), channel=1),
+        ]
+        await downloader.close()
+        return statuses
+
+    statuses = asyncio.run(run())
+
+    assert statuses == ["queued", "queued", "queued", "deferred"]
+    stored = [p for p in tmp_path.glob("*/*.jpeg") if p.parent.name != ".tmp"]
+    assert len(stored) == 1
+    assert downloader.stats["downloaded"] == 1
+    assert downloader.stats["duplicates"] == 2
+    assert (tmp_path / "deferred.jsonl").read_text().count("\n") == 1
+
+
+def test_media_submitted_to_a_full_queue_is_downloaded(tmp_path):
+    downloader = MediaDownloader(str(tmp_path), workers=1, queue_size=2)
+
+    async def run():
+        statuses = [
+            downloader.submit(_message(i, 100 + i, b"photo %d" % i), channel=1)
+            for i in range(10)
+        ]
+        await downloader.close()
+        return statuses
+
+    assert asyncio.run(run()) == ["queued"] * 10
+    assert downloader.stats["overflow"] == 8
+    assert downloader.stats["downloaded"] == 10
+    assert downloader.stats["deferred"] == 0
+    assert not (tmp_path / "deferred.jsonl").exists()
+    stored = [p for p in tmp_path.glob("*/*.jpeg") if p.parent.name != ".tmp"]
+    assert len(stored) == 10
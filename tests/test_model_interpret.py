@@ -0,0 +1,132 @@
+import numpy as np
+import pytest
+
+transformers = pytest.importorskip("transformers")
+
+from scripts.model_interpret import TokenAttributor, top_tokens  # noqa: E402
+from scripts.ner_inference import NERInferenceEngine  # noqa: E402
+
+ID2LABEL = {0: "O", 1: "B-PRICE"}
+
+
+class PriceEngine(NERInferenceEngine):
+    """Tags digits as PRICE, more surely when the next token is "b" """
+
+    def _load_model(self):
+        self.model = None
+        self.forward_calls = 0
+
+    def _forward(self, input_ids, attention_mask):
+        self.forward_calls += 1
+        digits = self.tokenizer.convert_tokens_to_ids(list("0123456789"))
+        currency = self.tokenizer.convert_tokens_to_ids("b")
+        logits = np.zeros(input_ids.shape + (len(ID2LABEL),), dtype=np.float32)
+        followed = np.zeros(input_ids.shape, dtype=bool)
+        followed[:, :-1] = input_ids[:, 1:] == currency
+        logits[..., 1] = np.where(np.isin(input_ids, digits), 1.0 + 3.0 * followed, -2)
+        return logits
+
+
+@pytest.fixture
+def engine(tmp_path):
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + list("0123456789abc")
+    (tmp_path / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    tokenizer = transformers.BertTokenizerFast(
+        str(tmp_path / "vocab.txt"), do_lower_case=False
+    )
+    tokenizer.save_pretrained(str(tmp_path))
+    transformers.BertConfig(id2label=ID2LABEL).save_pretrained(str(tmp_path))
+    return PriceEngine(str(tmp_path), batch_size=64)
+
+
+def test_occlusion_batches_perturbations(engine):
+    attributor = TokenAttributor(engine)
+    texts = ["a 5 b c", "c 7 b", "a c"]
+
+    first, second, plain = attributor.explain(texts)
+
+    # 4 + 3 + 2 tokens masked one by one plus the 3 texts, in one batch
+    assert engine.forward_calls == 1
+    assert first["tokens"] == ["a", "5", "b", "c"]
+    assert first["labels"] == ["O", "B-PRICE", "O", "O"]
+    assert first["targets"] == [1]
+    weights = first["attributions"][0]
+    # The digit itself and the currency after it carry the prediction
+    assert weights[1] > weights[2] > 0
+    assert weights[0] == pytest.approx(0) and weights[3] == pytest.approx(0)
+    assert top_tokens(first, k=2)[0] == {
+        "token": "5",
+        "label": "B-PRICE",
+        "support": [("5", pytest.approx(weights[1])), ("b", pytest.approx(weights[2]))],
+    }
+    assert second["targets"] == [1]
+    assert plain["targets"] == [] and plain["attributions"] == []
+
+
+def test_lime_ranks_tokens_like_occlusion(engine):
+    attributor = TokenAttributor(engine, method="lime", samples=300)
+
+    explanation = attributor.explain("a c 5 b c a")
+    weights = explanation["attributions"][0]
+
+    assert explanation["targets"] == [2]
+    assert np.argsort(weights)[::-1][:2].tolist() == [2, 3]
+    assert attributor.explain("a c 5 b c a") == explanation
+
+
+def test_cache_is_keyed_by_method_settings(engine, tmp_path):
+    cache = str(tmp_path / "cache" / "attributions.db")
+    texts = ["a 5 b", "c 9", "a 5 b"]
+    attributor = TokenAttributor(engine, cache_path=cache, model_version="v1")
+    expected = attributor.explain(texts)
+    assert attributor.stats() == {"hits": 0, "misses": 2}
+    attributor.close()
+
+    calls = engine.forward_calls
+    attributor = TokenAttributor(engine, cache_path=cache, model_version="v1")
+    assert attributor.explain(texts) == expected
+    assert attributor.stats() == {"hits": 2, "misses": 0}
+    assert engine.forward_calls == calls
+
+    lime = TokenAttributor(engine, method="lime", cache_path=cache, model_version="v1")
+    lime.explain(texts)
+    assert lime.stats() == {"hits": 0, "misses": 2}
+
+
+def test_integrated_gradients_needs_torch_model(engine):
+    with pytest.raises(ValueError):
+        TokenAttributor(engine, method="integrated_gradients")
+    with pytest.raises(ValueError):
+        TokenAttributor(engine, cache_path="x.db")
+
+
+def test_integrated_gradients_completeness(tmp_path):
+    torch = pytest.importorskip("torch")
+    from tests.test_ner_inference import save_tiny_model
+
+    engine = NERInferenceEngine(save_tiny_model(tmp_path), batch_size=16)
+    # Sharper predictions, so masking moves the probabilities a lot
+    with torch.no_grad():
+        engine.model.classifier.weight.mul_(20)
+    attributor = TokenAttributor(
+        engine, method="integrated_gradients", steps=64, all_tokens=True
+    )
+    text = "a 5 b c 7"
+
+    explanation = attributor.explain(text)
+
+    # The baseline masks every real token
+    ids = engine.encode([text])["input_ids"][0]
+    masked = [ids[0]] + [attributor.mask_id] * (len(ids) - 2) + [ids[-1]]
+    with torch.no_grad():
+        logits = engine.model(input_ids=torch.tensor([masked])).logits[0]
+    baseline = torch.softmax(logits, dim=-1).numpy()[1:-1]
+
+    label2id = {label: i for i, label in engine.id2label.items()}
+    assert explanation["targets"] == list(range(len(ids) - 2))
+    for target, weights in zip(explanation["targets"], explanation["attributions"]):
+        label = label2id[explanation["labels"][target]]
+        difference = explanation["scores"][target] - baseline[target, label]
+        # Sums to p(input) - p(baseline) up to the midpoint rule's error
+        assert abs(difference) > 0.1
+        assert sum(weights) == pytest.approx(difference, abs=1e-4)
@@ -0,0 +1,62 @@
+import pytest
+
+transformers = pytest.importorskip("transformers")
+pytest.importorskip("datasets")
+
+from scripts.ner_data_utils import (  # noqa: E402
+    length_bucketed_batches,
+    padding_ratio,
+    tokenize_and_align_labels,
+)
+
+DATA = {
+    "tokens": [["ጫማ", "ዋጋ", "500", "ብር"], ["ቦሌ"], ["ስልክ", "5000", "ብር", "ቦሌ"]],
+    "ner_tags": [
+        ["B-PRODUCT", "O", "B-PRICE", "I-PRICE"],
+        ["B-LOC"],
+        ["B-PRODUCT", "B-PRICE", "I-PRICE", "B-LOC"],
+    ],
+}
+LABEL2ID = {"O": 0, "B-PRODUCT": 1, "B-PRICE": 2, "I-PRICE": 3, "B-LOC": 4}
+
+
+@pytest.fixture
+def tokenizer(tmp_path):
+    chars = sorted(
+        {c for sentence in DATA["tokens"] for word in sentence for c in word}
+    )
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]"] + chars + [f"##{c}" for c in chars]
+    (tmp_path / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    return transformers.BertTokenizerFast(
+        str(tmp_path / "vocab.txt"), do_lower_case=False
+    )
+
+
+def test_labels_mark_first_subword_of_each_word(tokenizer):
+    encoded = tokenize_and_align_labels(DATA, tokenizer, LABEL2ID, padding=False)
+
+    for labels, tags in zip(encoded["labels"], DATA["ner_tags"]):
+        assert [label for label in labels if label != -100] == [
+            LABEL2ID[tag] for tag in tags
+        ]
+        assert labels[0] == labels[-1] == -100
+
+
+def test_dynamic_padding_matches_fixed_padding(tokenizer):
+    fixed = tokenize_and_align_labels(DATA, tokenizer, LABEL2ID)
+    dynamic = tokenize_and_align_labels(DATA, tokenizer, LABEL2ID, padding=False)
+
+    for padded, unpadded in zip(fixed["labels"], dynamic["labels"]):
+        assert len(padded) == 128
+        assert padded[: len(unpadded)] == unpadded
+        assert set(padded[len(unpadded) :]) == {-100}
+
+
+def test_length_bucketed_batches_reduce_padding():
+    lengths = [5, 60, 7, 58, 6, 61, 8, 59] * 10
+
+    batches = length_bucketed_batches(lengths, batch_size=4, bucket_size=5)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(80))
+    sequential = [list(range(i, i + 4)) for i in range(0, 80, 4)]
+    assert padding_ratio(lengths, batches) < 0.15 < padding_ratio(lengths, sequential)
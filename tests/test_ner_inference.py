@@ -0,0 +1,152 @@
+import numpy as np
+import pytest
+
+transformers = pytest.importorskip("transformers")
+
+from scripts.ner_inference import (  # noqa: E402
+    NERInferenceEngine,
+    export_onnx,
+    group_entities,
+)
+
+ID2LABEL = {0: "O", 1: "B-PRODUCT", 2: "B-PRICE", 3: "I-PRICE", 4: "B-LOC"}
+
+
+def test_group_entities_merges_inside_tags():
+    text = "ጫማ ዋጋ 500 ብር"
+    offsets = [(0, 0), (0, 2), (3, 5), (6, 9), (10, 12), (0, 0)]
+    labels = [0, 1, 0, 2, 3, 0]
+    scores = [1.0, 0.9, 1.0, 0.8, 0.6, 1.0]
+
+    entities = group_entities(text, offsets, labels, scores, ID2LABEL)
+
+    assert [(e["entity_group"], e["word"]) for e in entities] == [
+        ("PRODUCT", "ጫማ"),
+        ("PRICE", "500 ብር"),
+    ]
+    assert entities[1]["score"] == pytest.approx(0.7)
+
+
+class RuleEngine(NERInferenceEngine):
+    """Engine whose "model" tags digits as PRICE, so no torch is needed"""
+
+    def _load_model(self):
+        self.batches = []
+
+    def _forward(self, input_ids, attention_mask):
+        self.batches.append(input_ids.shape)
+        digits = set(self.tokenizer.convert_tokens_to_ids(list("0123456789")))
+        logits = np.zeros(input_ids.shape + (len(ID2LABEL),), dtype=np.float32)
+        logits[..., 0] = 1.0
+        is_digit = np.isin(input_ids, list(digits))
+        logits[is_digit, 2] = 5.0
+        return logits
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]"] + list("0123456789abc")
+    (tmp_path / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    tokenizer = transformers.BertTokenizerFast(
+        str(tmp_path / "vocab.txt"), do_lower_case=False
+    )
+    tokenizer.save_pretrained(str(tmp_path))
+    transformers.BertConfig(id2label=ID2LABEL).save_pretrained(str(tmp_path))
+    return str(tmp_path)
+
+
+def test_batches_by_length_and_keeps_input_order(model_dir):
+    engine = RuleEngine(model_dir, batch_size=2)
+    texts = ["a b c a b c 7", "5", "a b 4", "c"]
+
+    results = engine(texts)
+
+    assert [[e["word"] for e in r] for r in results] == [["7"], ["5"], ["4"], []]
+    # Sorted by length, each batch is padded only to its own longest text
+    assert engine.batches == [(2, 3), (2, 9)]
+    assert engine("a 9")[0]["word"] == "9"
+
+
+def save_tiny_model(path, id2label=ID2LABEL, seed=0):
+    """Save a character tokenizer and a small random BERT tagger to path"""
+    import torch
+
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + list("0123456789abc")
+    (path / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    tokenizer = transformers.BertTokenizerFast(
+        str(path / "vocab.txt"), do_lower_case=False
+    )
+    tokenizer.save_pretrained(str(path))
+    config = transformers.BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        id2label=id2label,
+        label2id={label: i for i, label in id2label.items()},
+    )
+    torch.manual_seed(seed)
+    transformers.BertForTokenClassification(config).save_pretrained(str(path))
+    return str(path)
+
+
+TEXTS = ["a 5 b c 7", "c 9 9 a b 1 2", "5", "b a c 0 a c b 3 4 5 c"]
+
+
+def pipeline_entities(model, tokenizer, texts):
+    ner = transformers.pipeline(
+        "token-classification",
+        model=model,
+        tokenizer=tokenizer,
+        aggregation_strategy="simple",
+        device="cpu",
+    )
+    return [ner(text) for text in texts]
+
+
+def assert_same_spans(results, expected, tolerance=1e-5):
+    assert [
+        [(e["entity_group"], e["start"], e["end"], e["word"]) for e in entities]
+        for entities in results
+    ] == [
+        [(e["entity_group"], e["start"], e["end"], e["word"]) for e in entities]
+        for entities in expected
+    ]
+    assert sum(map(len, expected)) > 0
+    for entities, expected_entities in zip(results, expected):
+        for entity, expected_entity in zip(entities, expected_entities):
+            assert entity["score"] == pytest.approx(
+                expected_entity["score"], abs=tolerance
+            )
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_torch_backend_matches_pipeline(tmp_path, quantize):
+    pytest.importorskip("torch")
+    engine = NERInferenceEngine(
+        save_tiny_model(tmp_path), quantize=quantize, batch_size=2
+    )
+
+    # The quantized engine is compared with the pipeline on the same
+    # quantized model. Its activation ranges depend on the batch, so
+    # scores only agree closely
+    expected = pipeline_entities(engine.model, engine.tokenizer, TEXTS)
+    tolerance = 1e-2 if quantize else 1e-5
+
+    assert_same_spans(engine(TEXTS), expected, tolerance)
+    assert_same_spans([engine(TEXTS[0])], expected[:1], tolerance)
+
+
+def test_onnx_backend_matches_pipeline(tmp_path):
+    pytest.importorskip("torch")
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    model_dir = save_tiny_model(tmp_path)
+    export_onnx(model_dir)
+    engine = NERInferenceEngine(model_dir, backend="onnx", batch_size=2)
+
+    model = transformers.AutoModelForTokenClassification.from_pretrained(model_dir)
+    expected = pipeline_entities(model, engine.tokenizer, TEXTS)
+
+    assert_same_spans(engine(TEXTS), expected)
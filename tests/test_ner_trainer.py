@@ -0,0 +1,126 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from scripts.ner_trainer import compute_metrics, entity_scores
+
+ID2LABEL = {
+    0: "O",
+    1: "B-PRODUCT",
+    2: "I-PRODUCT",
+    3: "B-LOC",
+    4: "I-LOC",
+    5: "B-PRICE",
+    6: "I-PRICE",
+}
+
+
+def test_entity_scores_by_hand():
+    # true: PRODUCT(0-1), PRICE(3), LOC(5)
+    labels = np.array([[1, 2, 0, 5, 0, 3, -100, -100]])
+    # pred: PRODUCT(0-1), PRICE(3-4), LOC(5)
+    predictions = np.array([[1, 2, 0, 5, 6, 3, 4, 0]])
+    results = entity_scores(predictions, labels, ID2LABEL)
+
+    assert results["overall_precision"] == pytest.approx(2 / 3)
+    assert results["overall_recall"] == pytest.approx(2 / 3)
+    assert results["overall_accuracy"] == pytest.approx(5 / 6)
+    assert results["PRICE"] == {
+        "precision": 0.0,
+        "recall": 0.0,
+        "f1": 0.0,
+        "number": 1,
+    }
+
+
+def test_chunks_do_not_cross_sentences():
+    # An I- tag opens a chunk; the first row's entity ends at its row
+    labels = np.array([[0, 1, 2], [2, 0, -100]])
+    results = entity_scores(labels, labels, ID2LABEL)
+    assert results["PRODUCT"]["number"] == 2
+    assert results["overall_f1"] == 1.0
+
+
+def test_compute_metrics_takes_logits():
+    labels = np.array([[1, 2, -100]])
+    logits = np.eye(len(ID2LABEL))[[[1, 2, 0]]]
+    assert compute_metrics((logits, labels), ID2LABEL) == {
+        "precision": 1.0,
+        "recall": 1.0,
+        "f1": 1.0,
+        "accuracy": 1.0,
+    }
+
+
+IOBES = ["O", "B-LOC", "I-LOC", "E-LOC", "S-LOC", "S-PRICE", "E-PRICE"]
+# Tags seqeval does not know: chunks no longer alternate start and end
+OTHER = ["O", "B-PER", "I-PER", "X", "PER"]
+
+
+@pytest.mark.filterwarnings("ignore:.*seems not to be NE tag")
+@pytest.mark.parametrize("label_names", [list(ID2LABEL.values()), IOBES, OTHER])
+def test_matches_seqeval(label_names):
+    seqeval_metrics = pytest.importorskip("seqeval.metrics")
+    id2label = dict(enumerate(label_names))
+    rng = np.random.default_rng(0)
+    labels = rng.integers(0, len(id2label), size=(300, 20))
+    predictions = np.where(
+        rng.random(labels.shape) < 0.7,
+        labels,
+        rng.integers(0, len(id2label), size=labels.shape),
+    )
+    lengths = rng.integers(1, 21, size=len(labels))
+    labels[np.arange(20) >= lengths[:, None]] = -100
+
+    y_true = [[id2label[i] for i in row if i != -100] for row in labels]
+    y_pred = [
+        [id2label[p] for p, i in zip(prow, row) if i != -100]
+        for prow, row in zip(predictions, labels)
+    ]
+    expected = seqeval_metrics.classification_report(
+        y_true, y_pred, output_dict=True, zero_division=0
+    )
+    results = entity_scores(predictions, labels, id2label)
+
+    entity_types = set(expected) - {"micro avg", "macro avg", "weighted avg"}
+    assert entity_types == set(results) - {
+        "overall_precision",
+        "overall_recall",
+        "overall_f1",
+        "overall_accuracy",
+    }
+    for entity_type in entity_types:
+        for key, seqeval_key in (
+            ("precision", "precision"),
+            ("recall", "recall"),
+            ("f1", "f1-score"),
+        ):
+            assert results[entity_type][key] == pytest.approx(
+                expected[entity_type][seqeval_key]
+            )
+        assert results[entity_type]["number"] == expected[entity_type]["support"]
+    assert results["overall_precision"] == pytest.approx(
+        seqeval_metrics.precision_score(y_true, y_pred)
+    )
+    assert results["overall_recall"] == pytest.approx(
+        seqeval_metrics.recall_score(y_true, y_pred)
+    )
+    assert results["overall_f1"] == pytest.approx(
+        seqeval_metrics.f1_score(y_true, y_pred)
+    )
+    assert results["overall_accuracy"] == pytest.approx(
+        seqeval_metrics.accuracy_score(y_true, y_pred)
+    )
+
+
+def test_import_is_light():
+    code = (
+        "import sys, scripts.ner_trainer, scripts.ner_data_utils; "
+        "print(any(m in sys.modules for m in ('transformers', 'datasets')))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,79 @@
+import json
+
+import pandas as pd
+import pytest
+
+from scripts.benchmarks import synthetic_messages
+from scripts.parallel_preprocessor import ParallelPreprocessor, iter_json_array
+from scripts.preprocessor import AmharicPreprocessor
+
+
+def test_iter_json_array_streams_small_blocks(tmp_path):
+    messages = synthetic_messages(50)
+    path = tmp_path / "channel.json"
+    path.write_text(json.dumps(messages, ensure_ascii=False, indent=2), "utf-8")
+
+    assert list(iter_json_array(str(path), block_size=64)) == messages
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 500, 1 << 20])
+def test_iter_json_array_block_boundaries(tmp_path, block_size):
+    # Objects longer than a block, and separators split across blocks
+    messages = synthetic_messages(300, seed=1)
+    path = tmp_path / "channel.json"
+    path.write_text(
+        "  [ "
+        + " ,\n\n ".join(json.dumps(m, ensure_ascii=False) for m in messages)
+        + "\n]\n",
+        "utf-8",
+    )
+
+    assert list(iter_json_array(str(path), block_size=block_size)) == messages
+
+
+def test_iter_json_array_rejects_truncated_file(tmp_path):
+    path = tmp_path / "channel.json"
+    path.write_text(json.dumps(synthetic_messages(5))[:-40], "utf-8")
+
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_array(str(path), block_size=16))
+
+
+def test_ordered_run_matches_single_process(tmp_path):
+    messages = synthetic_messages(500, seed=2)
+    source = tmp_path / "channel.json"
+    source.write_text(json.dumps(messages, ensure_ascii=False), "utf-8")
+    output = tmp_path / "preprocessed.jsonl"
+
+    stats = ParallelPreprocessor(workers=2, chunk_size=64).run(str(source), str(output))
+    result = pd.read_json(output, lines=True, dtype=False, convert_dates=False)
+    expected = AmharicPreprocessor().preprocess_frame(pd.DataFrame(messages))
+
+    assert stats["messages"] == 500
+    assert stats["chunks"] == 8
+    assert result["message_id"].tolist() == expected["message_id"].tolist()
+    assert result["tokens"].tolist() == expected["tokens"].tolist()
+
+
+def test_parquet_output_matches_single_process(tmp_path):
+    messages = synthetic_messages(300, seed=3)
+    source = tmp_path / "channel.jsonl"
+    source.write_text(
+        "".join(json.dumps(m, ensure_ascii=False) + "\n" for m in messages), "utf-8"
+    )
+    output = tmp_path / "preprocessed.parquet"
+
+    stats = ParallelPreprocessor(workers=2, chunk_size=64, ordered=False).run(
+        str(source), str(output)
+    )
+    result = pd.read_parquet(output).sort_values("message_id", ignore_index=True)
+    expected = AmharicPreprocessor().preprocess_frame(pd.DataFrame(messages))
+
+    assert stats["chunks"] == 5
+    assert len(result) == 300
+    assert result["message_id"].tolist() == expected["message_id"].tolist()
+    assert result["channel"].tolist() == expected["channel"].tolist()
+    assert [list(t) for t in result["tokens"]] == expected["tokens"].tolist()
+    assert result["price_value"].tolist() == pytest.approx(
+        expected["price_value"].tolist(), nan_ok=True
+    )
@@ -0,0 +1,104 @@
+import random
+import re
+import unicodedata
+
+import pandas as pd
+
+from scripts.benchmarks import synthetic_messages
+from scripts.preprocessor import MESSAGE_COLUMNS, AmharicPreprocessor
+
+
+def test_batch_matches_per_message():
+    preprocessor = AmharicPreprocessor()
+    messages = synthetic_messages(300, seed=7)
+
+    batch = preprocessor.preprocess_batch(messages)
+    expected = pd.DataFrame([preprocessor.preprocess_message(m) for m in messages])
+
+    assert list(batch.columns) == MESSAGE_COLUMNS
+    pd.testing.assert_frame_equal(batch, expected)
+
+
+def test_frame_matches_batch():
+    preprocessor = AmharicPreprocessor()
+    messages = synthetic_messages(300, seed=3)
+
+    frame = preprocessor.preprocess_frame(pd.DataFrame(messages))
+
+    pd.testing.assert_frame_equal(frame, preprocessor.preprocess_batch(messages))
+
+
+def test_clean_text_strips_emoji_sequences():
+    preprocessor = AmharicPreprocessor()
+
+    assert preprocessor.clean_text("ጫማ 🔥✅ 👨‍👩‍👧 1️⃣ ዋጋ") == "ጫማ ዋጋ"
+
+
+def legacy_normalize(text):
+    """normalize_amharic before the patterns were fused"""
+    text = unicodedata.normalize("NFC", text)
+    text = re.sub(r"(\d+)(ብር)", r"\1 ብር", text, flags=re.IGNORECASE)
+    for pattern, replacement in {
+        r"ሜትር": "ሜትር",
+        r"ኪ\.ሜ\.": "ኪሎሜትር",
+        r"ኪ\.ግ\.": "ኪሎግራም",
+        r"ሴ\.ሜ\.": "ሴንቲሜትር",
+        r"ፒ\.ሲ\.": "ፒሲ",
+        r"ኤም\.": "ኤም",
+        r"ቲ\.ቪ\.": "ቲቪ",
+    }.items():
+        text = re.sub(pattern, replacement, text)
+    return text
+
+
+def legacy_detect(preprocessor, text):
+    """Price, location and product checks as extract_features did them"""
+    price = re.search(
+        r"(ዋጋ|በ|ብር|br|birr|price)\s*[:]?\s*(\d[\d,.]*)", text, re.IGNORECASE
+    )
+    return (
+        price and (price.span(), price.groups()),
+        any(keyword in text for keyword in preprocessor.location_keywords),
+        bool(re.search(r"(ሽያጭ|ይገኛል|ተሸጧል|ዋጋ|ገዢ)", text)),
+    )
+
+
+def fuzz_texts(n, seed=0):
+    rng = random.Random(seed)
+    pieces = ["ኪ.ሜ.", "ኪ.ግ.", "ሴ.ሜ.", "ፒ.ሲ.", "ኤም.", "ቲ.ቪ.", "ሜትር", "ብር", "ዋጋ"]
+    pieces += list("ኪሜግሴፒሲኤምቲቪ.ብርበከቦታ 0123:,bBrRiIİpPcCeE") + ["birr", "Price"]
+    return [
+        "".join(rng.choice(pieces) for _ in range(rng.randint(0, 15))) for _ in range(n)
+    ]
+
+
+def test_keyword_patterns_match_legacy():
+    preprocessor = AmharicPreprocessor()
+    texts = fuzz_texts(20000) + [m["text"] for m in synthetic_messages(2000)]
+
+    for text in texts:
+        assert preprocessor.normalize_amharic(text) == legacy_normalize(text)
+        price = preprocessor.price_pattern.search(text)
+        assert legacy_detect(preprocessor, text) == (
+            price and (price.span(), price.groups()),
+            bool(preprocessor.location_pattern.search(text)),
+            bool(preprocessor.product_pattern.search(text)),
+        )
+
+
+def test_batch_tokenizer_matches_and_returns_offsets():
+    preprocessor = AmharicPreprocessor()
+    texts = fuzz_texts(3000, seed=5) + [
+        "ጫማ 500ብር, ዋጋ 1200ብርብር ብር!",
+        "a5ብርb7ብር it's",
+        "",
+        "ሰዓት\nፒሲ",
+    ]
+
+    tokens, offsets = preprocessor.tokenize_batch(texts, with_offsets=True)
+
+    assert tokens == [preprocessor.tokenize_amharic(text) for text in texts]
+    assert tokens[-4] == ["ጫማ", "500", "ብር", ",", "ዋጋ", "1200", "ብርብር", "ብር", "!"]
+    for text, text_tokens, text_offsets in zip(texts, tokens, offsets):
+        assert [text[start:end] for start, end in text_offsets] == text_tokens
+        assert preprocessor.tokenize_with_offsets(text) == (text_tokens, text_offsets)
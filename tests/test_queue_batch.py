@@ -0,0 +1,31 @@
+import asyncio
+
+from scripts.queue_batch import fill_batch
+
+END = object()
+
+
+def test_fill_batch_takes_queued_items_and_stops_at_deadline():
+    async def fill(size, timeout, end=None):
+        items = []
+        done = await fill_batch(queue, items, size, timeout, end=end)
+        return items, done
+
+    async def scenario():
+        for item in range(5):
+            queue.put_nowait(item)
+        # Queued items are taken even once the deadline has passed
+        full = await fill(3, 0)
+        partial = await fill(10, 0.01)
+        for item in (7, END, 8):
+            queue.put_nowait(item)
+        ended = await fill(10, 0.01, end=END)
+        return full, partial, ended
+
+    queue = asyncio.Queue()
+    assert asyncio.run(scenario()) == (
+        ([0, 1, 2], False),
+        ([3, 4], False),
+        ([7], True),
+    )
+    assert queue.qsize() == 1
@@ -0,0 +1,89 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from scripts.benchmarks import stub_ner
+from scripts.streaming_pipeline import _DONE, StreamingPipeline, _collect
+from scripts.vendor_analytics import calculate_vendor_metrics
+from scripts.vendor_scorecard import IncrementalScorecard
+from scripts.telegram_scraper import TelegramScraper
+from tests.fake_telegram import FakeClient
+
+
+@pytest.fixture
+def scraper(tmp_path):
+    config = tmp_path / "credentials.ini"
+    config.write_text("[Telegram]\napi_id = 1\napi_hash = abc\nphone = +251900000000\n")
+    return TelegramScraper(config_path=str(config), data_dir=str(tmp_path / "raw"))
+
+
+def pipeline(scraper, scorecard, frames, **kwargs):
+    return StreamingPipeline(
+        scraper,
+        stub_ner,
+        scorecard,
+        queue_size=8,
+        preprocess_workers=2,
+        preprocess_batch=25,
+        ner_workers=2,
+        ner_batch=10,
+        flush_interval=0.05,
+        on_preprocessed=frames.append,
+        **kwargs,
+    )
+
+
+def test_stream_matches_batch_scorecard_and_resumes(scraper, tmp_path):
+    channels = {"@shoes": 120, "@phones": 70}
+    scraper.client = FakeClient(channels)
+    scorecard = IncrementalScorecard(str(tmp_path / "scorecard.sqlite"))
+    frames = []
+
+    stats = asyncio.run(pipeline(scraper, scorecard, frames).run(list(channels)))
+    assert stats["scraped"] == stats["scored"] == 190
+
+    scraper.client.add_messages("@shoes", ["ጫማ ዋጋ 900 ብር", "ቦርሳ 450 ብር"])
+    stats = asyncio.run(pipeline(scraper, scorecard, frames).run(list(channels)))
+    assert stats["scraped"] == stats["scored"] == 2
+
+    processed = pd.concat(frames)
+    expected = calculate_vendor_metrics(
+        pd.DataFrame(
+            {
+                "channel": processed["channel"],
+                "date": processed["timestamp"],
+                "views": processed["views"],
+                "text": processed["cleaned_text"],
+            }
+        ),
+        stub_ner,
+    )
+    pd.testing.assert_frame_equal(scorecard.metrics(), expected, check_dtype=False)
+
+
+def test_failing_stage_stops_the_run(scraper, tmp_path):
+    scraper.client = FakeClient({"@shoes": 300})
+    scorecard = IncrementalScorecard(str(tmp_path / "scorecard.sqlite"))
+
+    def broken_model(texts):
+        raise RuntimeError("model crashed")
+
+    runner = pipeline(scraper, scorecard, [])
+    runner.nlp_pipeline = broken_model
+    with pytest.raises(RuntimeError, match="model crashed"):
+        asyncio.run(asyncio.wait_for(runner.run(["@shoes"]), timeout=30))
+    assert scorecard.last_message_ids() == {}
+
+
+def test_collect_flushes_partial_batch_after_timeout():
+    async def collect():
+        queue = asyncio.Queue()
+        for item in (1, 2):
+            queue.put_nowait(item)
+        first = await _collect(queue, 10, 0.01)
+        queue.put_nowait(3)
+        queue.put_nowait(_DONE)
+        return first, await _collect(queue, 10, 0.01)
+
+    assert asyncio.run(collect()) == (([1, 2], False), ([3], True))
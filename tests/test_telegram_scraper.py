@@ -0,0 +1,153 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from scripts.telegram_scraper import TelegramScraper
+from tests.fake_telegram import FakeClient
+
+
+@pytest.fixture
+def scraper(tmp_path):
+    config = tmp_path / "credentials.ini"
+    config.write_text("[Telegram]\napi_id = 1\napi_hash = abc\nphone = +251900000000\n")
+    return TelegramScraper(config_path=str(config), data_dir=str(tmp_path / "raw"))
+
+
+def test_stream_mode_writes_jsonl(scraper):
+    scraper.client = FakeClient({"@shop": 250})
+
+    path = asyncio.run(scraper.scrape_channel("@shop", limit=None, stream=True))
+
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 250
+    assert records[0]["id"] == 250
+
+
+def test_stream_mode_keeps_messages_fetched_before_a_crash(scraper):
+    scraper.client = FakeClient({"@shop": 250}, fail_after=120)
+
+    assert asyncio.run(scraper.scrape_channel("@shop", limit=None, stream=True)) is None
+
+    (path,) = (Path(scraper.data_dir) / "shop").glob("*.jsonl")
+    with open(path, encoding="utf-8") as f:
+        assert sum(1 for _ in f) == 120
+
+
+def test_stream_mode_compacts_to_parquet(scraper):
+    pq = pytest.importorskip("pyarrow.parquet")
+    scraper.client = FakeClient({"@shop": 30})
+
+    path = asyncio.run(
+        scraper.scrape_channel("@shop", limit=None, stream=True, compact=True)
+    )
+
+    table = pq.read_table(path)
+    assert table.num_rows == 30
+    assert table.column("id").to_pylist()[0] == 30
+
+
+def test_data_lake_replaces_json_and_csv(scraper):
+    pytest.importorskip("pyarrow")
+    from scripts.data_lake import read_messages
+
+    scraper.client = FakeClient({"@shop": 40})
+    lake = scraper.enable_data_lake()
+
+    messages = asyncio.run(scraper.scrape_channel("@shop", limit=None))
+
+    loaded = read_messages(lake, columns=["id", "channel"])
+    assert sorted(loaded["id"]) == sorted(m["id"] for m in messages)
+    # Keyed by handle, like the preprocessed dataset
+    assert set(loaded["channel"]) == {"@shop"}
+    assert not list((Path(scraper.data_dir) / "shop").glob("*.csv"))
+
+
+def test_scrape_channels_runs_concurrently_and_backs_off_per_channel(scraper):
+    channels = {"@shoes": 230, "@phones": 120, "@clothes": 75}
+    scraper.client = FakeClient(channels, flood_waits={"@phones": 2})
+
+    results, stats = asyncio.run(
+        scraper.scrape_channels(list(channels), concurrency=2, limit=None, rate=1000)
+    )
+
+    for handle, count in channels.items():
+        ids = [record["id"] for record in results[handle]]
+        assert ids == list(range(count, 0, -1))
+        assert stats[handle]["messages"] == count
+        assert stats[handle]["msgs_per_sec"] > 0
+    assert stats["@phones"]["flood_waits"] == 2
+    assert stats["@shoes"]["flood_waits"] == 0
+
+
+def test_token_bucket_limits_request_rate():
+    from scripts.rate_limit import TokenBucket
+
+    now = [0.0]
+    bucket = TokenBucket(rate=10, capacity=2, clock=lambda: now[0])
+
+    async def take(n):
+        for _ in range(n):
+            await bucket.acquire()
+
+    asyncio.run(take(2))
+    assert bucket.tokens == 0
+    now[0] = 0.25
+    asyncio.run(take(2))
+    assert bucket.tokens < 1
+
+
+def _read_ids(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["id"] for line in f]
+
+
+def test_incremental_scrape_only_fetches_new_messages(scraper):
+    client = FakeClient({"@shop": 150})
+    scraper.client = client
+
+    path = asyncio.run(scraper.scrape_channel("@shop", limit=None, incremental=True))
+    assert _read_ids(path) == list(range(1, 151))
+    assert scraper.checkpoints.get("@shop") == 150
+
+    requests = client.requests
+    assert asyncio.run(scraper.scrape_channel("@shop", incremental=True)) == path
+    assert client.requests == requests + 1
+    assert _read_ids(path) == list(range(1, 151))
+
+    client.add_messages("@shop", ["አዲስ ጫማ ዋጋ 900 ብር", "ስልክ ዋጋ 5000 ብር"])
+    asyncio.run(scraper.scrape_channel("@shop", incremental=True))
+    assert _read_ids(path) == list(range(1, 153))
+    assert scraper.checkpoints.get("@shop") == 152
+
+
+def test_first_incremental_scrape_seeds_with_newest_messages(scraper):
+    client = FakeClient({"@shop": 250})
+    scraper.client = client
+
+    path = asyncio.run(scraper.scrape_channel("@shop", limit=100, incremental=True))
+    assert _read_ids(path) == list(range(151, 251))
+    assert scraper.checkpoints.get("@shop") == 250
+
+    client.add_messages("@shop", ["አዲስ ጫማ ዋጋ 900 ብር"])
+    asyncio.run(scraper.scrape_channel("@shop", limit=100, incremental=True))
+    assert _read_ids(path) == list(range(151, 252))
+
+
+def test_incremental_scrape_resumes_after_a_crash(scraper):
+    client = FakeClient({"@shop": 250}, fail_after=130)
+    scraper.client = client
+
+    assert (
+        asyncio.run(
+            scraper.scrape_channel("@shop", limit=None, incremental=True, batch_size=50)
+        )
+        is None
+    )
+    assert scraper.checkpoints.get("@shop") == 130
+
+    client.fail_after = None
+    path = asyncio.run(scraper.scrape_channel("@shop", limit=None, incremental=True))
+    assert _read_ids(path) == list(range(1, 251))
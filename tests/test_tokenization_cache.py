@@ -0,0 +1,54 @@
+import pytest
+
+transformers = pytest.importorskip("transformers")
+pytest.importorskip("datasets")
+
+from scripts import tokenization_cache  # noqa: E402
+from scripts.tokenization_cache import TokenizationCache  # noqa: E402
+
+DATA = {
+    "tokens": [["ጫማ", "ዋጋ", "500", "ብር"], ["ቦሌ"]],
+    "ner_tags": [["B-PRODUCT", "O", "B-PRICE", "I-PRICE"], ["B-LOC"]],
+}
+LABEL2ID = {"O": 0, "B-PRODUCT": 1, "B-PRICE": 2, "I-PRICE": 3, "B-LOC": 4}
+
+
+@pytest.fixture
+def tokenizer(tmp_path):
+    chars = sorted(
+        {c for sentence in DATA["tokens"] for word in sentence for c in word}
+    )
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]"] + chars + [f"##{c}" for c in chars]
+    (tmp_path / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    return transformers.BertTokenizerFast(
+        str(tmp_path / "vocab.txt"), do_lower_case=False
+    )
+
+
+def test_repeat_run_skips_tokenization(tmp_path, tokenizer, monkeypatch):
+    cache = TokenizationCache(str(tmp_path / "cache"))
+    first = cache.tokenize(DATA, tokenizer, LABEL2ID, max_length=16)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("tokenized again")
+
+    monkeypatch.setattr(tokenization_cache, "tokenize_and_align_labels", fail)
+    # A new instance reads the persisted index
+    cache = TokenizationCache(str(tmp_path / "cache"))
+    second = cache.tokenize(DATA, tokenizer, LABEL2ID, max_length=16)
+
+    assert second["input_ids"] == first["input_ids"]
+    assert second["labels"] == first["labels"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 0
+
+
+def test_changed_settings_miss_and_lru_evicts(tmp_path, tokenizer):
+    cache = TokenizationCache(str(tmp_path / "cache"))
+    cache.tokenize(DATA, tokenizer, LABEL2ID, max_length=16)
+    cache.max_bytes = cache.stats()["bytes"]
+    cache.tokenize(DATA, tokenizer, LABEL2ID, max_length=32)
+
+    stats = cache.stats()
+    assert stats["misses"] == 2
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 1
@@ -0,0 +1,82 @@
+import random
+import re
+
+import pandas as pd
+
+from scripts.benchmarks import synthetic_messages
+from scripts.vendor_analytics import calculate_vendor_metrics
+
+
+def regex_ner(texts):
+    """Stand-in model: numbers are prices, the first word is a product
+
+    Like a transformers pipeline it takes one text or a list of texts.
+    """
+    if not isinstance(texts, str):
+        return [regex_ner(text) for text in texts]
+    entities = [
+        {"entity_group": "PRICE", "word": m.group(), "score": 0.9}
+        for m in re.finditer(r"\d+", texts)
+    ]
+    return [{"entity_group": "PRODUCT", "word": texts.split()[0], "score": 0.8}] + (
+        entities
+    )
+
+
+def legacy_vendor_metrics(df, nlp_pipeline):
+    """The per-vendor loop calculate_vendor_metrics replaced"""
+    metrics = []
+    for vendor, group in df.groupby("channel"):
+        group = group.copy()
+        group["date"] = pd.to_datetime(group["date"])
+        post_freq = group.resample("W", on="date").size().mean()
+        avg_views = group["views"].mean()
+        top_post = group.loc[group["views"].idxmax()]
+        prices = []
+        for text in group["text"]:
+            for ent in nlp_pipeline(text):
+                numbers = re.findall(r"\d+", ent["word"])
+                if ent["entity_group"] == "PRICE" and numbers:
+                    prices.append(float("".join(numbers)))
+        products = [
+            e["word"]
+            for e in nlp_pipeline(top_post["text"])
+            if e["entity_group"] == "PRODUCT"
+        ]
+        metrics.append(
+            {
+                "vendor": vendor,
+                "avg_views": avg_views,
+                "post_freq": post_freq,
+                "avg_price": sum(prices) / len(prices) if prices else 0,
+                "top_post_views": top_post["views"],
+                "top_post_product": products[0],
+            }
+        )
+    return pd.DataFrame(metrics)
+
+
+def test_matches_per_vendor_loop():
+    rng = random.Random(1)
+    messages = synthetic_messages(3000, seed=1)
+    # Uneven posting with multi-week gaps, a tied top post and a vendor
+    # without prices
+    df = pd.DataFrame(
+        [m for m in messages if rng.random() < 0.5 or m["id"] % 500 < 100]
+    )
+    df.loc[df.index[:2], "views"] = df["views"].max()
+    df.loc[df.index[:2], "channel"] = "@tied"
+    quiet = pd.DataFrame(
+        {
+            "id": [1, 2],
+            "channel": ["@quiet", "@quiet"],
+            "date": ["2024-02-01T10:00:00+00:00", "2024-03-20T10:00:00+00:00"],
+            "views": [3, 7],
+            "text": ["ጫማ አዲስ", "ልብስ ቦሌ"],
+        }
+    )
+    df = pd.concat([df, quiet]).sample(frac=1, random_state=0)
+
+    pd.testing.assert_frame_equal(
+        calculate_vendor_metrics(df, regex_ner), legacy_vendor_metrics(df, regex_ner)
+    )
@@ -0,0 +1,101 @@
+import random
+
+import pandas as pd
+
+from scripts.benchmarks import synthetic_messages
+from scripts.vendor_analytics import calculate_vendor_metrics
+from scripts.vendor_scorecard import IncrementalScorecard
+from tests.test_vendor_analytics import regex_ner
+
+
+class CountingNER:
+    def __init__(self):
+        self.calls = 0
+        self.texts = 0
+
+    def __call__(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        return regex_ner(texts)
+
+
+def posts():
+    rng = random.Random(3)
+    df = pd.DataFrame(synthetic_messages(2000, seed=3))
+    # Sparse posting so some weeks are empty
+    return df[[rng.random() < 0.4 for _ in range(len(df))]]
+
+
+def test_incremental_updates_match_full_recompute(tmp_path):
+    df = posts()
+    scorecard = IncrementalScorecard(str(tmp_path / "scorecard.sqlite"))
+    ner = CountingNER()
+
+    assert scorecard.update(df.iloc[:300], ner) == 300
+    assert scorecard.update(df, ner) == len(df) - 300
+    # Every post went through the model once, in one call per update, and
+    # a repeat is a no-op
+    assert ner.texts == len(df)
+    assert ner.calls == 2
+    assert scorecard.update(df, ner) == 0
+
+    pd.testing.assert_frame_equal(
+        scorecard.metrics(),
+        calculate_vendor_metrics(df, regex_ner),
+        check_dtype=False,
+    )
+
+
+def test_rolling_window(tmp_path):
+    df = posts()
+    scorecard = IncrementalScorecard(str(tmp_path / "scorecard.sqlite"))
+    scorecard.update(df, regex_ner)
+
+    dates = pd.to_datetime(df["date"])
+    as_of = dates.max().date()
+    recent = df[dates.dt.date > as_of - pd.Timedelta(days=30)]
+
+    pd.testing.assert_frame_equal(
+        scorecard.metrics(window_days=30),
+        calculate_vendor_metrics(recent, regex_ner),
+        check_dtype=False,
+    )
+    scores = scorecard.scorecard(window_days=30)["lending_score"]
+    assert scores.is_monotonic_decreasing
+
+
+def test_missing_views(tmp_path):
+    df = posts().reset_index(drop=True)
+    df["views"] = df["views"].astype(object)
+    first = df.iloc[0]
+    same_day = (df["channel"] == first["channel"]) & (
+        pd.to_datetime(df["date"]).dt.date == pd.to_datetime(first["date"]).date()
+    )
+    latest = same_day & (df["id"] == df.loc[same_day, "id"].max())
+    assert same_day.sum() > 1
+    df.loc[(same_day & ~latest) | (df.index % 7 == 3), "views"] = None
+    scorecard = IncrementalScorecard(str(tmp_path / "scorecard.sqlite"))
+
+    # A day first seen without any views takes its top post from a later update
+    scorecard.update(df[same_day & ~latest], regex_ner)
+    scorecard.update(df, regex_ner)
+
+    pd.testing.assert_frame_equal(
+        scorecard.metrics(),
+        calculate_vendor_metrics(df.assign(views=df["views"].astype(float)), regex_ner),
+        check_dtype=False,
+    )
+
+    silent = pd.DataFrame(
+        {
+            "channel": ["@silent", "@silent"],
+            "message_id": [1, 2],
+            "date": ["2024-03-01T10:00:00+00:00", "2024-03-01T11:00:00+00:00"],
+            "views": [None, None],
+            "text": ["ጫማ ዋጋ 500 ብር", "ቦርሳ"],
+        }
+    )
+    assert scorecard.update(silent, regex_ner) == 2
+    row = scorecard.metrics().set_index("vendor").loc["@silent"]
+    assert pd.isna(row["avg_views"]) and pd.isna(row["top_post_views"])
+    assert row["top_post_product"] == ""
@@ -1,4 +1,14 @@
-def load_data(path):
-    """Load dataset from file"""
+def load_data(path, **kwargs):
+    """Load dataset from file, or from a Parquet data lake directory
+
+    For a lake directory, keyword arguments (channels, since, until,
+    columns, filter) are passed to scripts.data_lake.read_messages.
+    """
+    import os
     import pandas as pd
+    if os.path.isdir(path):
+        from scripts.data_lake import read_messages
+        return read_messages(path, **kwargs)
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, **kwargs)
     return pd.read_csv(path)